@@ -0,0 +1,184 @@
+"""
+Live admin dashboard.
+
+One in-memory snapshot of the dashboard sections (stats, recent claims,
+chart, risk heatmap) is shared by every connected admin. Sections are
+recomputed only when something they depend on changes, and connected
+clients receive just the changed fields:
+
+  - in-process hooks: invalidate_dashboard_stats(source) marks the
+    sections fed by that source dirty (bursts are coalesced)
+  - a reconcile pass every LIVE_DASHBOARD_RECONCILE_SECONDS picks up
+    writes made elsewhere (other workers, the frontend, SQL)
+
+Database load therefore depends on the change rate, not on how many
+dashboards are open. Nothing runs while nobody is connected.
+"""
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from core.dashboard_stats import add_invalidation_listener
+
+DEBOUNCE_SECONDS = float(os.getenv("LIVE_DASHBOARD_DEBOUNCE_SECONDS", "1"))
+RECONCILE_SECONDS = float(os.getenv("LIVE_DASHBOARD_RECONCILE_SECONDS", "60"))
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+def _diff_list(old: List[Dict], new: List[Dict], key: str) -> Optional[Dict]:
+    old_by_key = {item.get(key): item for item in old}
+    new_keys = [item.get(key) for item in new]
+    upsert = [item for item in new if old_by_key.get(item.get(key)) != item]
+    remove = [k for k in old_by_key if k not in set(new_keys)]
+    order_changed = new_keys != [item.get(key) for item in old]
+    if not (upsert or remove or order_changed):
+        return None
+    delta: Dict[str, Any] = {}
+    if upsert:
+        delta["upsert"] = upsert
+    if remove:
+        delta["remove"] = remove
+    if order_changed:
+        delta["order"] = new_keys
+    return delta
+
+
+def diff_section(old: Any, new: Any, key: Optional[str]) -> Optional[Any]:
+    """Compact change set between two versions of a section (None if unchanged)"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {k: v for k, v in new.items() if old.get(k) != v}
+        return changed or None
+    if key and isinstance(old, list) and isinstance(new, list):
+        return _diff_list(old, new, key)
+    return new if old != new else None
+
+
+class LiveDashboard:
+    """Shared dashboard snapshot with change-driven refresh and SSE fan-out"""
+
+    def __init__(self, debounce_seconds: float = 1, reconcile_seconds: float = 60):
+        self.debounce_seconds = debounce_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.loaders: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self.list_keys: Dict[str, Optional[str]] = {}
+        self.sources: Dict[str, Set[str]] = {}  # change source -> sections it feeds
+        self.snapshot: Dict[str, Any] = {}
+        self.version = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._dirty: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    def register(self, section: str, loader: Callable[[], Awaitable[Any]], sources: List[str], key: Optional[str] = None):
+        """
+        loader() returns the section's current value and must not block the
+        event loop; key identifies list items for diffs
+        """
+        self.loaders[section] = loader
+        self.list_keys[section] = key
+        for source in sources:
+            self.sources.setdefault(source, set()).add(section)
+
+    # --- Change notifications (any thread) ---
+
+    def notify(self, source: str):
+        sections = self.sources.get(source, set())
+        if not sections or self._loop is None or not self.subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._mark_dirty, sections)
+
+    def _mark_dirty(self, sections: Set[str]):
+        self._dirty |= sections
+        self._wakeup.set()
+
+    # --- Subscribers ---
+
+    async def subscribe(self) -> asyncio.Queue:
+        """Register a client; the first message queued is the full snapshot"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._refresh_lock = asyncio.Lock()
+
+        if not self.subscribers:
+            # Snapshot may be stale after an idle period
+            await self._refresh(set(self.loaders), broadcast=False)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        queue.put_nowait({"type": "snapshot", "version": self.version, "data": self.snapshot})
+        self.subscribers.add(queue)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def _broadcast(self, message: Dict[str, Any]):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop it; EventSource reconnects and gets a fresh snapshot
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    # --- Refresh loop ---
+
+    async def _refresh(self, sections: Set[str], broadcast: bool = True):
+        async with self._refresh_lock:
+            # Loaders run their queries off the event loop, so sections load concurrently
+            sections = list(sections)
+            values = await asyncio.gather(*(self.loaders[section]() for section in sections), return_exceptions=True)
+            changes = {}
+            for section, value in zip(sections, values):
+                if isinstance(value, Exception):
+                    # Keep the previous value rather than diffing an error into "everything removed"
+                    print(f"⚠️ Live dashboard could not refresh {section}: {value}")
+                    continue
+                # A section seen for the first time diffs against an empty one,
+                # so clients always receive the same delta shape
+                old = self.snapshot.get(section, type(value)() if isinstance(value, (dict, list)) else None)
+                delta = diff_section(old, value, self.list_keys[section])
+                self.snapshot[section] = value
+                if delta is not None:
+                    changes[section] = delta
+
+            if changes:
+                self.version += 1
+                if broadcast:
+                    self._broadcast({"type": "delta", "version": self.version, "changes": changes})
+
+    async def _run(self):
+        # Measured from the last full pass, not the last wakeup: a steady
+        # stream of notifications must not postpone the reconcile forever
+        last_reconcile = self._loop.time()
+        while self.subscribers:
+            timeout = max(0.0, last_reconcile + self.reconcile_seconds - self._loop.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                # Let a burst of writes (e.g. a bulk apply job) settle into one refresh
+                await asyncio.sleep(self.debounce_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            if self._loop.time() >= last_reconcile + self.reconcile_seconds:
+                self._dirty |= set(self.loaders)
+                last_reconcile = self._loop.time()
+
+            self._wakeup.clear()
+            sections, self._dirty = self._dirty, set()
+            if sections and self.subscribers:
+                await self._refresh(sections)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self.subscribers), "version": self.version, "sections": sorted(self.snapshot)}
+
+
+live_dashboard = LiveDashboard(DEBOUNCE_SECONDS, RECONCILE_SECONDS)
+add_invalidation_listener(live_dashboard.notify)
@@ -1,53 +1,56 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
+import asyncio
+import json
 from core.supabase_client import supabase
+from core.dashboard_stats import get_dashboard_stats as fetch_dashboard_stats
+from core.time_series import GRANULARITIES, application_series, bucket_step, truncate
+from admin.live_dashboard import live_dashboard
+from datetime import timedelta
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# The builders below raise on database errors; the endpoints turn that into
+# an empty fallback for the UI, while the live dashboard keeps its previous
+# snapshot instead of broadcasting the fallback as a change. The supabase
+# client is synchronous, so each builder runs its queries in a worker thread.
+
+def _dashboard_stats() -> Dict[str, Any]:
+    # Every counter from one aggregated, briefly cached query
+    stats = fetch_dashboard_stats()
+    by_status = stats["applications_by_status"]
+    total_farmers = stats["total_farmers"]
+    total_claims = sum(by_status.values())
+    pending_approvals = by_status.get("submitted", 0)
+    active_alerts = stats["active_alerts"]
+
+    # Disbursed amount: 'orders' total_price sum as a proxy for financial movement
+    disbursed_amount = stats["disbursed_amount"]
+    
+    # Format as Millions if large
+    disbursed_display = f"₹{disbursed_amount:,.0f}"
+    if disbursed_amount > 1000000:
+        disbursed_display = f"₹{disbursed_amount/1000000:.1f}M"
+
+    return {
+        "total_farmers": total_farmers,
+        "total_claims": total_claims,
+        "pending_approvals": pending_approvals,
+        "active_alerts": active_alerts,
+        "disbursed_amount": disbursed_display
+    }
+
+async def build_dashboard_stats() -> Dict[str, Any]:
+    return await asyncio.to_thread(_dashboard_stats)
+
 @router.get("/dashboard-stats")
 async def get_dashboard_stats():
     """
     Fetch consolidated stats for the Admin Dashboard.
     """
     try:
-        # 1. Total Farmers
-        # Try farmer_profiles first, fallback to users count if table empty or error
-        farmers_res = supabase.table("farmer_profiles").select("id", count="exact").execute()
-        total_farmers = farmers_res.count if farmers_res.count is not None else 0
-        
-        # 2. Total Claims / Scheme Applications
-        claims_res = supabase.table("scheme_applications").select("id", count="exact").execute()
-        total_claims = claims_res.count if claims_res.count is not None else 0
-        
-        # 3. Pending Approvals
-        pending_res = supabase.table("scheme_applications").select("id", count="exact").eq("status", "submitted").execute()
-        pending_approvals = pending_res.count if pending_res.count is not None else 0
-        
-        # 4. Active Alerts / Risk Events
-        alerts_res = supabase.table("risk_events").select("id", count="exact").in_("status", ["ACTIVE", "CLAIM_INITIATED"]).execute()
-        active_alerts = alerts_res.count if alerts_res.count is not None else 0
-
-        # 5. Disbursed Amount (Mock or sum from orders if available)
-        # Using 'orders' total_price sum for now as a proxy for financial movement
-        # Or ideally check a 'payments' table if it existed.
-        orders_res = supabase.table("orders").select("total_price").execute()
-        disbursed_amount = 0
-        if orders_res.data:
-            disbursed_amount = sum(float(order.get("total_price", 0)) for order in orders_res.data)
-        
-        # Format as Millions if large
-        disbursed_display = f"₹{disbursed_amount:,.0f}"
-        if disbursed_amount > 1000000:
-            disbursed_display = f"₹{disbursed_amount/1000000:.1f}M"
-
-        return {
-            "total_farmers": total_farmers,
-            "total_claims": total_claims,
-            "pending_approvals": pending_approvals,
-            "active_alerts": active_alerts,
-            "disbursed_amount": disbursed_display
-        }
-
+        return await build_dashboard_stats()
     except Exception as e:
         print(f"Error fetching dashboard stats: {e}")
         # Return fallback zeros so UI doesn't crash
@@ -59,138 +62,181 @@ async def get_dashboard_stats():
             "disbursed_amount": "₹0"
         }
 
+def _recent_claims() -> List[Dict[str, Any]]:
+    # Fetch applications
+    response = supabase.table("scheme_applications")\
+        .select("*, farmer_profiles(name, district)")\
+        .order("created_at", desc=True)\
+        .limit(10)\
+        .execute()
+    
+    claims = []
+    for item in response.data:
+        details = item.get("application_details") or {}
+        
+        # Determine Farmer Name: Joined Profile > Details JSON > User ID > Default
+        farmer_name = "Unknown Farmer"
+        if item.get("farmer_profiles") and item.get("farmer_profiles").get("name"):
+            farmer_name = item.get("farmer_profiles").get("name")
+        elif details.get("applicant_name"):
+             farmer_name = details.get("applicant_name")
+        
+        # Determine Amount
+        amount = details.get("subsidy_amount", "₹--")
+        
+        claims.append({
+            "id": item.get("id"),
+            "farmer": farmer_name,
+            "type": item.get("scheme_name", "General Scheme"),
+            "amount": amount,
+            "date": item.get("created_at", "").split("T")[0],
+            "status": item.get("status", "Pending")
+        })
+        
+    return claims
+
+async def build_recent_claims() -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(_recent_claims)
+
 @router.get("/recent-claims")
 async def get_recent_claims():
     """
     Fetch recently submitted schemes/claims with detailed info.
     """
     try:
-        # Fetch applications
-        response = supabase.table("scheme_applications")\
-            .select("*, farmer_profiles(name, district)")\
-            .order("created_at", desc=True)\
-            .limit(10)\
-            .execute()
-        
-        claims = []
-        for item in response.data:
-            details = item.get("application_details") or {}
-            
-            # Determine Farmer Name: Joined Profile > Details JSON > User ID > Default
-            farmer_name = "Unknown Farmer"
-            if item.get("farmer_profiles") and item.get("farmer_profiles").get("name"):
-                farmer_name = item.get("farmer_profiles").get("name")
-            elif details.get("applicant_name"):
-                 farmer_name = details.get("applicant_name")
-            
-            # Determine Amount
-            amount = details.get("subsidy_amount", "₹--")
-            
-            claims.append({
-                "id": item.get("id"),
-                "farmer": farmer_name,
-                "type": item.get("scheme_name", "General Scheme"),
-                "amount": amount,
-                "date": item.get("created_at", "").split("T")[0],
-                "status": item.get("status", "Pending")
-            })
-            
-        return claims
-
+        return await build_recent_claims()
     except Exception as e:
         print(f"Error fetching recent claims: {e}")
         return []
 
+def _chart_data(days: int, granularity: str) -> List[Dict[str, Any]]:
+    # Window: the last `days` days, ending with the bucket that contains now
+    now = application_series.now()
+    end = truncate(now, granularity) + bucket_step(granularity)
+    start = truncate(now - timedelta(days=days - 1), "day")
+
+    series = application_series.series(start, end, granularity)
+
+    # Format for chart
+    chart_data = []
+    for point in series:
+        bucket = point["bucket"]
+        if granularity == "hour":
+            name, full_date = bucket.strftime("%a %H:00"), bucket.isoformat()
+        elif granularity == "day":
+            name, full_date = bucket.strftime("%a"), bucket.date().isoformat()  # "Mon", "Tue" etc.
+        else:
+            name, full_date = bucket.strftime("%d %b"), bucket.date().isoformat()
+
+        chart_data.append({
+            "name": name,
+            "fullDate": full_date,
+            "claims": point["claims"],
+            "processed": point["processed"]
+        })
+
+    return chart_data
+
+async def build_chart_data(days: int = 7, granularity: str = "day") -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(_chart_data, days, granularity)
+
 @router.get("/dashboard-chart")
-async def get_dashboard_chart_data():
+async def get_dashboard_chart_data(days: int = 7, granularity: str = "day"):
     """
-    Get dynamic graph data for claims velocity aggregated by date.
+    Get dynamic graph data for claims velocity aggregated by time bucket.
+    days: window ending with the current bucket; granularity: hour, day or week.
     """
-    try:
-        from datetime import datetime, timedelta
-        from collections import defaultdict
-
-        # Calculate date range (last 7 days)
-        today = datetime.now().date()
-        date_labels = []
-        for i in range(6, -1, -1):
-            date_labels.append((today - timedelta(days=i)).isoformat())
-
-        # Fetch claims created in last 7 days
-        start_date = date_labels[0]
-        
-        # Claims (Submitted)
-        claims_res = supabase.table("scheme_applications")\
-            .select("created_at")\
-            .gte("created_at", start_date)\
-            .execute()
-            
-        # Processed (Approved/Rejected)
-        processed_res = supabase.table("scheme_applications")\
-            .select("updated_at")\
-            .gte("updated_at", start_date)\
-            .in_("status", ["approved", "rejected", "completed"])\
-            .execute()
-
-        # Aggregate counts
-        claims_count = defaultdict(int)
-        processed_count = defaultdict(int)
-
-        for item in claims_res.data:
-            date_str = item["created_at"].split("T")[0]
-            claims_count[date_str] += 1
-            
-        for item in processed_res.data:
-            date_str = item["updated_at"].split("T")[0]
-            processed_count[date_str] += 1
-
-        # Format for chart
-        chart_data = []
-        for date_str in date_labels:
-            # Format label as "Mon", "Tue" etc.
-            dt = datetime.fromisoformat(date_str)
-            day_name = dt.strftime("%a") 
-            
-            chart_data.append({
-                "name": day_name,
-                "fullDate": date_str,
-                "claims": claims_count[date_str],
-                "processed": processed_count[date_str]
-            })
-
-        return chart_data
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if not 1 <= days <= 366:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 366")
 
+    try:
+        return await build_chart_data(days, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error generating chart data: {e}")
         # Fallback to empty structure
         return []
 
+def _risk_alerts() -> List[Dict[str, Any]]:
+    response = supabase.table("risk_events")\
+        .select("*")\
+        .eq("status", "ACTIVE")\
+        .order("created_at", desc=True)\
+        .limit(5)\
+        .execute()
+        
+    alerts = []
+    for item in response.data:
+        # Parse details safely
+        details = item.get("details") or {}
+        
+        alerts.append({
+            "id": item.get("id"),
+            "type": item.get("risk_level", "Unknown Risk"),
+            "location": details.get("location", "Unknown Region"),
+            "message": details.get("description", "Potential crop risk detected.")
+        })
+        
+    return alerts
+
+async def build_risk_alerts() -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(_risk_alerts)
+
 @router.get("/risk-heatmap")
 async def get_risk_heatmap():
     """
     Get active risks for the heatmap/alert section.
     """
     try:
-        response = supabase.table("risk_events")\
-            .select("*")\
-            .eq("status", "ACTIVE")\
-            .order("created_at", desc=True)\
-            .limit(5)\
-            .execute()
-            
-        alerts = []
-        for item in response.data:
-            # Parse details safely
-            details = item.get("details") or {}
-            
-            alerts.append({
-                "id": item.get("id"),
-                "type": item.get("risk_level", "Unknown Risk"),
-                "location": details.get("location", "Unknown Region"),
-                "message": details.get("description", "Potential crop risk detected.")
-            })
-            
-        return alerts
+        return await build_risk_alerts()
     except Exception as e:
         print(f"Error fetching alerts: {e}")
         return []
+
+
+# Sections pushed over /admin/live and the change sources each one depends on
+live_dashboard.register("stats", build_dashboard_stats, ["applications", "risk_events", "orders"])
+live_dashboard.register("recent_claims", build_recent_claims, ["applications"], key="id")
+live_dashboard.register("chart", build_chart_data, ["applications"], key="fullDate")
+live_dashboard.register("risk_heatmap", build_risk_alerts, ["risk_events"], key="id")
+
+LIVE_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/live")
+async def live_dashboard_stream():
+    """
+    Server-sent events for the admin dashboard: one "snapshot" event with every
+    section, then "delta" events carrying only what changed. Replaces polling
+    the four endpoints above; all connected admins share one snapshot.
+    """
+    queue = await live_dashboard.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    # Dropped for falling behind; the client reconnects for a fresh snapshot
+                    return
+                yield f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            live_dashboard.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/live/stats")
+async def live_dashboard_stats():
+    return live_dashboard.stats()
@@ -0,0 +1,172 @@
+"""
+Aggregated application and dashboard statistics.
+
+All counters (applications per status, farmers, active alerts, disbursed
+amount) come from the dashboard_stats() RPC (database/dashboard_stats.sql)
+in a single round trip and are cached for DASHBOARD_STATS_TTL_SECONDS.
+Code that changes applications calls invalidate_dashboard_stats() so the
+next read is fresh. A status change also drops the cached chart buckets in
+core.time_series, since it moves an application's updated_at (the
+"processed" series) out of an already closed bucket; new applications only
+land in the open bucket, which is never cached, so creating them leaves the
+chart cache alone. If the RPC is not deployed yet, the counters are
+computed with the per-table queries it replaces.
+"""
+import os
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from core.supabase_client import supabase
+from core.time_series import application_series
+
+STATS_TTL_SECONDS = float(os.getenv("DASHBOARD_STATS_TTL_SECONDS", "30"))
+
+APPLICATION_STATUSES = ["submitted", "under_review", "approved", "rejected", "completed"]
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "applications_by_status": {},
+        "total_farmers": 0,
+        "active_alerts": 0,
+        "disbursed_amount": 0.0
+    }
+
+
+def _fetch_via_rpc() -> Dict[str, Any]:
+    data = supabase.rpc("dashboard_stats").execute().data
+    return {
+        "applications_by_status": {k: int(v) for k, v in (data.get("applications_by_status") or {}).items()},
+        "total_farmers": int(data.get("total_farmers") or 0),
+        "active_alerts": int(data.get("active_alerts") or 0),
+        "disbursed_amount": float(data.get("disbursed_amount") or 0)
+    }
+
+
+def _fetch_via_queries() -> Dict[str, Any]:
+    """Fallback for databases without the RPC; each counter degrades to 0 on its own"""
+    stats = _empty_stats()
+    try:
+        rows = supabase.table("scheme_applications").select("status").execute().data or []
+        for row in rows:
+            status = row.get("status") or "unknown"
+            stats["applications_by_status"][status] = stats["applications_by_status"].get(status, 0) + 1
+    except Exception as e:
+        print(f"⚠️ Could not count applications: {e}")
+    try:
+        stats["total_farmers"] = supabase.table("farmer_profiles").select("id", count="exact").limit(1).execute().count or 0
+    except Exception as e:
+        print(f"⚠️ Could not count farmers: {e}")
+    try:
+        stats["active_alerts"] = supabase.table("risk_events").select("id", count="exact")\
+            .in_("status", ["ACTIVE", "CLAIM_INITIATED"]).limit(1).execute().count or 0
+    except Exception as e:
+        print(f"⚠️ Could not count alerts: {e}")
+    try:
+        orders = supabase.table("orders").select("total_price").execute().data or []
+        stats["disbursed_amount"] = sum(float(order.get("total_price") or 0) for order in orders)
+    except Exception as e:
+        print(f"⚠️ Could not sum orders: {e}")
+    return stats
+
+
+def _fetch() -> Dict[str, Any]:
+    try:
+        return _fetch_via_rpc()
+    except Exception as e:
+        print(f"⚠️ dashboard_stats RPC unavailable ({e}), using per-table queries")
+        return _fetch_via_queries()
+
+
+class DashboardStatsCache:
+    """TTL cache around the stats query; concurrent misses share one fetch"""
+
+    def __init__(self, ttl_seconds: float = 30):
+        self.ttl_seconds = ttl_seconds
+        self._value = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._inflight: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, Any]:
+        # The lock only guards the cache state; the fetch itself runs outside
+        # it, so cache hits never wait behind a slow query
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value
+            future = self._inflight
+            if future is not None:
+                owner = False
+            else:
+                owner = True
+                future = self._inflight = Future()
+                generation = self._generation
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = _fetch()
+        except BaseException as e:
+            with self._lock:
+                if self._inflight is future:
+                    self._inflight = None
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # Don't cache a result that an invalidation raced with
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            if self._inflight is future:
+                self._inflight = None
+        future.set_result(value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._expires_at = 0.0
+            # Readers from now on start a fresh fetch instead of joining one
+            # that may predate the change
+            self._inflight = None
+
+
+dashboard_stats_cache = DashboardStatsCache(STATS_TTL_SECONDS)
+
+
+def get_dashboard_stats() -> Dict[str, Any]:
+    return dashboard_stats_cache.get()
+
+
+def get_application_counts() -> Dict[str, int]:
+    """Applications in total and per known status (0 for statuses with no rows)"""
+    by_status = get_dashboard_stats()["applications_by_status"]
+    counts = {"total": sum(by_status.values())}
+    for status in APPLICATION_STATUSES:
+        counts[status] = by_status.get(status, 0)
+    return counts
+
+
+_invalidation_listeners: List[Callable[[str], None]] = []
+
+
+def add_invalidation_listener(listener: Callable[[str], None]):
+    """listener(source) runs after every invalidation (e.g. to push live dashboard updates)"""
+    _invalidation_listeners.append(listener)
+
+
+def invalidate_dashboard_stats(source: str = "applications", status_change: bool = False):
+    """Call after creating applications or (status_change=True) changing their status"""
+    dashboard_stats_cache.invalidate()
+    if source == "applications" and status_change:
+        application_series.invalidate()
+    for listener in list(_invalidation_listeners):
+        try:
+            listener(source)
+        except Exception as e:
+            print(f"⚠️ Dashboard invalidation listener failed: {e}")
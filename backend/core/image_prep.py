@@ -0,0 +1,215 @@
+"""
+Image preparation before vision-model calls.
+
+Phone photos arrive as multi-megabyte JPEG/PNG/HEIC-style uploads with
+EXIF orientation and metadata (including GPS). Before an image is sent to
+Gemini it is:
+  - rotated upright from its EXIF orientation
+  - downsized so its longest edge is at most VISION_IMAGE_MAX_EDGE
+    (JPEGs are decoded directly at reduced scale)
+  - re-encoded as JPEG or WebP (VISION_IMAGE_FORMAT) at VISION_IMAGE_QUALITY
+    (PNG scans stay lossless PNG when the caller asks for keep_png)
+  - stripped of all metadata
+A JPEG or PNG that is already upright and small enough is not worth a
+lossy second generation: if the re-encode isn't smaller, the original is
+sent with its metadata segments (EXIF, XMP, IPTC, text chunks) cut out
+losslessly instead. Bytes in/out and preparation time are recorded per
+source. Anything that is not a decodable image (PDFs, text) is passed
+through unchanged.
+"""
+import io
+import os
+import time
+import struct
+import threading
+from typing import Any, Dict, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    print("⚠️ Pillow not installed; images are sent to vision models unprocessed")
+
+MAX_EDGE = int(os.getenv("VISION_IMAGE_MAX_EDGE", "1600"))
+OUTPUT_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+EXIF_ORIENTATION = 0x0112
+
+
+def _strip_jpeg_metadata(data: bytes) -> bytes:
+    """JPEG without EXIF/XMP (APP1), IPTC (APP13), comments and other APPn segments; pixels untouched"""
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("not a JPEG")
+    out = [data[:2]]
+    pos = 2
+    while pos < len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("malformed JPEG segment")
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # Start of scan: the rest is image data
+            out.append(data[pos:])
+            return b"".join(out)
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        segment = data[pos:pos + 2 + length]
+        # Keep JFIF (APP0), ICC profiles (APP2) and Adobe color info (APP14)
+        is_metadata = marker == 0xFE or (0xE1 <= marker <= 0xEF and marker != 0xEE and not (
+            marker == 0xE2 and segment[4:15] == b"ICC_PROFILE"))
+        if not is_metadata:
+            out.append(segment)
+        pos += 2 + length
+    raise ValueError("JPEG has no image data")
+
+
+_PNG_METADATA_CHUNKS = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+
+
+def _strip_png_metadata(data: bytes) -> bytes:
+    """PNG without EXIF and text chunks; pixels untouched"""
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("not a PNG")
+    out = [data[:8]]
+    pos = 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        end = pos + 12 + length
+        if end > len(data):
+            raise ValueError("truncated PNG chunk")
+        if chunk_type not in _PNG_METADATA_CHUNKS:
+            out.append(data[pos:end])
+        pos = end
+        if chunk_type == b"IEND":
+            break
+    return b"".join(out)
+
+
+_METADATA_STRIPPERS = {"JPEG": _strip_jpeg_metadata, "PNG": _strip_png_metadata}
+
+
+class ImagePrepMetrics:
+    """Per-source counters of images prepared and bytes saved"""
+
+    def __init__(self):
+        self._sources: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, bytes_in: int, bytes_out: int, elapsed_ms: float, prepared: bool,
+               kept_original: bool = False):
+        with self._lock:
+            entry = self._sources.setdefault(source, {
+                "images": 0, "passed_through": 0, "originals_kept": 0, "bytes_in": 0, "bytes_out": 0, "prep_ms_total": 0.0
+            })
+            entry["images"] += 1
+            entry["passed_through"] += 0 if prepared else 1
+            entry["originals_kept"] += 1 if kept_original else 0
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["prep_ms_total"] += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for source, entry in self._sources.items():
+                saved = entry["bytes_in"] - entry["bytes_out"]
+                result[source] = {
+                    "images": entry["images"],
+                    "passed_through": entry["passed_through"],
+                    "originals_kept": entry["originals_kept"],
+                    "bytes_in": entry["bytes_in"],
+                    "bytes_out": entry["bytes_out"],
+                    "bytes_saved": saved,
+                    "savings_percent": round(saved / entry["bytes_in"] * 100, 1) if entry["bytes_in"] else 0.0,
+                    "avg_prep_ms": round(entry["prep_ms_total"] / entry["images"], 1)
+                }
+            return result
+
+
+image_prep_metrics = ImagePrepMetrics()
+
+
+def _encode(image, output_format: str, quality: int) -> bytes:
+    if output_format == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # JPEG has no alpha: flatten onto white
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+    elif output_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    elif output_format == "PNG" and image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    # No exif/icc/xmp arguments, and nothing Pillow would copy over from the source
+    # (it re-writes a JPEG comment from image.info): the output carries no metadata
+    image.info = {k: v for k, v in image.info.items() if k not in ("comment", "exif", "xmp")}
+    buffer = io.BytesIO()
+    if output_format == "JPEG":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif output_format == "PNG":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def prepare_image(
+    data: bytes,
+    mime_type: str = "image/jpeg",
+    source: str = "default",
+    max_edge: int = MAX_EDGE,
+    output_format: str = OUTPUT_FORMAT,
+    quality: int = QUALITY,
+    keep_png: bool = False
+) -> Tuple[bytes, str]:
+    """
+    (bytes, mime_type) to send to a vision model; unchanged if not a decodable
+    image. keep_png re-encodes PNG input as PNG (lossless, for text-heavy scans).
+    """
+    started = time.perf_counter()
+    if Image is None or (mime_type and not mime_type.startswith("image/")):
+        image_prep_metrics.record(source, len(data), len(data), 0.0, prepared=False)
+        return data, mime_type
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        upright = image.getexif().get(EXIF_ORIENTATION, 1) == 1
+        fits = max(image.size) <= max_edge
+        if keep_png and source_format == "PNG":
+            output_format = "PNG"
+        # JPEG: decode at the smallest DCT scale that is still >= max_edge
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        prepared = _encode(image, output_format, quality)
+        prepared_mime_type = _MIME_TYPES.get(output_format, "image/jpeg")
+    except Exception as e:
+        print(f"⚠️ Image preparation skipped ({source}): {e}")
+        image_prep_metrics.record(source, len(data), len(data), (time.perf_counter() - started) * 1000, prepared=False)
+        return data, mime_type
+
+    # Nothing to rotate or shrink: keep the original pixels if re-encoding doesn't pay
+    kept_original = False
+    if upright and fits and source_format in _METADATA_STRIPPERS:
+        try:
+            original = _METADATA_STRIPPERS[source_format](data)
+            if len(original) <= len(prepared):
+                prepared, prepared_mime_type, kept_original = original, _MIME_TYPES[source_format], True
+        except (ValueError, struct.error) as e:
+            print(f"⚠️ Could not strip metadata losslessly ({source}), sending the re-encoded image: {e}")
+
+    image_prep_metrics.record(source, len(data), len(prepared), (time.perf_counter() - started) * 1000,
+                              prepared=True, kept_original=kept_original)
+    return prepared, prepared_mime_type
+
+
+def get_image_prep_stats() -> Dict[str, Any]:
+    return image_prep_metrics.stats()
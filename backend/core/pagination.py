@@ -0,0 +1,59 @@
+"""
+Keyset (cursor) pagination for Supabase/PostgREST queries.
+
+Rows are ordered newest first on (created_at, id) and a page continues
+strictly after the last row of the previous one. Unlike offset paging,
+every page is an index range scan, however deep the client pages.
+The cursor is an opaque url-safe token carrying that (created_at, id).
+"""
+import json
+import uuid
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    (created_at, id) from a cursor, re-serialized from a parsed timestamp and
+    UUID: the values end up inside a PostgREST filter, so nothing else from
+    the client may reach it
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(row_id))
+    except Exception as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+
+def keyset_page(query, limit: int, cursor: Optional[str] = None):
+    """
+    Order query newest first and restrict it to the page after cursor.
+    Fetches one extra row so the caller can tell whether a next page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # (created_at, id) < (cursor.created_at, cursor.id), spelled out for PostgREST
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+        )
+    return query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1)
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the look-ahead row; returns (page, next_cursor or None)"""
+    rows = rows or []
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
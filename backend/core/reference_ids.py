@@ -0,0 +1,131 @@
+"""
+Collision-free reference numbers.
+
+Each id packs milliseconds since 2024-01-01, a node id and a per-millisecond
+sequence into 63 bits (Snowflake layout), rendered as fixed-width Crockford
+base32 so references sort by creation time:
+
+    SA-2026-0A93YXGRTNC00
+
+Two generators only collide if they share a node id. In multi-process or
+multi-instance deployments, give every server process its own
+REFERENCE_NODE_ID (0-1023); that is the only hard guarantee. Without it
+the node id is derived from the hostname and pid, and with 1024 slots two
+processes can land on the same one, so inserts go through
+insert_with_reference, which retries with a fresh reference on a unique
+violation. No database round trip is needed to allocate a reference, and
+a batch of any size is reserved with one lock acquisition.
+"""
+import os
+import time
+import zlib
+import socket
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Tuple
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford: no I, L, O, U
+_WIDTH = 13  # ceil(63 / 5)
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(_WIDTH):
+        value, digit = divmod(value, 32)
+        chars.append(_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+REFERENCE_INSERT_ATTEMPTS = int(os.getenv("REFERENCE_INSERT_ATTEMPTS", "3"))
+
+
+def _default_node_id() -> int:
+    configured = os.getenv("REFERENCE_NODE_ID")
+    if configured is not None:
+        return int(configured) & MAX_NODE_ID
+    node_id = zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_NODE_ID
+    print(f"⚠️ REFERENCE_NODE_ID not set; using derived node id {node_id}, which may be shared "
+          f"with another process (set a unique REFERENCE_NODE_ID per process)")
+    return node_id
+
+
+class ReferenceIdGenerator:
+    """Time-ordered, node-unique reference numbers like SA-2026-0A93YXGRTNC00"""
+
+    def __init__(self, prefix: str, node_id: int = None):
+        self.prefix = prefix
+        self._fixed_node_id = node_id
+        self._node_id = None
+        self._pid = None
+        self._last_ms = 0
+        self._sequence = -1
+        self._lock = threading.Lock()
+
+    def _ensure_node(self):
+        # Forked workers (e.g. gunicorn --preload) must not share the parent's node id
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._node_id = self._fixed_node_id if self._fixed_node_id is not None else _default_node_id()
+            self._last_ms = 0
+            self._sequence = -1
+
+    def _format(self, ms: int, sequence: int, year: int) -> str:
+        value = ((ms - EPOCH_MS) << (NODE_BITS + SEQUENCE_BITS)) | (self._node_id << SEQUENCE_BITS) | sequence
+        return f"{self.prefix}-{year}-{_encode(value)}"
+
+    def allocate(self, count: int) -> List[str]:
+        """Reserve count references; consecutive, so a batch sorts in allocation order"""
+        slots = []
+        with self._lock:
+            self._ensure_node()
+            # Never move backwards, even if the wall clock does
+            ms = max(int(time.time() * 1000), self._last_ms)
+            sequence = self._sequence + 1 if ms == self._last_ms else 0
+            for _ in range(count):
+                if sequence > MAX_SEQUENCE:
+                    # Sequence exhausted for this millisecond: borrow the next one
+                    ms += 1
+                    sequence = 0
+                slots.append((ms, sequence))
+                sequence += 1
+            if slots:
+                self._last_ms, self._sequence = slots[-1]
+        years = {ms: datetime.fromtimestamp(ms / 1000, tz=timezone.utc).year for ms in {slot[0] for slot in slots}}
+        return [self._format(ms, sequence, years[ms]) for ms, sequence in slots]
+
+    def next(self) -> str:
+        return self.allocate(1)[0]
+
+
+scheme_reference_ids = ReferenceIdGenerator("SA")
+agri_reference_ids = ReferenceIdGenerator("AGR")
+
+
+def is_unique_violation(error: Exception) -> bool:
+    """True for a Postgres unique-constraint error as raised through PostgREST"""
+    return getattr(error, "code", None) == "23505" or "duplicate key value" in str(error)
+
+
+def insert_with_reference(
+    generator: ReferenceIdGenerator,
+    insert: Callable[[str], Any],
+    attempts: int = REFERENCE_INSERT_ATTEMPTS
+) -> Tuple[Any, str]:
+    """
+    (insert(reference_no) result, reference_no). A unique violation (another
+    process shared this node id) is retried with a fresh reference.
+    """
+    for attempt in range(1, attempts + 1):
+        reference_no = generator.next()
+        try:
+            return insert(reference_no), reference_no
+        except Exception as e:
+            if attempt == attempts or not is_unique_violation(e):
+                raise
+            print(f"⚠️ Reference {reference_no} already taken, retrying with a new one")
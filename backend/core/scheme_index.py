@@ -0,0 +1,112 @@
+"""
+Inverted index over a scheme catalogue.
+
+Shared by the Feature 4 agent tools and the Feature 5 subsidy service.
+The index is built once from a list of records and rebuilt when the
+catalogue's fingerprint changes. It holds:
+  - an id index (exact lookup)
+  - one inverted index per facet (state, category, crop, equipment, ...)
+  - a token index over free text
+
+Facet lookups scan only the distinct facet values (a few dozen states or
+equipment types), never the schemes themselves, so substring-style
+matching stays cheap as catalogues grow to thousands of schemes.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class SchemeIndex:
+    """Id, facet and token indexes over a list of scheme records"""
+
+    def __init__(
+        self,
+        id_fn: Callable[[Any], Optional[str]],
+        facets: Dict[str, Callable[[Any], Iterable[str]]],
+        text_fn: Optional[Callable[[Any], str]] = None
+    ):
+        self.id_fn = id_fn
+        self.facet_fns = facets
+        self.text_fn = text_fn
+        self.fingerprint = None
+        self.version = 0  # bumped on every rebuild, for caches derived from the index
+        # (records, by_id, facets, tokens), swapped as one object on rebuild
+        self._snapshot = ([], {}, {name: {} for name in facets}, {})
+        self._lock = threading.Lock()
+
+    @property
+    def records(self) -> List[Any]:
+        return self._snapshot[0]
+
+    def rebuild(self, records: Iterable[Any], fingerprint=None):
+        """(Re)build every index from scratch"""
+        records = list(records)
+        by_id: Dict[str, int] = {}
+        facets: Dict[str, Dict[str, Set[int]]] = {name: {} for name in self.facet_fns}
+        tokens: Dict[str, Set[int]] = {}
+
+        for pos, record in enumerate(records):
+            record_id = self.id_fn(record)
+            if record_id is not None:
+                by_id[record_id] = pos
+            for name, fn in self.facet_fns.items():
+                for value in fn(record) or []:
+                    facets[name].setdefault(value.strip().lower(), set()).add(pos)
+            if self.text_fn:
+                for token in tokenize(self.text_fn(record)):
+                    tokens.setdefault(token, set()).add(pos)
+
+        self._snapshot = (records, by_id, facets, tokens)
+        self.fingerprint = fingerprint
+        self.version += 1
+
+    def ensure_current(self, records_fn: Callable[[], Iterable[Any]], fingerprint):
+        """Rebuild if the catalogue changed since the last build"""
+        if fingerprint != self.fingerprint:
+            with self._lock:
+                if fingerprint != self.fingerprint:
+                    self.rebuild(records_fn(), fingerprint)
+
+    # --- Lookups (return sets of positions) ---
+
+    def all(self) -> Set[int]:
+        return set(range(len(self.records)))
+
+    def get(self, record_id: str) -> Optional[Any]:
+        records, by_id, _, _ = self._snapshot
+        pos = by_id.get(record_id)
+        return records[pos] if pos is not None else None
+
+    def facet(self, name: str, value: str) -> Set[int]:
+        """Schemes whose facet equals value (case-insensitive)"""
+        return set(self._snapshot[2][name].get((value or "").strip().lower(), ()))
+
+    def facet_matching(self, name: str, predicate: Callable[[str], bool]) -> Set[int]:
+        """Schemes with any facet value satisfying predicate (checked once per distinct value)"""
+        result: Set[int] = set()
+        for value, positions in self._snapshot[2][name].items():
+            if predicate(value):
+                result |= positions
+        return result
+
+    def text(self, query: str) -> Set[int]:
+        """Schemes containing every token of query"""
+        result = None
+        tokens = self._snapshot[3]
+        for token in tokenize(query):
+            positions = tokens.get(token, set())
+            result = set(positions) if result is None else result & positions
+            if not result:
+                return set()
+        return result if result is not None else self.all()
+
+    def select(self, positions: Iterable[int]) -> List[Any]:
+        """Records for positions, in catalogue order"""
+        return [self.records[pos] for pos in sorted(positions)]
@@ -0,0 +1,209 @@
+"""
+Time-bucketed aggregation for dashboard charts.
+
+Counting is pushed into the database (an RPC doing date_trunc + GROUP BY,
+see database/application_time_series.sql), so a chart costs one round
+trip per range and never downloads raw rows. Buckets that have closed are
+cached; on later requests only the open bucket (the one containing "now")
+and any uncached buckets are recomputed, so month- or season-long charts
+refresh as cheaply as a seven-day one.
+
+Closed buckets are not immutable: "processed" is bucketed on updated_at,
+which moves when an application changes status again. Status changes in
+this process clear the cache through invalidate_dashboard_stats(); writes
+made elsewhere show up once the closed-bucket TTL runs out.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from core.supabase_client import supabase
+
+GRANULARITIES = ("hour", "day", "week")
+MAX_BUCKETS = 1000
+DASHBOARD_TIMEZONE = os.getenv("DASHBOARD_TIMEZONE", "UTC")
+
+
+def truncate(dt: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing dt (same rules as Postgres date_trunc; weeks start Monday)"""
+    if granularity == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+def bucket_step(granularity: str) -> timedelta:
+    return {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}[granularity]
+
+
+def bucket_starts(start: datetime, end: datetime, granularity: str) -> List[datetime]:
+    step = bucket_step(granularity)
+    buckets = []
+    bucket = truncate(start, granularity)
+    while bucket < end:
+        buckets.append(bucket)
+        bucket += step
+    return buckets
+
+
+class TimeSeriesAggregator:
+    """
+    Counts per time bucket from a database RPC, with closed buckets cached.
+
+    rpc_name is called with p_start, p_end (local, naive ISO), p_granularity
+    and p_tz and must return rows of {"bucket": ..., <metric>: count, ...}.
+    fallback(start, end, granularity, tz) computes the same rows client-side
+    when the RPC is not deployed.
+    """
+
+    def __init__(
+        self,
+        rpc_name: str,
+        metrics: List[str],
+        fallback: Optional[Callable] = None,
+        tz_name: str = "UTC",
+        closed_ttl_seconds: float = 3600,
+        max_cached_buckets: int = 20000
+    ):
+        self.rpc_name = rpc_name
+        self.metrics = metrics
+        self.fallback = fallback
+        self.tz = ZoneInfo(tz_name)
+        self.closed_ttl_seconds = closed_ttl_seconds
+        self.max_cached_buckets = max_cached_buckets
+        self._cache: "OrderedDict[Tuple[str, datetime], Tuple[float, Dict[str, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz).replace(tzinfo=None)
+
+    def _cached(self, granularity: str, bucket: datetime) -> Optional[Dict[str, int]]:
+        key = (granularity, bucket)
+        entry = self._cache.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _store(self, granularity: str, bucket: datetime, values: Dict[str, int]):
+        self._cache[(granularity, bucket)] = (time.monotonic() + self.closed_ttl_seconds, values)
+        self._cache.move_to_end((granularity, bucket))
+        while len(self._cache) > self.max_cached_buckets:
+            self._cache.popitem(last=False)
+
+    def _fetch(self, start: datetime, end: datetime, granularity: str) -> Dict[datetime, Dict[str, int]]:
+        try:
+            rows = supabase.rpc(self.rpc_name, {
+                "p_start": start.isoformat(),
+                "p_end": end.isoformat(),
+                "p_granularity": granularity,
+                "p_tz": self.tz.key
+            }).execute().data or []
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            print(f"⚠️ {self.rpc_name} RPC unavailable ({e}), bucketing rows client-side")
+            rows = self.fallback(start, end, granularity, self.tz)
+
+        result = {}
+        for row in rows:
+            bucket = row["bucket"]
+            if isinstance(bucket, str):
+                bucket = datetime.fromisoformat(bucket)
+            result[bucket.replace(tzinfo=None)] = {m: int(row.get(m) or 0) for m in self.metrics}
+        return result
+
+    def series(self, start: datetime, end: datetime, granularity: str) -> List[Dict]:
+        """One row per bucket in [start, end) (naive local times), zero-filled"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        buckets = bucket_starts(start, end, granularity)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"At most {MAX_BUCKETS} buckets per request")
+
+        step = bucket_step(granularity)
+        open_bucket = truncate(self.now(), granularity)
+        values: Dict[datetime, Dict[str, int]] = {}
+
+        with self._lock:
+            missing = []
+            for bucket in buckets:
+                cached = self._cached(granularity, bucket) if bucket < open_bucket else None
+                if cached is None:
+                    missing.append(bucket)
+                else:
+                    values[bucket] = cached
+            self.hits += len(buckets) - len(missing)
+            self.misses += len(missing)
+
+        # One query per contiguous run of buckets that need computing
+        runs: List[List[datetime]] = []
+        for bucket in missing:
+            if runs and bucket - runs[-1][-1] == step:
+                runs[-1].append(bucket)
+            else:
+                runs.append([bucket])
+
+        zero = {m: 0 for m in self.metrics}
+        for run in runs:
+            fetched = self._fetch(run[0], run[-1] + step, granularity)
+            with self._lock:
+                for bucket in run:
+                    values[bucket] = fetched.get(bucket, zero)
+                    if bucket < open_bucket:
+                        self._store(granularity, bucket, values[bucket])
+
+        return [{"bucket": bucket, **values[bucket]} for bucket in buckets]
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"cached_buckets": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def _to_utc_iso(local: datetime, tz: ZoneInfo) -> str:
+    return local.replace(tzinfo=tz).astimezone(timezone.utc).isoformat()
+
+
+def _application_rows_fallback(start: datetime, end: datetime, granularity: str, tz: ZoneInfo) -> List[Dict]:
+    """Client-side version of application_time_series (downloads timestamps in range)"""
+    start_utc, end_utc = _to_utc_iso(start, tz), _to_utc_iso(end, tz)
+    counts: Dict[datetime, Dict[str, int]] = {}
+
+    def add(timestamp: str, metric: str):
+        local = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(tz).replace(tzinfo=None)
+        row = counts.setdefault(truncate(local, granularity), {"claims": 0, "processed": 0})
+        row[metric] += 1
+
+    created = supabase.table("scheme_applications").select("created_at")\
+        .gte("created_at", start_utc).lt("created_at", end_utc).execute()
+    for item in created.data or []:
+        add(item["created_at"], "claims")
+
+    processed = supabase.table("scheme_applications").select("updated_at")\
+        .gte("updated_at", start_utc).lt("updated_at", end_utc)\
+        .in_("status", ["approved", "rejected", "completed"]).execute()
+    for item in processed.data or []:
+        add(item["updated_at"], "processed")
+
+    return [{"bucket": bucket, **row} for bucket, row in counts.items()]
+
+
+application_series = TimeSeriesAggregator(
+    "application_time_series",
+    metrics=["claims", "processed"],
+    fallback=_application_rows_fallback,
+    tz_name=DASHBOARD_TIMEZONE,
+    closed_ttl_seconds=float(os.getenv("DASHBOARD_SERIES_CACHE_TTL_SECONDS", "3600"))
+)
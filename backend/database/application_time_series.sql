@@ -0,0 +1,49 @@
+-- ====================================================
+-- Application Time Series RPC
+-- Claims submitted and processed per hour/day/week, bucketed in the database:
+--   supabase.rpc('application_time_series', {
+--       'p_start': '2026-01-01T00:00:00', 'p_end': '2026-02-01T00:00:00',
+--       'p_granularity': 'day', 'p_tz': 'Asia/Kolkata'
+--   }).execute()
+-- p_start/p_end are local times in p_tz; buckets are returned the same way.
+-- Only non-empty buckets are returned.
+-- SAFE TO RUN MULTIPLE TIMES - Uses IF NOT EXISTS / OR REPLACE
+-- ====================================================
+
+CREATE OR REPLACE FUNCTION public.application_time_series(
+    p_start TIMESTAMP,
+    p_end TIMESTAMP,
+    p_granularity TEXT DEFAULT 'day',
+    p_tz TEXT DEFAULT 'UTC'
+)
+RETURNS TABLE (bucket TIMESTAMP, claims BIGINT, processed BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH created AS (
+        SELECT date_trunc(p_granularity, created_at AT TIME ZONE p_tz) AS bucket, count(*) AS n
+        FROM public.scheme_applications
+        WHERE created_at >= p_start AT TIME ZONE p_tz
+          AND created_at < p_end AT TIME ZONE p_tz
+        GROUP BY 1
+    ),
+    processed AS (
+        SELECT date_trunc(p_granularity, updated_at AT TIME ZONE p_tz) AS bucket, count(*) AS n
+        FROM public.scheme_applications
+        WHERE updated_at >= p_start AT TIME ZONE p_tz
+          AND updated_at < p_end AT TIME ZONE p_tz
+          AND status IN ('approved', 'rejected', 'completed')
+        GROUP BY 1
+    )
+    SELECT COALESCE(c.bucket, p.bucket), COALESCE(c.n, 0), COALESCE(p.n, 0)
+    FROM created c
+    FULL OUTER JOIN processed p ON c.bucket = p.bucket
+    ORDER BY 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.application_time_series(TIMESTAMP, TIMESTAMP, TEXT, TEXT) TO anon, authenticated, service_role;
+
+-- Range scan for the "processed" series
+CREATE INDEX IF NOT EXISTS idx_scheme_applications_processed_updated_at
+ON public.scheme_applications USING btree (updated_at)
+WHERE status IN ('approved', 'rejected', 'completed');
@@ -0,0 +1,23 @@
+-- ====================================================
+-- Durable blockchain registrations
+-- feature1/blockchain_queue.py writes a blockchain_events row when a
+-- registration is queued (data_hash 'PENDING'), moves it to 'submitted'
+-- with the transaction hash once sent and to 'confirmed' or 'failed' with
+-- the receipt. Rows still open after a restart are picked up again:
+-- pending ones are re-sent, submitted ones only have their receipt awaited.
+-- SAFE TO RUN MULTIPLE TIMES - Uses IF NOT EXISTS
+-- Requires: blockchain_events
+-- ====================================================
+
+-- status is NULL for rows written before this migration (always final)
+ALTER TABLE public.blockchain_events ADD COLUMN IF NOT EXISTS status TEXT;
+ALTER TABLE public.blockchain_events ADD COLUMN IF NOT EXISTS register_args JSONB;
+ALTER TABLE public.blockchain_events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+-- Open registrations, oldest first, for the startup scan
+CREATE INDEX IF NOT EXISTS idx_blockchain_events_open
+ON public.blockchain_events USING btree (updated_at)
+WHERE status IN ('pending', 'submitted');
+
+DROP POLICY IF EXISTS "Allow anon update events" ON public.blockchain_events;
+CREATE POLICY "Allow anon update events" ON public.blockchain_events FOR UPDATE USING (true);
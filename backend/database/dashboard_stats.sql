@@ -0,0 +1,33 @@
+-- ====================================================
+-- Dashboard Statistics RPC
+-- Every admin dashboard counter in one round trip:
+--   supabase.rpc('dashboard_stats').execute()
+-- SAFE TO RUN MULTIPLE TIMES - Uses OR REPLACE
+-- Requires: scheme_applications, farmer_profiles, risk_events, orders
+-- ====================================================
+
+CREATE OR REPLACE FUNCTION public.dashboard_stats()
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        -- One grouped scan instead of a count query per status
+        'applications_by_status', COALESCE((
+            SELECT json_object_agg(status, n)
+            FROM (
+                SELECT COALESCE(status, 'unknown') AS status, count(*) AS n
+                FROM public.scheme_applications
+                GROUP BY 1
+            ) grouped
+        ), '{}'::json),
+        'total_farmers', (SELECT count(*) FROM public.farmer_profiles),
+        'active_alerts', (
+            SELECT count(*) FROM public.risk_events
+            WHERE status IN ('ACTIVE', 'CLAIM_INITIATED')
+        ),
+        'disbursed_amount', (SELECT COALESCE(sum(total_price), 0) FROM public.orders)
+    );
+$$;
+
+GRANT EXECUTE ON FUNCTION public.dashboard_stats() TO anon, authenticated, service_role;
@@ -0,0 +1,87 @@
+-- ====================================================
+-- Mark My Land RPCs
+-- Each land endpoint in one or two round trips:
+--   supabase.rpc('land_verification_context', {p_land_id, p_document_id})
+--   supabase.rpc('apply_verification', {p_land_id, p_document_id, p_expected_status, p_status, p_register_args})
+--   supabase.rpc('record_land', {p_user_id, p_polygon, p_area[, p_walk_completeness]})
+-- SAFE TO RUN MULTIPLE TIMES - Uses OR REPLACE
+-- Requires: users, lands, land_documents, blockchain_events (with blockchain_events_queue.sql applied)
+-- ====================================================
+
+-- The land and document a verification needs, fetched together
+CREATE OR REPLACE FUNCTION public.land_verification_context(p_land_id UUID, p_document_id UUID)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'land', (SELECT to_json(l) FROM public.lands l WHERE l.id = p_land_id),
+        'document', (SELECT to_json(d) FROM public.land_documents d WHERE d.id = p_document_id)
+    );
+$$;
+
+-- Write a verification result in one transaction: the land status (only if
+-- it is still p_expected_status) and the pending blockchain_events row the
+-- registration queue picks up. Returns {"applied": false} when the status
+-- changed since it was read, otherwise {"applied": true, "event_id": ...}
+CREATE OR REPLACE FUNCTION public.apply_verification(
+    p_land_id UUID, p_document_id UUID, p_expected_status TEXT, p_status TEXT, p_register_args JSONB
+)
+RETURNS json
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_id UUID;
+BEGIN
+    UPDATE public.lands
+    SET status = p_status
+    WHERE id = p_land_id AND status IS NOT DISTINCT FROM p_expected_status;
+
+    IF NOT FOUND THEN
+        RETURN json_build_object('applied', false);
+    END IF;
+
+    INSERT INTO public.blockchain_events (land_id, document_id, data_hash, status, register_args)
+    VALUES (p_land_id, p_document_id, 'PENDING', 'pending', p_register_args)
+    RETURNING id INTO v_event_id;
+
+    RETURN json_build_object('applied', true, 'event_id', v_event_id);
+END;
+$$;
+
+-- Share of the boundary covered by the GPS walk (NULL when drawn by hand)
+ALTER TABLE public.lands ADD COLUMN IF NOT EXISTS walk_completeness NUMERIC;
+
+-- Create the (demo) user if missing and insert the land, in one transaction:
+-- either both rows exist afterwards or neither does
+DROP FUNCTION IF EXISTS public.record_land(UUID, JSONB, NUMERIC);
+CREATE OR REPLACE FUNCTION public.record_land(
+    p_user_id UUID, p_polygon JSONB, p_area NUMERIC, p_walk_completeness NUMERIC DEFAULT NULL
+)
+RETURNS json
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_land public.lands;
+BEGIN
+    INSERT INTO public.users (id, phone_number, full_name, email, password_hash)
+    VALUES (
+        p_user_id,
+        'demo-' || left(p_user_id::text, 8),
+        'Demo Farmer',
+        'demo-' || left(p_user_id::text, 8) || '@example.com',
+        'demo_hash'
+    )
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO public.lands (user_id, polygon_coordinates, area_sqm, status, walk_completeness)
+    VALUES (p_user_id, p_polygon, p_area, 'PENDING', p_walk_completeness)
+    RETURNING * INTO v_land;
+
+    RETURN to_json(v_land);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.land_verification_context(UUID, UUID) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.apply_verification(UUID, UUID, TEXT, TEXT, JSONB) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.record_land(UUID, JSONB, NUMERIC, NUMERIC) TO anon, authenticated, service_role;
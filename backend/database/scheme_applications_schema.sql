@@ -35,6 +35,13 @@ ON public.scheme_applications USING btree (status) TABLESPACE pg_default;
 CREATE INDEX IF NOT EXISTS idx_scheme_applications_created_at 
 ON public.scheme_applications USING btree (created_at DESC) TABLESPACE pg_default;
 
+-- Keyset pagination: pages are ordered and continued on (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_scheme_applications_created_at_id 
+ON public.scheme_applications USING btree (created_at DESC, id DESC) TABLESPACE pg_default;
+
+CREATE INDEX IF NOT EXISTS idx_scheme_applications_user_created_at_id 
+ON public.scheme_applications USING btree (user_id, created_at DESC, id DESC) TABLESPACE pg_default;
+
 -- ====================================================
 -- TRIGGER FUNCTION (for auto-updating updated_at)
 -- ====================================================
@@ -0,0 +1,537 @@
+"""
+Background registration of verified land on the LandRegistry contract.
+
+verify_claim queues a registration and answers without waiting for a
+block. A single worker thread owns the chain connection:
+  - one persistent Web3 provider, contract object and validated sender
+    account (the config written by deploy.py is re-read only when the file
+    changes)
+  - nonces are tracked locally, so queued registrations are sent back to
+    back and their receipts awaited together instead of one per request
+  - with BLOCKCHAIN_MULTICALL_ADDRESS set (a Multicall3 deployment), a
+    batch of registrations goes out as one aggregate3 transaction
+Registrations are durable: verification writes a 'pending'
+blockchain_events row (database/blockchain_events_queue.sql) in the same
+transaction as the land status, and the worker updates it with the
+transaction hash when sent and with the receipt (or failure code, as
+before) when known. A process keeps the open rows it holds fresh with a
+heartbeat on updated_at. Rows nobody has touched for RESUME_AFTER_SECONDS
+(their process is gone) are claimed and queued again by a periodic scan
+in any process; one already sent has its receipt awaited, never a resend.
+A transaction with no receipt in time is never marked failed either: its
+receipt is checked again with backoff, and if it is still unknown the row
+stays 'submitted' for resume_pending to await.
+Without that migration, registrations live in memory only and the event
+row is written at the end. Progress is read back by registration id.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.supabase_client import supabase
+from .blockchain_client import CONFIG_PATH, get_blockchain_connection
+
+BATCH_SIZE = int(os.getenv("BLOCKCHAIN_BATCH_SIZE", "10"))
+BATCH_LINGER_SECONDS = float(os.getenv("BLOCKCHAIN_BATCH_LINGER_SECONDS", "0.5"))
+MULTICALL_ADDRESS = os.getenv("BLOCKCHAIN_MULTICALL_ADDRESS")
+RECEIPT_TIMEOUT_SECONDS = float(os.getenv("BLOCKCHAIN_RECEIPT_TIMEOUT_SECONDS", "120"))
+# A transaction without a receipt by then is checked again, briefly, after
+# RECEIPT_RECHECK_SECONDS, doubling each time, up to MAX_RECEIPT_CHECKS times
+RECEIPT_RECHECK_SECONDS = float(os.getenv("BLOCKCHAIN_RECEIPT_RECHECK_SECONDS", "30"))
+RECEIPT_RECHECK_TIMEOUT_SECONDS = float(os.getenv("BLOCKCHAIN_RECEIPT_RECHECK_TIMEOUT_SECONDS", "5"))
+MAX_RECEIPT_CHECKS = int(os.getenv("BLOCKCHAIN_MAX_RECEIPT_CHECKS", "6"))
+MAX_ATTEMPTS = int(os.getenv("BLOCKCHAIN_MAX_ATTEMPTS", "3"))
+MAX_RETAINED_REGISTRATIONS = int(os.getenv("BLOCKCHAIN_RETAINED_REGISTRATIONS", "1000"))
+# Open rows untouched for this long belong to a process that is gone. Rows a
+# live process holds are touched every HEARTBEAT_SECONDS, and the scan for
+# abandoned ones runs every RESUME_AFTER_SECONDS.
+RESUME_AFTER_SECONDS = float(os.getenv("BLOCKCHAIN_RESUME_AFTER_SECONDS", "600"))
+HEARTBEAT_SECONDS = RESUME_AFTER_SECONDS / 4
+MAX_RESUMED = int(os.getenv("BLOCKCHAIN_MAX_RESUMED", "500"))
+
+PENDING_HASH = "PENDING"
+OPEN_STATUSES = ["pending", "submitted"]
+
+MULTICALL3_ABI = [{
+    "inputs": [{
+        "components": [
+            {"name": "target", "type": "address"},
+            {"name": "allowFailure", "type": "bool"},
+            {"name": "callData", "type": "bytes"}
+        ],
+        "name": "calls",
+        "type": "tuple[]"
+    }],
+    "name": "aggregate3",
+    "outputs": [{
+        "components": [
+            {"name": "success", "type": "bool"},
+            {"name": "returnData", "type": "bytes"}
+        ],
+        "name": "returnData",
+        "type": "tuple[]"
+    }],
+    "stateMutability": "payable",
+    "type": "function"
+}]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class BlockchainUnavailable(Exception):
+    """The chain can't be used right now; code is what gets recorded"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def register_args(land_data: Dict[str, Any], doc_data: Dict[str, Any], validation_res: Dict[str, Any]) -> Tuple:
+    """registerLand arguments, typed as the contract expects"""
+    return (
+        str(land_data.get("id")),
+        str((doc_data.get("ocr_data") or {}).get("owner_name", "Unknown")),
+        int(float(land_data.get("area_sqm") or 0)),
+        int(float(doc_data.get("extracted_area_sqm") or 0)),
+        int(float(validation_res.get("system_confidence") or 0)),
+        str(validation_res.get("status", "PENDING")),
+        "QmSimulatedIPFSHash"
+    )
+
+
+def persist_pending(land_id: str, document_id: str, args: Tuple) -> Optional[str]:
+    """Id of a new 'pending' blockchain_events row for a registration, or None (memory only)"""
+    try:
+        rows = supabase.table("blockchain_events").insert({
+            "land_id": land_id,
+            "document_id": document_id,
+            "data_hash": PENDING_HASH,
+            "status": "pending",
+            "register_args": list(args)
+        }).execute().data
+        return rows[0]["id"] if rows else None
+    except Exception as e:
+        print(f"⚠️ Could not persist blockchain registration for land {land_id} (kept in memory only): {e}")
+        return None
+
+
+class LandRegistryClient:
+    """Persistent connection, contract and nonce for the registry's sender account"""
+
+    def __init__(self, config_path: str = CONFIG_PATH, multicall_address: Optional[str] = None):
+        self.config_path = config_path
+        self.multicall_address = multicall_address
+        self.w3 = None
+        self.contract = None
+        self.multicall = None
+        self.account = None
+        self._config_mtime = None
+        self._nonce: Optional[int] = None
+
+    def connect(self):
+        """Ready the connection; cheap after the first call"""
+        if not os.path.exists(self.config_path):
+            raise BlockchainUnavailable("SIMULATED_HASH_NO_CONTRACT", "Blockchain config not found. Run deploy.py first!")
+
+        mtime = os.path.getmtime(self.config_path)
+        if self.w3 is None:
+            self.w3 = get_blockchain_connection()
+        if not self.w3.is_connected():
+            raise BlockchainUnavailable("CONNECTION_FAILED", "Could not connect to Blockchain.")
+
+        if mtime != self._config_mtime:
+            with open(self.config_path, "r") as f:
+                config = json.load(f)
+            account = config["account"]
+            if account not in self.w3.eth.accounts:
+                raise BlockchainUnavailable(
+                    "ERROR_ACCOUNT_MISMATCH",
+                    f"Account {account} not found in current node session. Run 'python deploy.py' again to update config!"
+                )
+            self.contract = self.w3.eth.contract(address=config["contract_address"], abi=config["abi"])
+            if self.multicall_address:
+                self.multicall = self.w3.eth.contract(
+                    address=self.w3.to_checksum_address(self.multicall_address), abi=MULTICALL3_ABI
+                )
+            self.account = account
+            self._config_mtime = mtime
+            self._nonce = None
+
+    def next_nonce(self) -> int:
+        if self._nonce is None:
+            self._nonce = self.w3.eth.get_transaction_count(self.account, "pending")
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+    def reset_nonce(self):
+        """Re-read from the node after a failed send"""
+        self._nonce = None
+
+    def send(self, args: Tuple) -> str:
+        tx_hash = self.contract.functions.registerLand(*args).transact({"from": self.account, "nonce": self.next_nonce()})
+        return self.w3.to_hex(tx_hash)
+
+    def send_batch(self, batch: List[Tuple]) -> str:
+        """All registrations in one Multicall3 aggregate3 transaction (all or nothing)"""
+        calls = []
+        for args in batch:
+            if hasattr(self.contract, "encode_abi"):
+                call_data = self.contract.encode_abi("registerLand", args=list(args))
+            else:  # web3 < 7
+                call_data = self.contract.encodeABI(fn_name="registerLand", args=list(args))
+            calls.append((self.contract.address, False, call_data))
+        tx_hash = self.multicall.functions.aggregate3(calls).transact({"from": self.account, "nonce": self.next_nonce()})
+        return self.w3.to_hex(tx_hash)
+
+    def wait(self, tx_hash: str, timeout: float) -> Dict[str, Any]:
+        return self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+
+
+class LandRegistration:
+    """One queued registerLand call"""
+
+    def __init__(self, land_id: str, document_id: str, args: Tuple):
+        self.id = str(uuid.uuid4())
+        self.land_id = land_id
+        self.document_id = document_id
+        self.args = args
+        self.status = "queued"  # queued -> submitted -> confirmed | failed
+        self.attempts = 0
+        self.tx_hash: Optional[str] = None
+        self.block_number: Optional[int] = None
+        self.batched_with = 0
+        self.error: Optional[str] = None
+        self.event_id: Optional[str] = None  # Its blockchain_events row, if persisted
+        self.resume_tx_hash: Optional[str] = None  # Already sent (here or by a previous process): await, don't resend
+        self.receipt_checks = 0
+        self.created_at = time.time()
+        self.confirmed_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        if self.status in ("confirmed", "failed"):
+            self._done.set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "registration_id": self.id,
+                "status": self.status,
+                "land_id": self.land_id,
+                "document_id": self.document_id,
+                "tx_hash": self.tx_hash,
+                "block_number": self.block_number,
+                "batched_with": self.batched_with,
+                "attempts": self.attempts,
+                "error": self.error,
+                "created_at": self.created_at,
+                "confirmed_at": self.confirmed_at
+            }
+
+
+class RegistrationQueue:
+    """Single worker that sends queued registrations in batches"""
+
+    def __init__(self, client: LandRegistryClient, batch_size: int = 10, linger_seconds: float = 0.5, max_retained: int = 1000):
+        self.client = client
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retained = max_retained
+        self._queue: "queue.Queue[LandRegistration]" = queue.Queue()
+        self._registrations: "OrderedDict[str, LandRegistration]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        # Registrations this process is still working on, by id (refreshed by the heartbeat)
+        self._open: Dict[str, LandRegistration] = {}
+        self.sent = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.transactions = 0
+
+    def prepare(self, land_data: Dict[str, Any], doc_data: Dict[str, Any], validation_res: Dict[str, Any]) -> LandRegistration:
+        """
+        A registration that is not queued yet. The caller writes its pending
+        row (land_store.apply_verification, together with the land status)
+        and then enqueues it.
+        """
+        return LandRegistration(
+            str(land_data.get("id")), str(doc_data.get("id")), register_args(land_data, doc_data, validation_res)
+        )
+
+    def enqueue(self, registration: LandRegistration):
+        with self._lock:
+            self._registrations[registration.id] = registration
+            while len(self._registrations) > self.max_retained:
+                self._registrations.popitem(last=False)
+            self._open[registration.id] = registration
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="land-registry", daemon=True)
+                self._worker.start()
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._beat, name="land-registry-heartbeat", daemon=True)
+                self._heartbeat.start()
+        self._queue.put(registration)
+
+    def resume_pending(self) -> int:
+        """Queue registrations no live process is working on; returns how many"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=RESUME_AFTER_SECONDS)).isoformat()
+        rows = supabase.table("blockchain_events")\
+            .select("id, land_id, document_id, data_hash, status, register_args, updated_at")\
+            .in_("status", OPEN_STATUSES).lt("updated_at", cutoff)\
+            .order("updated_at").limit(MAX_RESUMED).execute().data or []
+        resumed = 0
+        for row in rows:
+            if not row.get("register_args"):
+                continue
+            # Claim the row first, so other workers scanning now leave it alone
+            claimed = supabase.table("blockchain_events").update({"updated_at": _now()})\
+                .eq("id", row["id"]).eq("updated_at", row["updated_at"]).execute().data
+            if not claimed:
+                continue
+            registration = LandRegistration(str(row["land_id"]), str(row["document_id"]), tuple(row["register_args"]))
+            registration.event_id = row["id"]
+            if row["status"] == "submitted":
+                registration.resume_tx_hash = row["data_hash"]
+            self.enqueue(registration)
+            resumed += 1
+        return resumed
+
+    def resume_in_background(self):
+        """Resume abandoned registrations now and then every RESUME_AFTER_SECONDS"""
+        def resume():
+            while True:
+                try:
+                    resumed = self.resume_pending()
+                    if resumed:
+                        print(f"⛓️ Resumed {resumed} blockchain registration(s) no live process was working on")
+                except Exception as e:
+                    print(f"⚠️ Could not resume open blockchain registrations: {e}")
+                time.sleep(RESUME_AFTER_SECONDS)
+        threading.Thread(target=resume, name="land-registry-resume", daemon=True).start()
+
+    def get(self, registration_id: str) -> Optional[LandRegistration]:
+        with self._lock:
+            return self._registrations.get(registration_id)
+
+    # --- Worker ---
+
+    def _next_batch(self) -> List[LandRegistration]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _beat(self):
+        # Queued, backing off or awaiting a receipt: the rows stay ours
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                held = list(self._open.values())
+            self._touch(held)
+
+    def _close(self, registration: LandRegistration):
+        with self._lock:
+            self._open.pop(registration.id, None)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                print(f"❌ Blockchain registration batch failed: {e}")
+                self.client.reset_nonce()
+                for registration in batch:
+                    self._retry_or_fail(registration, f"ERROR_{str(e)[:20]}", str(e))
+
+    def _retry_or_fail(self, registration: LandRegistration, code: str, message: str, retry: bool = True):
+        if retry and registration.attempts < MAX_ATTEMPTS:
+            # One already sent only has its receipt awaited on the retry
+            registration.update(status="submitted" if registration.resume_tx_hash else "queued", error=message)
+            self._touch([registration])
+            delay = 2 ** registration.attempts
+            threading.Timer(delay, self._queue.put, args=(registration,)).start()
+        elif registration.resume_tx_hash is not None and registration.event_id:
+            self._leave_submitted(registration, message)
+        else:
+            self._close(registration)
+            self._record(registration, code)
+            with self._lock:
+                self.failed += 1
+            registration.update(status="failed", error=message, tx_hash=code)
+
+    def _recheck_receipt(self, registration: LandRegistration, tx_hash: str, message: str):
+        """No receipt yet: the transaction may still be mined, so await it again later (never resend)"""
+        registration.update(resume_tx_hash=tx_hash, error=message)
+        if registration.receipt_checks < MAX_RECEIPT_CHECKS:
+            delay = RECEIPT_RECHECK_SECONDS * 2 ** registration.receipt_checks
+            registration.update(receipt_checks=registration.receipt_checks + 1)
+            self._touch([registration])
+            threading.Timer(delay, self._queue.put, args=(registration,)).start()
+        elif registration.event_id:
+            self._leave_submitted(registration, message)
+        else:
+            # Memory only: nothing can pick it up later
+            self._retry_or_fail(registration, tx_hash, message, retry=False)
+
+    def _leave_submitted(self, registration: LandRegistration, message: str):
+        # The row stays 'submitted' with its hash and is no longer refreshed, so a
+        # later resume_pending scan (in any process) awaits the receipt
+        self._close(registration)
+        print(f"⚠️ Giving up on the receipt of {registration.resume_tx_hash} for now; "
+              f"event {registration.event_id} stays submitted")
+        registration.update(status="submitted", error=message)
+
+    def _process(self, batch: List[LandRegistration]):
+        for registration in batch:
+            registration.update(attempts=registration.attempts + 1)
+        self._touch(batch)
+
+        try:
+            self.client.connect()
+        except BlockchainUnavailable as e:
+            print(f"⚠️ {e}")
+            for registration in batch:
+                # No contract deployed: nothing to retry
+                self._retry_or_fail(registration, e.code, str(e), retry=e.code != "SIMULATED_HASH_NO_CONTRACT")
+            return
+
+        # Send everything first (local nonces), then collect receipts. Each
+        # transaction's rows are marked 'submitted' as soon as it is sent, so a
+        # resume elsewhere only awaits them; only a crash between the send and
+        # that update can still lead to a resend.
+        to_await = [r for r in batch if r.resume_tx_hash is not None]
+        to_send = [r for r in batch if r.resume_tx_hash is None]
+        pending: Dict[str, List[LandRegistration]] = {}
+        if self.client.multicall is not None and len(to_send) > 1:
+            try:
+                self._submitted(pending, self.client.send_batch([r.args for r in to_send]), to_send)
+            except Exception as e:
+                print(f"⚠️ Multicall batch failed ({e}), sending individually")
+                self.client.reset_nonce()
+        if not pending:
+            for registration in to_send:
+                try:
+                    self._submitted(pending, self.client.send(registration.args), [registration])
+                except Exception as e:
+                    self.client.reset_nonce()
+                    self._retry_or_fail(registration, f"ERROR_{str(e)[:20]}", str(e))
+
+        for registration in to_await:
+            pending.setdefault(registration.resume_tx_hash, []).append(registration)
+            registration.update(status="submitted", tx_hash=registration.resume_tx_hash)
+
+        for tx_hash, group in pending.items():
+            # Rechecks only poll briefly so one stuck transaction can't hold up the queue
+            rechecking = all(r.receipt_checks > 0 for r in group)
+            try:
+                receipt = self.client.wait(
+                    tx_hash, RECEIPT_RECHECK_TIMEOUT_SECONDS if rechecking else RECEIPT_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                for registration in group:
+                    self._recheck_receipt(registration, tx_hash, f"No receipt for {tx_hash} yet: {e}")
+                continue
+            if receipt.get("status") == 0:
+                for registration in group:
+                    # Reverted: sent afresh on the retry
+                    registration.update(resume_tx_hash=None, receipt_checks=0)
+                    self._retry_or_fail(registration, "ERROR_REVERTED", f"Transaction {tx_hash} reverted")
+                continue
+            self._record_many(group, tx_hash, "confirmed")
+            with self._lock:
+                self.confirmed += len(group)
+            for registration in group:
+                self._close(registration)
+                registration.update(
+                    status="confirmed", block_number=receipt.get("blockNumber"), confirmed_at=time.time(), error=None
+                )
+
+    def _submitted(self, pending: Dict[str, List[LandRegistration]], tx_hash: str, group: List[LandRegistration]):
+        pending[tx_hash] = group
+        self._mark(group, "submitted", tx_hash)
+        with self._lock:
+            self.transactions += 1
+            self.sent += len(group)
+        for registration in group:
+            registration.update(status="submitted", tx_hash=tx_hash, resume_tx_hash=tx_hash, batched_with=len(group) - 1)
+
+    # --- blockchain_events ---
+
+    def _touch(self, group: List[LandRegistration]):
+        """Refresh updated_at on open rows this process holds, so resume_pending elsewhere leaves them alone"""
+        event_ids = [r.event_id for r in group if r.event_id]
+        if not event_ids:
+            return
+        try:
+            supabase.table("blockchain_events").update({"updated_at": _now()})\
+                .in_("id", event_ids).in_("status", OPEN_STATUSES).execute()
+        except Exception as e:
+            print(f"⚠️ Could not refresh {len(event_ids)} open blockchain event(s): {e}")
+
+    def _mark(self, group: List[LandRegistration], status: str, data_hash: str):
+        """Move persisted rows to status/data_hash in one update"""
+        event_ids = [r.event_id for r in group if r.event_id]
+        if not event_ids:
+            return
+        try:
+            supabase.table("blockchain_events").update({"status": status, "data_hash": data_hash, "updated_at": _now()})\
+                .in_("id", event_ids).execute()
+        except Exception as e:
+            print(f"⚠️ Could not mark blockchain events {status} for {data_hash}: {e}")
+
+    def _record_many(self, group: List[LandRegistration], data_hash: str, status: str):
+        self._mark(group, status, data_hash)
+        rows = [{"land_id": r.land_id, "document_id": r.document_id, "data_hash": data_hash} for r in group if not r.event_id]
+        if not rows:
+            return
+        try:
+            supabase.table("blockchain_events").insert(rows).execute()
+        except Exception as e:
+            print(f"⚠️ Could not record blockchain events for {data_hash}: {e}")
+
+    def _record(self, registration: LandRegistration, data_hash: str):
+        self._record_many([registration], data_hash, "failed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "sent": self.sent,
+                "confirmed": self.confirmed,
+                "failed": self.failed,
+                "transactions": self.transactions,
+                "multicall": self.client.multicall_address is not None
+            }
+
+
+land_registrations = RegistrationQueue(
+    LandRegistryClient(CONFIG_PATH, MULTICALL_ADDRESS),
+    batch_size=BATCH_SIZE,
+    linger_seconds=BATCH_LINGER_SECONDS,
+    max_retained=MAX_RETAINED_REGISTRATIONS
+)
@@ -0,0 +1,292 @@
+"""
+Background processing of uploaded land documents (Feature 1).
+
+An upload is stored and answered with a job id straight away; OCR runs in
+a bounded worker pool and the land_documents row is written when it
+finishes. At most DOCUMENT_OCR_MAX_PENDING uploads may be queued or running
+(their bytes are held until a worker picks them up); beyond that uploads
+are refused with OcrQueueFull and the endpoint answers 503 with
+Retry-After. Documents are identified by the SHA-256 of their bytes:
+  - a result already extracted for the same bytes is reused (re-uploads of
+    the same scan don't reach Gemini again)
+  - concurrent uploads of the same bytes share one OCR call
+This dedupe is per process: the results live in memory, so other workers
+and restarts extract the same bytes again.
+Gemini errors are retried with exponential backoff; if every attempt
+fails the simulated extraction is used, as before. Simulated results (also
+what runs without GEMINI_API_KEY) are never cached.
+Progress is read back (or long-polled) by job id.
+"""
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.supabase_client import supabase
+from .services import extract_data_with_gemini, simulate_ocr_fallback
+
+OCR_WORKERS = int(os.getenv("DOCUMENT_OCR_WORKERS", "4"))
+OCR_MAX_ATTEMPTS = int(os.getenv("DOCUMENT_OCR_MAX_ATTEMPTS", "3"))
+OCR_RETRY_BASE_SECONDS = float(os.getenv("DOCUMENT_OCR_RETRY_BASE_SECONDS", "1"))
+OCR_CACHE_SIZE = int(os.getenv("DOCUMENT_OCR_CACHE_SIZE", "1000"))
+OCR_MAX_PENDING = int(os.getenv("DOCUMENT_OCR_MAX_PENDING", "32"))
+OCR_RETRY_AFTER = int(os.getenv("DOCUMENT_OCR_RETRY_AFTER", "5"))
+MAX_RETAINED_JOBS = int(os.getenv("DOCUMENT_JOBS_RETAINED", "500"))
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class OcrQueueFull(Exception):
+    """Raised when max_pending uploads are already queued or running"""
+
+    def __init__(self, retry_after):
+        super().__init__("Document processing is busy")
+        self.retry_after = retry_after
+
+
+class DocumentJob:
+    """Progress of one document upload"""
+
+    def __init__(self, land_id: str, filename: str, digest: str):
+        self.id = str(uuid.uuid4())
+        self.land_id = land_id
+        self.filename = filename
+        self.content_hash = digest
+        self.status = "queued"  # queued -> processing -> completed | failed
+        self.cached = False
+        self.attempts = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        if self.status in ("completed", "failed"):
+            self._done.set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "land_id": self.land_id,
+                "filename": self.filename,
+                "content_hash": self.content_hash,
+                "cached": self.cached,
+                "attempts": self.attempts,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at
+            }
+
+
+class DocumentJobStore:
+    """In-process registry of recent jobs (oldest dropped beyond max_jobs)"""
+
+    def __init__(self, max_jobs: int = 500):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, DocumentJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job: DocumentJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[DocumentJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class OcrPipeline:
+    """Bounded OCR worker pool with a content-hash result cache and in-flight sharing"""
+
+    def __init__(
+        self,
+        extract: Callable[[bytes, str], Dict[str, Any]],
+        workers: int = 4,
+        max_attempts: int = 3,
+        retry_base_seconds: float = 1,
+        cache_size: int = 1000,
+        max_pending: int = 32,
+        retry_after: int = 5
+    ):
+        self.extract = extract
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.cache_size = cache_size
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="document-ocr")
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+        self.shared = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.pending = 0
+        self.rejected = 0
+
+    def cached(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._results.get(digest)
+            if result is not None:
+                self._results.move_to_end(digest)
+            return result
+
+    def _extract_with_retries(self, content: bytes, mime_type: str, on_attempt: Callable[[int], None]) -> Tuple[Dict[str, Any], bool]:
+        """(result, reusable); falls back to the simulation after the last failed attempt"""
+        for attempt in range(1, self.max_attempts + 1):
+            on_attempt(attempt)
+            with self._lock:
+                self.calls += 1
+            try:
+                result = self.extract(content, mime_type)
+                # Without an API key the extractor simulates: not a result to reuse
+                return result, not result.get("simulated")
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    print(f"⚠️ OCR failed after {attempt} attempts, using simulation: {e}")
+                    with self._lock:
+                        self.fallbacks += 1
+                    return simulate_ocr_fallback(content, error_msg=str(e)), False
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.retry_base_seconds * 2 ** (attempt - 1))
+
+    def ocr(self, digest: str, content: bytes, mime_type: str, on_attempt: Callable[[int], None]) -> Tuple[Dict[str, Any], bool]:
+        """(OCR result, served without a new OCR call)"""
+        with self._lock:
+            result = self._results.get(digest)
+            if result is not None:
+                self._results.move_to_end(digest)
+                self.cache_hits += 1
+                return result, True
+            owner = digest not in self._inflight
+            if owner:
+                self._inflight[digest] = Future()
+            future = self._inflight[digest]
+
+        if not owner:
+            with self._lock:
+                self.shared += 1
+            return future.result(), True
+
+        try:
+            result, reusable = self._extract_with_retries(content, mime_type, on_attempt)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
+
+        if reusable:
+            with self._lock:
+                self._results[digest] = result
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+        future.set_result(result)
+        return result, False
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run fn(*args) on the pool; raises OcrQueueFull when max_pending are queued or running"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise OcrQueueFull(self.retry_after)
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached_results": len(self._results),
+                "in_flight": len(self._inflight),
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "ocr_calls": self.calls,
+                "cache_hits": self.cache_hits,
+                "shared_in_flight": self.shared,
+                "retries": self.retries,
+                "fallbacks": self.fallbacks
+            }
+
+
+def _store_document(land_id: str, file_url: str, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
+    data = {
+        "land_id": land_id,
+        "document_url": file_url,
+        "extracted_area_sqm": ocr_result["extracted_area_sqm"],
+        "confidence_score": ocr_result["confidence_score"]
+    }
+    response = supabase.table("land_documents").insert(data).execute()
+
+    # Merge the OCR text into the response so frontend can display it
+    result_data = response.data[0]
+    result_data["ocr_data"] = ocr_result
+    result_data["extracted_text"] = ocr_result.get("text", "No text extracted")
+    return result_data
+
+
+def _process(job: DocumentJob, content: bytes, mime_type: str, file_url: str):
+    job.update(status="processing")
+    try:
+        ocr_result, reused = ocr_pipeline.ocr(job.content_hash, content, mime_type, lambda n: job.update(attempts=n))
+        job.update(cached=reused)
+        result = _store_document(job.land_id, file_url, ocr_result)
+        job.update(status="completed", result=result, finished_at=time.time())
+    except Exception as e:
+        print(f"❌ Document job {job.id} failed: {e}")
+        job.update(status="failed", error=str(e), finished_at=time.time())
+
+
+def submit_document(land_id: str, filename: str, file_url: str, content: bytes, mime_type: str) -> DocumentJob:
+    """Queue OCR and storage for an uploaded document; returns immediately (raises OcrQueueFull)"""
+    job = DocumentJob(land_id, filename, content_hash(content))
+    if ocr_pipeline.cached(job.content_hash) is not None:
+        job.update(cached=True)
+    ocr_pipeline.submit(_process, job, content, mime_type, file_url)
+    document_jobs.add(job)
+    return job
+
+
+document_jobs = DocumentJobStore(MAX_RETAINED_JOBS)
+ocr_pipeline = OcrPipeline(
+    lambda content, mime_type: extract_data_with_gemini(content, mime_type, fallback=False),
+    workers=OCR_WORKERS,
+    max_attempts=OCR_MAX_ATTEMPTS,
+    retry_base_seconds=OCR_RETRY_BASE_SECONDS,
+    cache_size=OCR_CACHE_SIZE,
+    max_pending=OCR_MAX_PENDING,
+    retry_after=OCR_RETRY_AFTER
+)
@@ -0,0 +1,377 @@
+"""
+Boundary polygons from raw walk-the-boundary GPS tracks.
+
+A walk produces thousands of noisy fixes. Instead of sending them as the
+final vertex list, the client posts the raw track and gets back:
+  - the fixes worse than TRACK_MAX_ACCURACY_M dropped
+  - consecutive fixes within the fixes' own error of each other clustered
+    into one accuracy-weighted point (TRACK_CLUSTER_RADIUS_M or the median
+    fix accuracy, whichever is larger), so jitter below the reported
+    accuracy averages out instead of becoming vertices
+  - a one-pass simplification of those points: one is kept only where the
+    walk since the last kept vertex stops being straight to within
+    TRACK_SIMPLIFY_TOLERANCE_M or half the median fix accuracy, whichever is
+    larger (lookback bounded to TRACK_SIMPLIFY_WINDOW points, so the cost
+    is linear)
+  - corners put back where averaging rounded them off: each vertex moves to
+    where lines fitted through the raw fixes of its two edges intersect
+  - self-intersections repaired (make_valid, keeping the largest part)
+  - the areas of the simplified and raw rings in one calculate_areas pass
+  - walk-completeness metrics: how much of the boundary was actually walked
+    with usable fixes, and whether the walk came back to its start (within
+    TRACK_CLOSE_FRACTION of the walked length, at least the cluster radius
+    and at most TRACK_CLOSE_TOLERANCE_M, so on a small parcel a walk that
+    skips a side doesn't count as closed)
+
+Each ingested track's polygon and completeness are kept server-side under
+a track_id for TRACK_RESULT_TTL_SECONDS; /land/record takes that id rather
+than a completeness value from the client, and only honours it when the
+recorded coordinates are the ones the track produced.
+
+Tracks arrive either as a compact array of [lat, lng, accuracy] rows or as
+a delta-encoded buffer: base64 of little-endian int32 triples
+(lat * 1e7, lng * 1e7, accuracy in decimeters), the first triple absolute
+and each later one the difference from the previous.
+"""
+import os
+import time
+import uuid
+import base64
+import binascii
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from .geometry import calculate_areas
+
+MAX_ACCURACY_M = float(os.getenv("TRACK_MAX_ACCURACY_M", "25"))
+SIMPLIFY_TOLERANCE_M = float(os.getenv("TRACK_SIMPLIFY_TOLERANCE_M", "2"))
+SIMPLIFY_WINDOW = int(os.getenv("TRACK_SIMPLIFY_WINDOW", "64"))
+CLUSTER_RADIUS_M = float(os.getenv("TRACK_CLUSTER_RADIUS_M", "3"))
+MIN_CORNER_SIN = np.sin(np.radians(15))  # Edges closer to parallel than this don't make a corner
+CLOSE_TOLERANCE_M = float(os.getenv("TRACK_CLOSE_TOLERANCE_M", "15"))
+CLOSE_FRACTION = float(os.getenv("TRACK_CLOSE_FRACTION", "0.1"))
+MAX_GAP_M = float(os.getenv("TRACK_MAX_GAP_M", "30"))
+MAX_TRACK_FIXES = int(os.getenv("TRACK_MAX_FIXES", "50000"))
+RESULT_TTL_SECONDS = float(os.getenv("TRACK_RESULT_TTL_SECONDS", "3600"))
+MAX_RETAINED_RESULTS = int(os.getenv("TRACK_RESULTS_RETAINED", "1000"))
+
+DEFAULT_ACCURACY_M = 5.0  # Same default as GeoPoint
+DELTA_SCALE = np.array([1e7, 1e7, 10.0])
+EARTH_RADIUS_M = 6371008.8
+
+
+def decode_track(buffer: str) -> np.ndarray:
+    """(n, 3) lat, lng, accuracy from a base64 delta-encoded buffer"""
+    try:
+        raw = base64.b64decode(buffer, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("encoded track is not valid base64")
+    if len(raw) % 12:
+        raise ValueError("encoded track must hold whole (lat, lng, accuracy) int32 triples")
+    deltas = np.frombuffer(raw, dtype="<i4").reshape(-1, 3).astype(np.int64)
+    return np.cumsum(deltas, axis=0) / DELTA_SCALE
+
+
+def encode_track(fixes: np.ndarray) -> str:
+    """Inverse of decode_track (for clients and tests)"""
+    scaled = np.round(np.asarray(fixes, dtype=float)[:, :3] * DELTA_SCALE).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    return base64.b64encode(deltas.astype("<i4").tobytes()).decode()
+
+
+def track_array(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """(n, 3) lat, lng, accuracy from [lat, lng] or [lat, lng, accuracy, ...] rows"""
+    try:
+        fixes = np.asarray(rows, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("points rows must all have the same number of numbers")
+    if fixes.ndim != 2 or fixes.shape[1] < 2:
+        raise ValueError("points must be [lat, lng] or [lat, lng, accuracy] rows")
+    if fixes.shape[1] == 2:
+        return np.column_stack([fixes, np.full(len(fixes), DEFAULT_ACCURACY_M)])
+    return fixes[:, :3]
+
+
+def _local_xy(lat: np.ndarray, lng: np.ndarray):
+    """Meters east/north of the first fix (equirectangular: fine at parcel scale)"""
+    lat0 = np.radians(lat[0])
+    x = np.radians((lng - lng[0] + 180) % 360 - 180) * EARTH_RADIUS_M * np.cos(lat0)
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def _segment_distances(px, py, ax, ay, bx, by) -> np.ndarray:
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return np.hypot(px - ax, py - ay)
+    t = np.clip(((px - ax) * dx + (py - ay) * dy) / length_sq, 0, 1)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify_stream(x: np.ndarray, y: np.ndarray, tolerance_m: float, window: int) -> List[int]:
+    """
+    Indices of the fixes to keep, in one pass: extend the current segment
+    while every fix since its start stays within tolerance_m of it.
+    """
+    if len(x) <= 2:
+        return list(range(len(x)))
+    kept = [0]
+    anchor = 0
+    for i in range(2, len(x)):
+        if i - anchor > window or _segment_distances(
+            x[anchor + 1:i], y[anchor + 1:i], x[anchor], y[anchor], x[i], y[i]
+        ).max() > tolerance_m:
+            anchor = i - 1
+            kept.append(anchor)
+    kept.append(len(x) - 1)
+    return kept
+
+
+def cluster_fixes(x: np.ndarray, y: np.ndarray, accuracy: np.ndarray, radius_m: float) -> np.ndarray:
+    """
+    Cluster label per fix, in one pass: a fix joins the current cluster while
+    it (or the fix after it) lies within radius_m of the cluster's running
+    centroid (fixes weighted by 1 / accuracy^2), otherwise it starts the next one.
+    """
+    labels = np.empty(len(x), dtype=np.int64)
+    weights = 1.0 / np.maximum(accuracy, 0.1) ** 2
+    limit = radius_m * radius_m
+    label, total, sum_x, sum_y = 0, 0.0, 0.0, 0.0
+    for i in range(len(x)):
+        # A single stray fix doesn't end the cluster; two in a row do
+        if total and (x[i] - sum_x / total) ** 2 + (y[i] - sum_y / total) ** 2 > limit and (
+            i + 1 == len(x) or (x[i + 1] - sum_x / total) ** 2 + (y[i + 1] - sum_y / total) ** 2 > limit
+        ):
+            label, total, sum_x, sum_y = label + 1, 0.0, 0.0, 0.0
+        total += weights[i]
+        sum_x += weights[i] * x[i]
+        sum_y += weights[i] * y[i]
+        labels[i] = label
+    return labels
+
+
+def _settle_vertices(x: np.ndarray, y: np.ndarray, kept: List[int]) -> List[int]:
+    """kept (a closed ring of point indices) with each vertex moved to the farthest point from its neighbours' chord"""
+    kept = list(kept)
+    count = len(kept)
+    for j in range(count):
+        before, after = kept[j - 1], kept[(j + 1) % count]
+        if after <= before:
+            continue  # The wrap-around vertex stays where the ring starts
+        candidates = np.arange(before + 1, after)
+        if len(candidates) == 0:
+            continue
+        distances = _segment_distances(x[candidates], y[candidates], x[before], y[before], x[after], y[after])
+        kept[j] = int(candidates[distances.argmax()])
+    return kept
+
+
+def _local_latlng(x: np.ndarray, y: np.ndarray, lat0: float, lng0: float):
+    """Inverse of _local_xy for the track starting at lat0, lng0"""
+    lat = lat0 + np.degrees(y / EARTH_RADIUS_M)
+    lng = lng0 + np.degrees(x / (EARTH_RADIUS_M * np.cos(np.radians(lat0))))
+    return lat, lng
+
+
+def _fit_line(px: np.ndarray, py: np.ndarray):
+    """(point, unit direction) of the total-least-squares line through the points"""
+    center = np.array([px.mean(), py.mean()])
+    _, vectors = np.linalg.eigh(np.cov(np.vstack([px - center[0], py - center[1]])))
+    return center, vectors[:, 1]
+
+
+def _snap_corners(x, y, labels, kept: List[int], vx: np.ndarray, vy: np.ndarray, max_shift_m: float):
+    """
+    Each kept vertex moved to the intersection of the lines fitted to the raw
+    fixes of its two edges (a fix belongs to the edge its cluster lies
+    inside; fixes of a corner's cluster to the nearer edge). Vertices stay put where an edge has too few fixes,
+    the edges are nearly parallel, or the corner would move more than max_shift_m.
+    """
+    count = len(kept)
+    edge = np.full(len(x), -1)
+    for j in range(count):
+        start, end = kept[j], kept[(j + 1) % count]
+        edge[(labels > start) & (labels < end) if end > start else (labels > start) | (labels < end)] = j
+    for j in range(count):
+        # The corner's own cluster straddles both edges: each fix goes to the nearer one
+        at = labels == kept[j]
+        before, after = (j - 1) % count, (j + 1) % count
+        to_before = _segment_distances(x[at], y[at], vx[before], vy[before], vx[j], vy[j])
+        to_after = _segment_distances(x[at], y[at], vx[j], vy[j], vx[after], vy[after])
+        edge[at] = np.where(to_before < to_after, before, j)
+    lines = [_fit_line(x[edge == j], y[edge == j]) if (edge == j).sum() >= 3 else None for j in range(count)]
+
+    vx, vy = vx.copy(), vy.copy()
+    for j in range(count):
+        before, after = lines[j - 1], lines[j]
+        if before is None or after is None:
+            continue
+        (p1, d1), (p2, d2) = before, after
+        cross = d1[0] * d2[1] - d1[1] * d2[0]
+        if abs(cross) < MIN_CORNER_SIN:
+            continue
+        t = ((p2[0] - p1[0]) * d2[1] - (p2[1] - p1[1]) * d2[0]) / cross
+        corner = p1 + t * d1
+        if np.hypot(corner[0] - vx[j], corner[1] - vy[j]) <= max_shift_m:
+            vx[j], vy[j] = corner
+    return vx, vy
+
+
+def _largest_polygon(geometry) -> Optional[Polygon]:
+    parts = [geometry] if geometry.geom_type == "Polygon" else [
+        part for part in getattr(geometry, "geoms", []) if part.geom_type == "Polygon"
+    ]
+    parts = [p for p in parts if not p.is_empty]
+    return max(parts, key=lambda p: p.area) if parts else None
+
+
+def ingest_track(fixes: np.ndarray) -> Dict[str, Any]:
+    """Simplified boundary polygon, its area and walk metrics for (n, 3) lat, lng, accuracy fixes"""
+    received = len(fixes)
+    if received > MAX_TRACK_FIXES:
+        raise ValueError(f"track has {received} fixes; at most {MAX_TRACK_FIXES} are accepted")
+    if received and not np.isfinite(fixes).all():
+        raise ValueError("track contains non-numeric coordinates")
+
+    accepted = fixes[(fixes[:, 2] <= MAX_ACCURACY_M)] if received else fixes
+    if len(accepted) < 3:
+        raise ValueError(f"only {len(accepted)} of {received} fixes are within {MAX_ACCURACY_M:g} m accuracy; need at least 3")
+
+    lat, lng, accuracy = accepted[:, 0], accepted[:, 1], accepted[:, 2]
+    x, y = _local_xy(lat, lng)
+
+    # Jitter within the fixes' own error is averaged out: each cluster of
+    # nearby consecutive fixes becomes one point, weighted by 1 / accuracy^2.
+    # Its accuracy stays the weighted mean of its fixes' (GPS error is
+    # correlated over a few seconds, so averaging doesn't shrink it much)
+    median_accuracy = float(np.median(accuracy))
+    radius = max(CLUSTER_RADIUS_M, median_accuracy)
+    labels = cluster_fixes(x, y, accuracy, radius)
+    weights = 1.0 / np.maximum(accuracy, 0.1) ** 2
+    total = np.bincount(labels, weights)
+    cx, cy, point_accuracy = (np.bincount(labels, weights * v) / total for v in (x, y, accuracy))
+
+    # The walk came back to its start if the gap is small next to the walk
+    # itself (measured on the cluster points, which jitter doesn't lengthen):
+    # a fixed distance would close a small parcel walked on three sides
+    walked_length = float(np.hypot(np.diff(cx), np.diff(cy)).sum())
+    close_tolerance = min(CLOSE_TOLERANCE_M, max(radius, CLOSE_FRACTION * walked_length))
+
+    # Walk completeness: the share of the closed boundary covered by steps no
+    # longer than MAX_GAP_M (longer steps are where fixes were lost or dropped)
+    steps = np.hypot(np.diff(x), np.diff(y))
+    closure_gap = float(np.hypot(x[-1] - x[0], y[-1] - y[0]))
+    closed = closure_gap <= close_tolerance
+    boundary = float(steps.sum()) + closure_gap
+    walked = float(steps[steps <= MAX_GAP_M].sum()) + (closure_gap if closed else 0.0)
+    completeness = walked / boundary if boundary > 0 else 0.0
+
+    # Wiggles smaller than the fixes' own error are noise, not boundary
+    tolerance = max(SIMPLIFY_TOLERANCE_M, median_accuracy / 2)
+    kept = simplify_stream(cx, cy, tolerance, SIMPLIFY_WINDOW)
+    if len(kept) > 3 and np.hypot(cx[kept[-1]] - cx[0], cy[kept[-1]] - cy[0]) <= close_tolerance:
+        kept = kept[:-1]  # The ring closes itself; don't repeat the start
+    if len(kept) < 3:
+        raise ValueError("track does not enclose an area")
+
+    # The stream places a vertex where the walk has already left the corner;
+    # move each to the point farthest from the chord between its neighbours
+    kept = _settle_vertices(cx, cy, kept)
+
+    # Cluster points round corners off; put each corner where the lines
+    # through the raw fixes of its two edges meet
+    vx, vy = _snap_corners(x, y, labels, kept, cx[kept], cy[kept], 2 * radius)
+    vertex_lat, vertex_lng = _local_latlng(vx, vy, lat[0], lng[0])
+
+    polygon = Polygon(list(zip(vertex_lng, vertex_lat)))
+    repaired = not polygon.is_valid
+    parts_dropped = 0
+    dropped_fraction = 0.0
+    if repaired:
+        fixed = shapely.make_valid(polygon)
+        polygon = _largest_polygon(fixed)
+        if polygon is None:
+            raise ValueError("track does not enclose an area")
+        parts_dropped = len(getattr(fixed, "geoms", [fixed])) - 1
+        dropped_fraction = 1 - polygon.area / fixed.area if fixed.area else 0.0
+
+    vertex_accuracy = dict(zip(zip(vertex_lng, vertex_lat), point_accuracy[kept]))
+    ring = np.asarray(polygon.exterior.coords)[:-1]
+    mean_accuracy = float(accuracy.mean())
+    coordinates = [
+        {"lat": float(v_lat), "lng": float(v_lng), "accuracy": float(vertex_accuracy.get((v_lng, v_lat), mean_accuracy))}
+        for v_lng, v_lat in ring
+    ]
+
+    # Simplified and raw rings in one vectorized pass
+    area, raw_area = (float(a) for a in calculate_areas([ring, accepted[:, [1, 0]]]))
+
+    return {
+        "coordinates": coordinates,
+        "area_sqm": round(area, 2),
+        "walk": {
+            "walk_completeness": round(completeness, 3),
+            "closed": closed,
+            "closure_gap_m": round(closure_gap, 1),
+            "close_tolerance_m": round(close_tolerance, 1),
+            "max_gap_m": round(float(steps.max()), 1) if len(steps) else 0.0,
+            "perimeter_m": round(boundary, 1),
+            "fixes_received": received,
+            "fixes_accepted": len(accepted),
+            "fixes_dropped_accuracy": received - len(accepted),
+            "vertices": len(coordinates),
+            "mean_accuracy_m": round(mean_accuracy, 2),
+            "repaired": repaired,
+            "parts_dropped": parts_dropped,
+            "dropped_area_percent": round(dropped_fraction * 100, 2),
+            "simplification_area_change_percent": round(abs(area - raw_area) / raw_area * 100, 2) if raw_area else 0.0
+        }
+    }
+
+
+def _coordinate_key(coordinates: List[Dict[str, float]]) -> tuple:
+    return tuple((round(float(p["lat"]), 7), round(float(p["lng"]), 7)) for p in coordinates)
+
+
+class TrackResultStore:
+    """Recent ingest_track results by track_id (oldest dropped beyond max_results)"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_results: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: Dict[str, Any]) -> str:
+        track_id = str(uuid.uuid4())
+        with self._lock:
+            self._results[track_id] = {
+                "expires_at": time.monotonic() + self.ttl_seconds,
+                "coordinates": _coordinate_key(result["coordinates"]),
+                "walk_completeness": result["walk"]["walk_completeness"]
+            }
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return track_id
+
+    def take_completeness(self, track_id: str, coordinates: List[Dict[str, float]]) -> Optional[float]:
+        """
+        The track's walk completeness if it produced exactly these coordinates,
+        else None. Each track is used once.
+        """
+        with self._lock:
+            entry = self._results.pop(track_id, None)
+        if entry is None or entry["expires_at"] < time.monotonic():
+            return None
+        if entry["coordinates"] != _coordinate_key(coordinates):
+            return None
+        return entry["walk_completeness"]
+
+
+track_results = TrackResultStore(RESULT_TTL_SECONDS, MAX_RETAINED_RESULTS)
@@ -0,0 +1,331 @@
+"""
+In-process spatial index over the `lands` registry.
+
+Parcels are held as shapely polygons (lng/lat) in an STRtree, so
+"which existing parcels intersect this one, and by how much" touches only
+the few parcels whose bounding boxes overlap instead of scanning the table.
+The tree is built once (warmed at startup) and kept current on insert:
+new parcels go to a small side list that is searched linearly and folded
+into a rebuilt tree once it grows past REBUILD_THRESHOLD.
+
+Parcels written by other workers are picked up by refreshes that never
+block queries: once LAND_INDEX_REFRESH_SECONDS have passed, the next query
+starts a background thread that fetches only rows created since the newest
+one already indexed. Every LAND_INDEX_FULL_RELOAD_SECONDS the refresh is a
+full reload instead (status changes and deletes made elsewhere), built
+outside the lock and swapped in. Only the very first load is waited for.
+
+The same index answers viewport queries for the map (see land_tiles.py);
+listeners are told the bounds of every change so derived caches can drop
+only what it touches. Rejected parcels stay indexed for the map but never
+count as overlaps. Overlap areas are geodesic (pyproj.Geod), in square meters.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import shapely
+from shapely.strtree import STRtree
+
+from core.supabase_client import supabase
+from .geometry import geodesic_area, to_polygon
+
+# Overlaps smaller than this share of either parcel are treated as GPS noise
+# along a common boundary, not as a double claim
+OVERLAP_TOLERANCE = float(os.getenv("LAND_OVERLAP_TOLERANCE", "0.05"))
+REFRESH_SECONDS = float(os.getenv("LAND_INDEX_REFRESH_SECONDS", "300"))
+FULL_RELOAD_SECONDS = float(os.getenv("LAND_INDEX_FULL_RELOAD_SECONDS", "3600"))
+REBUILD_THRESHOLD = 256
+PAGE_SIZE = 1000
+LAND_COLUMNS = "id, user_id, status, area_sqm, polygon_coordinates, created_at"
+
+
+def _created_at(row: Dict[str, Any]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(row["created_at"]).replace("Z", "+00:00"))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class LandIndex:
+    """STRtree over parcel polygons with incremental inserts"""
+
+    def __init__(self, overlap_tolerance: float = 0.05, refresh_seconds: float = 300, full_reload_seconds: float = 3600):
+        self.overlap_tolerance = overlap_tolerance
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._parcels: Dict[str, Dict[str, Any]] = {}  # land_id -> {polygon, area_sqm, user_id, status}
+        self._tree: Optional[STRtree] = None
+        self._tree_ids: List[str] = []
+        self._pending: List[str] = []  # inserted since the last tree build
+        self._loaded_at = 0.0
+        self._full_loaded_at = 0.0
+        self._newest_created_at: Optional[datetime] = None  # incremental refreshes start here
+        self._lock = threading.RLock()  # guards the index contents; never held across database calls
+        self._load_lock = threading.Lock()  # one load or refresh at a time
+        self._refreshing = False  # a background refresh is running
+        self._reloading = False  # a full reload is fetching rows
+        self._changed_during_load: Dict[str, Dict[str, Any]] = {}  # add()/set_status() racing a full reload
+        self._listeners: List[Callable[[Optional[Tuple[float, float, float, float]]], None]] = []
+
+    # --- Building ---
+
+    def _build_tree(self):
+        self._tree_ids = list(self._parcels)
+        geometries = [self._parcels[land_id]["polygon"] for land_id in self._tree_ids]
+        self._tree = STRtree(geometries) if geometries else None
+        self._pending = []
+
+    def load(self, rows: List[Dict[str, Any]]):
+        """Replace the index contents with these `lands` rows"""
+        parcels = {}
+        for row in rows:
+            parcel = self._parcel(row)
+            if parcel:
+                parcels[str(row["id"])] = parcel
+        tree_ids = list(parcels)
+        geometries = [parcels[land_id]["polygon"] for land_id in tree_ids]
+        tree = STRtree(geometries) if geometries else None  # Built before taking the lock
+        newest = max(filter(None, map(_created_at, rows)), default=None)
+        with self._lock:
+            # Inserts and status changes made while the rows were being fetched win
+            for land_id, parcel in self._changed_during_load.items():
+                parcels[land_id] = parcel
+            in_tree = set(tree_ids)
+            pending = [land_id for land_id in self._changed_during_load if land_id not in in_tree]
+            self._changed_during_load = {}
+            self._parcels, self._tree, self._tree_ids, self._pending = parcels, tree, tree_ids, pending
+            self._newest_created_at = newest
+            self._loaded_at = self._full_loaded_at = time.monotonic()
+        self._notify(None)
+
+    def _fetch_rows(self, created_after: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """All `lands` rows, or those created at or after created_after, oldest first"""
+        rows, start = [], 0
+        while True:
+            query = supabase.table("lands").select(LAND_COLUMNS)
+            if created_after is not None:
+                query = query.gte("created_at", created_after.isoformat())
+            page = query.order("created_at").order("id").range(start, start + PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    def _add_rows(self, rows: List[Dict[str, Any]]):
+        """Fold rows from an incremental fetch into the live index"""
+        added = []
+        with self._lock:
+            for row in rows:
+                land_id = str(row["id"])
+                created_at = _created_at(row)
+                if created_at and (self._newest_created_at is None or created_at > self._newest_created_at):
+                    self._newest_created_at = created_at
+                if land_id in self._parcels:
+                    continue  # Indexed already (same timestamp as the last refresh, or add()ed here)
+                parcel = self._parcel(row)
+                if parcel is None:
+                    continue
+                self._parcels[land_id] = parcel
+                self._pending.append(land_id)
+                added.append(parcel["polygon"].bounds)
+            if len(self._pending) >= REBUILD_THRESHOLD:
+                self._build_tree()
+            self._loaded_at = time.monotonic()
+        for bounds in added:
+            self._notify(bounds)
+        return len(added)
+
+    def _reload(self):
+        """Full reload; queries keep using the old contents until the new ones are swapped in"""
+        started = time.perf_counter()
+        with self._lock:
+            self._changed_during_load = {}
+            self._reloading = True
+        try:
+            self.load(self._fetch_rows())
+        finally:
+            with self._lock:
+                self._reloading = False
+        print(f"🗺️ Land index loaded {len(self._parcels)} parcels in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def refresh(self):
+        """Pick up rows written elsewhere: incremental, or a full reload when one is due"""
+        with self._load_lock:
+            if time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+            if self._newest_created_at is None or time.monotonic() - self._full_loaded_at >= self.full_reload_seconds:
+                self._reload()
+                return
+            added = self._add_rows(self._fetch_rows(created_after=self._newest_created_at))
+            if added:
+                print(f"🗺️ Land index picked up {added} new parcels")
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Land index refresh failed (keeping the current index): {e}")
+                self._loaded_at = time.monotonic()  # Retry after the next interval, not on every query
+            finally:
+                self._refreshing = False
+        threading.Thread(target=run, daemon=True).start()
+
+    def ensure_loaded(self):
+        """
+        Wait for the first load; afterwards, start a background refresh when
+        the interval has passed and answer from the current index meanwhile.
+        """
+        if not self._loaded_at:
+            with self._load_lock:
+                if not self._loaded_at:
+                    self._reload()
+            return
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._refresh_in_background()
+
+    def warm_in_background(self):
+        def warm():
+            try:
+                self.ensure_loaded()
+            except Exception as e:
+                print(f"⚠️ Land index warm-up failed (will retry on first use): {e}")
+        threading.Thread(target=warm, daemon=True).start()
+
+    # --- Updates ---
+
+    def add_listener(self, listener: Callable[[Optional[Tuple[float, float, float, float]]], None]):
+        """listener(bounds) runs after each change; bounds is None after a full reload"""
+        self._listeners.append(listener)
+
+    def _notify(self, bounds: Optional[Tuple[float, float, float, float]]):
+        for listener in list(self._listeners):
+            try:
+                listener(bounds)
+            except Exception as e:
+                print(f"⚠️ Land index listener failed: {e}")
+
+    @staticmethod
+    def _parcel(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            polygon = to_polygon(row.get("polygon_coordinates") or [])
+        except Exception:
+            polygon = None
+        if polygon is None:
+            return None
+        return {
+            "polygon": polygon,
+            "area_sqm": float(row["area_sqm"]) if row.get("area_sqm") else None,  # else computed on first overlap
+            "user_id": row.get("user_id"),
+            "status": row.get("status")
+        }
+
+    def add(self, row: Dict[str, Any]):
+        """Index a newly inserted `lands` row"""
+        parcel = self._parcel(row)
+        if parcel is None:
+            return
+        with self._lock:
+            land_id = str(row["id"])
+            self._parcels[land_id] = parcel
+            self._pending.append(land_id)
+            if self._reloading:
+                self._changed_during_load[land_id] = parcel
+            if len(self._pending) >= REBUILD_THRESHOLD:
+                self._build_tree()
+        self._notify(parcel["polygon"].bounds)
+
+    def set_status(self, land_id: str, status: str):
+        """Track status changes; rejected parcels drop out of overlap checks"""
+        with self._lock:
+            parcel = self._parcels.get(str(land_id))
+            if parcel is None:
+                return
+            parcel["status"] = status
+            if self._reloading:
+                self._changed_during_load[str(land_id)] = parcel
+        self._notify(parcel["polygon"].bounds)
+
+    # --- Queries ---
+
+    def _candidates(self, polygon) -> List[str]:
+        with self._lock:
+            tree, tree_ids, pending = self._tree, self._tree_ids, list(self._pending)
+            pending_polygons = [(land_id, self._parcels[land_id]["polygon"]) for land_id in pending if land_id in self._parcels]
+        ids = [tree_ids[i] for i in tree.query(polygon, predicate="intersects")] if tree is not None else []
+        ids.extend(land_id for land_id, parcel_polygon in pending_polygons if parcel_polygon.intersects(polygon))
+        return list(dict.fromkeys(ids))
+
+    def overlaps(
+        self,
+        coordinates: List[Dict[str, float]],
+        exclude_land_id: Optional[str] = None,
+        include_minor: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Existing parcels intersecting the given boundary, largest overlap first.
+        Each entry has land_id, user_id, status, overlap_sqm and the overlap as a
+        share of the new parcel and of the existing one. Overlaps under the
+        tolerance on both sides are left out unless include_minor is set.
+        """
+        polygon = to_polygon(coordinates)
+        if polygon is None:
+            return []
+        self.ensure_loaded()
+        area = geodesic_area(polygon)
+
+        results = []
+        for land_id in self._candidates(polygon):
+            if land_id == str(exclude_land_id):
+                continue
+            parcel = self._parcels.get(land_id)
+            if parcel is None or parcel["status"] == "REJECTED":
+                continue
+            overlap_sqm = geodesic_area(polygon.intersection(parcel["polygon"]))
+            if overlap_sqm <= 0:
+                continue
+            if parcel["area_sqm"] is None:
+                parcel["area_sqm"] = geodesic_area(parcel["polygon"])
+            share_of_new = overlap_sqm / area if area else 0.0
+            share_of_existing = overlap_sqm / parcel["area_sqm"] if parcel["area_sqm"] else 0.0
+            if not include_minor and max(share_of_new, share_of_existing) < self.overlap_tolerance:
+                continue
+            results.append({
+                "land_id": land_id,
+                "user_id": parcel["user_id"],
+                "status": parcel["status"],
+                "overlap_sqm": round(overlap_sqm, 2),
+                "overlap_percent": round(share_of_new * 100, 2),
+                "existing_overlap_percent": round(share_of_existing * 100, 2)
+            })
+        return sorted(results, key=lambda r: r["overlap_sqm"], reverse=True)
+
+    def in_bounds(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """(land_id, parcel) for every parcel whose polygon intersects the box"""
+        self.ensure_loaded()
+        box = shapely.box(min_lng, min_lat, max_lng, max_lat)
+        results = []
+        for land_id in self._candidates(box):
+            parcel = self._parcels.get(land_id)
+            if parcel is not None:
+                results.append((land_id, parcel))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "parcels": len(self._parcels),
+                "pending": len(self._pending),
+                "loaded": bool(self._loaded_at)
+            }
+
+
+land_index = LandIndex(OVERLAP_TOLERANCE, REFRESH_SECONDS, FULL_RELOAD_SECONDS)
@@ -0,0 +1,201 @@
+"""
+Database access for the land endpoints, in as few round trips as possible.
+
+  - verify: land and document come from one land_verification_context()
+    RPC, then apply_verification() writes the status with a conditional
+    update (it only applies if the status is still the one that was
+    validated, so two concurrent verifications can't overwrite each other)
+    and the pending blockchain_events row in the same transaction
+  - record: record_land() creates the demo user if missing and inserts the
+    land in one transaction
+Both RPCs live in database/land_registry.sql. Until they are deployed the
+same work is done with plain queries: the two verify fetches run
+concurrently, the status update and event insert run one after the other
+and the user is upserted instead of checked then inserted.
+Every step is timed per endpoint; see latency_breakdown.stats().
+"""
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.supabase_client import supabase
+from .blockchain_queue import persist_pending
+
+# After finding an RPC missing, use the plain queries for this long before trying it again
+RPC_RETRY_SECONDS = float(os.getenv("LAND_RPC_RETRY_SECONDS", "300"))
+
+# PostgREST: function not in the schema cache; Postgres: undefined function
+_MISSING_FUNCTION_CODES = ("PGRST202", "42883")
+# PostgREST: column not in the schema cache; Postgres: undefined column
+_MISSING_COLUMN_CODES = ("PGRST204", "42703")
+
+
+class StaleLandStatus(Exception):
+    """The land's status changed between fetching it and writing the result"""
+
+
+class LatencyBreakdown:
+    """Per-endpoint, per-step timings of database round trips"""
+
+    def __init__(self):
+        self._steps: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, step: str, elapsed_ms: float):
+        with self._lock:
+            entry = self._steps.setdefault(endpoint, {}).setdefault(step, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    @contextmanager
+    def measure(self, endpoint: str, step: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(endpoint, step, (time.perf_counter() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                endpoint: {
+                    step: {
+                        "calls": int(entry["calls"]),
+                        "avg_ms": round(entry["total_ms"] / entry["calls"], 1),
+                        "max_ms": round(entry["max_ms"], 1)
+                    }
+                    for step, entry in steps.items()
+                }
+                for endpoint, steps in self._steps.items()
+            }
+
+
+latency_breakdown = LatencyBreakdown()
+
+_rpc_unavailable_until: Dict[str, float] = {}
+
+
+def _call_rpc(name: str, params: Dict[str, Any]) -> Optional[Any]:
+    """RPC result, or None when the RPC is not deployed (the caller falls back)"""
+    if time.monotonic() < _rpc_unavailable_until.get(name, 0):
+        return None
+    try:
+        return supabase.rpc(name, params).execute().data
+    except Exception as e:
+        if getattr(e, "code", None) not in _MISSING_FUNCTION_CODES:
+            raise
+        print(f"⚠️ {name} RPC not deployed ({e}), using plain queries for {RPC_RETRY_SECONDS:.0f}s")
+        _rpc_unavailable_until[name] = time.monotonic() + RPC_RETRY_SECONDS
+        return None
+
+
+def _first(table: str, row_id: str) -> Optional[Dict[str, Any]]:
+    response = supabase.table(table).select("*").eq("id", row_id).execute()
+    return response.data[0] if response.data else None
+
+
+async def fetch_verification_context(land_id: str, document_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """(land row, document row); either is None if it doesn't exist"""
+    with latency_breakdown.measure("verify", "fetch_land_and_document"):
+        context = await asyncio.to_thread(
+            _call_rpc, "land_verification_context", {"p_land_id": land_id, "p_document_id": document_id}
+        )
+        if context is not None:
+            return context.get("land"), context.get("document")
+
+        land, doc = await asyncio.gather(
+            asyncio.to_thread(_first, "lands", land_id),
+            asyncio.to_thread(_first, "land_documents", document_id)
+        )
+        return land, doc
+
+
+def _update_status(land_id: str, status: str, expected_status: Optional[str]) -> List[Dict[str, Any]]:
+    query = supabase.table("lands").update({"status": status}).eq("id", land_id)
+    query = query.is_("status", "null") if expected_status is None else query.eq("status", expected_status)
+    return query.execute().data or []
+
+
+def _apply_verification_via_queries(land_id: str, document_id: str, status: str, expected_status: Optional[str],
+                                    args: Tuple) -> Tuple[bool, Optional[str]]:
+    # Not atomic: a crash between the two writes leaves the land without its event row
+    if not _update_status(land_id, status, expected_status):
+        return False, None
+    return True, persist_pending(land_id, document_id, args)
+
+
+async def apply_verification(land_id: str, document_id: str, status: str, expected_status: Optional[str],
+                             args: Tuple) -> Optional[str]:
+    """
+    Write status only if the land is still in expected_status, together with
+    the pending blockchain_events row for its registration. Returns the event
+    id (None if it could only be kept in memory); raises StaleLandStatus if
+    the status changed.
+    """
+    params = {
+        "p_land_id": land_id,
+        "p_document_id": document_id,
+        "p_expected_status": expected_status,
+        "p_status": status,
+        "p_register_args": list(args)
+    }
+    with latency_breakdown.measure("verify", "update_status_and_event"):
+        result = await asyncio.to_thread(_call_rpc, "apply_verification", params)
+        if result is not None:
+            applied, event_id = result.get("applied"), result.get("event_id")
+        else:
+            applied, event_id = await asyncio.to_thread(
+                _apply_verification_via_queries, land_id, document_id, status, expected_status, args
+            )
+    if not applied:
+        raise StaleLandStatus(f"Land {land_id} changed during verification")
+    return event_id
+
+
+def _demo_user(user_id: str) -> Dict[str, Any]:
+    return {
+        "id": user_id,
+        "phone_number": f"demo-{user_id[:8]}", # Truncated to fit 20 chars
+        "full_name": "Demo Farmer",
+        "email": f"demo-{user_id[:8]}@example.com",
+        "password_hash": "demo_hash"
+    }
+
+
+def _insert_land_via_queries(user_id: str, coordinates: List[Dict[str, Any]], area: float,
+                             walk_completeness: Optional[float]) -> List[Dict[str, Any]]:
+    # Not atomic: a failed land insert can leave the demo user behind, which is harmless
+    supabase.table("users").upsert(_demo_user(user_id), on_conflict="id", ignore_duplicates=True).execute()
+    data = {
+        "user_id": user_id,
+        "polygon_coordinates": coordinates,
+        "area_sqm": area,
+        "status": "PENDING"
+    }
+    if walk_completeness is None:
+        return supabase.table("lands").insert(data).execute().data or []
+    try:
+        return supabase.table("lands").insert({**data, "walk_completeness": walk_completeness}).execute().data or []
+    except Exception as e:
+        if getattr(e, "code", None) not in _MISSING_COLUMN_CODES:
+            raise
+        # land_registry.sql not applied yet: keep the land, lose the walk score
+        print(f"⚠️ lands.walk_completeness missing ({e}), inserting without it")
+        return supabase.table("lands").insert(data).execute().data or []
+
+
+async def insert_land(user_id: str, coordinates: List[Dict[str, Any]], area: float,
+                      walk_completeness: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Inserted lands rows (creating the demo user first if needed)"""
+    params = {"p_user_id": user_id, "p_polygon": coordinates, "p_area": area}
+    if walk_completeness is not None:
+        params["p_walk_completeness"] = walk_completeness
+    with latency_breakdown.measure("record", "insert_user_and_land"):
+        row = await asyncio.to_thread(_call_rpc, "record_land", params)
+        if row is not None:
+            return [row]
+        return await asyncio.to_thread(_insert_land_via_queries, user_id, coordinates, area, walk_completeness)
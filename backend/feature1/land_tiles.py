@@ -0,0 +1,155 @@
+"""
+Viewport tiles of the land registry for the map.
+
+Parcels are served per XYZ web-map tile (the same z/x/y scheme as the base
+imagery) as GeoJSON, straight from the in-memory land index:
+  - only parcels intersecting the tile are included
+  - rings are simplified (Douglas-Peucker) to half a pixel at that zoom and
+    coordinates are rounded to the precision a pixel can show
+  - below MIN_TILE_ZOOM parcels are sub-pixel and tiles are empty
+
+Rendered tiles are cached with an ETag. A change to a parcel drops only the
+cached tiles its bounds touch, so clients revalidating unchanged tiles get
+304s and map load stays flat as the registry grows.
+"""
+import os
+import math
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import shapely
+
+from .land_index import land_index
+
+MIN_TILE_ZOOM = int(os.getenv("LAND_TILES_MIN_ZOOM", "12"))
+MAX_TILE_ZOOM = 22
+MAX_FEATURES_PER_TILE = int(os.getenv("LAND_TILES_MAX_FEATURES", "5000"))
+TILE_CACHE_SIZE = int(os.getenv("LAND_TILES_CACHE_SIZE", "4096"))
+TILE_SIZE_PX = 256
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lng, min_lat, max_lng, max_lat) of a web-mercator tile"""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y))
+
+
+def pixel_degrees(z: int) -> float:
+    """Longitude span of one pixel at zoom z (an upper bound for latitude too)"""
+    return 360 / (TILE_SIZE_PX * 2 ** z)
+
+
+def _ring(coords, decimals: int) -> List[List[float]]:
+    return [[round(lng, decimals), round(lat, decimals)] for lng, lat in coords]
+
+
+def _geometry(polygon, decimals: int) -> Optional[Dict[str, Any]]:
+    polygons = [polygon] if polygon.geom_type == "Polygon" else [
+        part for part in getattr(polygon, "geoms", []) if part.geom_type == "Polygon"
+    ]
+    rings = [[_ring(p.exterior.coords, decimals)] + [_ring(i.coords, decimals) for i in p.interiors]
+             for p in polygons if not p.is_empty]
+    if not rings:
+        return None
+    if len(rings) == 1:
+        return {"type": "Polygon", "coordinates": rings[0]}
+    return {"type": "MultiPolygon", "coordinates": rings}
+
+
+def render_bounds(bounds: Tuple[float, float, float, float], z: int) -> Dict[str, Any]:
+    """GeoJSON FeatureCollection of the parcels in a box, generalized for zoom z"""
+    if z < MIN_TILE_ZOOM:
+        return {"type": "FeatureCollection", "features": [], "min_zoom": MIN_TILE_ZOOM}
+
+    tolerance = pixel_degrees(z) / 2
+    decimals = min(7, max(0, math.ceil(-math.log10(pixel_degrees(z) / 4))))
+
+    parcels = sorted(land_index.in_bounds(*bounds), key=lambda item: item[0])
+    features = []
+    for land_id, parcel in parcels[:MAX_FEATURES_PER_TILE]:
+        simplified = shapely.simplify(parcel["polygon"], tolerance, preserve_topology=True)
+        geometry = _geometry(simplified, decimals)
+        if geometry is None:
+            continue
+        features.append({
+            "type": "Feature",
+            "id": land_id,
+            "geometry": geometry,
+            "properties": {
+                "status": parcel["status"],
+                "area_sqm": round(parcel["area_sqm"], 2) if parcel["area_sqm"] is not None else None
+            }
+        })
+
+    collection = {"type": "FeatureCollection", "features": features}
+    if len(parcels) > MAX_FEATURES_PER_TILE:
+        collection["truncated"] = True
+    return collection
+
+
+def encode(collection: Dict[str, Any]) -> Tuple[str, bytes]:
+    """(ETag, compact JSON body)"""
+    body = json.dumps(collection, separators=(",", ":")).encode()
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"', body
+
+
+class LandTileCache:
+    """Rendered tile bodies and ETags, invalidated by the bounds of each parcel change"""
+
+    def __init__(self, max_tiles: int = 4096):
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple[int, int, int], Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, z: int, x: int, y: int) -> Tuple[str, bytes]:
+        key = (z, x, y)
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generation
+
+        etag, body = encode(render_bounds(tile_bounds(z, x, y), z))
+
+        with self._lock:
+            # Don't cache a tile that a parcel change raced with
+            if generation != self._generation:
+                return etag, body
+            self._tiles[key] = (etag, body)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return etag, body
+
+    def invalidate(self, bounds: Optional[Tuple[float, float, float, float]] = None):
+        """Drop tiles intersecting bounds (every tile when bounds is None)"""
+        with self._lock:
+            self._generation += 1
+            if bounds is None:
+                self._tiles.clear()
+                return
+            min_lng, min_lat, max_lng, max_lat = bounds
+            for key in list(self._tiles):
+                t_min_lng, t_min_lat, t_max_lng, t_max_lat = tile_bounds(*key)
+                if t_min_lng <= max_lng and min_lng <= t_max_lng and t_min_lat <= max_lat and min_lat <= t_max_lat:
+                    del self._tiles[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached_tiles": len(self._tiles), "hits": self.hits, "misses": self.misses}
+
+
+land_tile_cache = LandTileCache(TILE_CACHE_SIZE)
+land_index.add_listener(land_tile_cache.invalidate)
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Response
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .services import calculate_polygon_area, extract_data_with_gemini, validate_land_claim, create_blockchain_hash
+from .land_index import land_index
+from .document_jobs import OcrQueueFull, document_jobs, ocr_pipeline, submit_document
+from .blockchain_queue import land_registrations
+from .gps_track import decode_track, ingest_track, track_array, track_results
+from .land_store import StaleLandStatus, apply_verification, fetch_verification_context, insert_land, latency_breakdown
+from .land_tiles import MAX_TILE_ZOOM, encode, land_tile_cache, render_bounds
 from core.supabase_client import supabase
+from core.image_prep import get_image_prep_stats
+import asyncio
 import os
 router = APIRouter(prefix="/api/feature1", tags=["mark-my-land"])
 
@@ -14,11 +22,24 @@ class GeoPoint(BaseModel):
 class LandRecordRequest(BaseModel):
     user_id: str
     coordinates: List[GeoPoint]
+    track_id: Optional[str] = None # From /land/track for walked boundaries
+
+class TrackRequest(BaseModel):
+    points: Optional[List[List[float]]] = None # [[lat, lng, accuracy], ...]
+    encoded: Optional[str] = None # Delta-encoded buffer, see feature1/gps_track.py
 
 class VerifyRequest(BaseModel):
     land_id: str
     document_id: str
 
+@router.on_event("startup")
+def warm_land_index():
+    land_index.warm_in_background()
+
+@router.on_event("startup")
+def resume_blockchain_registrations():
+    land_registrations.resume_in_background()
+
 @router.post("/land/record")
 async def record_land(request: LandRecordRequest):
     try:
@@ -33,33 +54,28 @@ async def record_land(request: LandRecordRequest):
             print(f"Area calculation failed: {e}")
             area = 0.0 # Fallback
 
-        print(f"Checking if user exists: {request.user_id}")
-        existing = supabase.table("users").select("id").eq("id", request.user_id).execute()
-        
-        if not existing.data:
-            print("User not found, creating new demo user...")
-            # Create new user with required fields
-            user_data = {
-                "id": request.user_id, 
-                "phone_number": f"demo-{request.user_id[:8]}", # Truncated to fit 20 chars
-                "full_name": "Demo Farmer",
-                "email": f"demo-{request.user_id[:8]}@example.com",
-                "password_hash": "demo_hash"
-            }
-            user_res = supabase.table("users").insert(user_data).execute()
-            print("User creation successful")
-        else:
-            print("User exists, skipping creation")
-        
-        data = {
-            "user_id": request.user_id,
-            "polygon_coordinates": coords_dict,
-            "area_sqm": area,
-            "status": "PENDING"
-        }
+        # Double-claim check against the spatial index (bbox candidates only)
+        try:
+            overlaps = await asyncio.to_thread(land_index.overlaps, coords_dict)
+        except Exception as e:
+            print(f"Overlap check failed (non-critical): {e}")
+            overlaps = []
+        if overlaps:
+            print(f"⚠️ New parcel overlaps {len(overlaps)} existing parcel(s): {[o['land_id'] for o in overlaps]}")
+
+        # Walk completeness comes from our own /land/track result, never from the client
+        walk_completeness = None
+        if request.track_id:
+            walk_completeness = track_results.take_completeness(request.track_id, coords_dict)
+            if walk_completeness is None:
+                print(f"⚠️ Track {request.track_id} unknown, expired or edited; recording as hand-drawn")
+
+        # Demo user (if missing) and land in one transaction
         print("Attempting to insert land record")
-        response = supabase.table("lands").insert(data).execute()
+        inserted = await insert_land(request.user_id, coords_dict, area, walk_completeness)
         print("Land insert successful")
+        for row in inserted:
+            land_index.add(row)
         
         try:
             # Twilio Notification
@@ -68,13 +84,13 @@ async def record_land(request: LandRecordRequest):
             # Use a hardcoded number or environmental variable for the demo user
             DEMO_PHONE = "+919999999999" 
             
-            if response.data and len(response.data) > 0:
-                land_id = response.data[0]['id']
+            if inserted:
+                land_id = inserted[0]['id']
                 send_feature_notification(DEMO_PHONE, "Land Mapping", f"Land ID {land_id} mapped successfully! Area: {area:.2f} sqm")
         except Exception as notify_err:
             print(f"Notification failed (non-critical): {notify_err}")
 
-        return {"params": {"area": area}, "data": response.data}
+        return {"params": {"area": area}, "data": inserted, "overlaps": overlaps}
 
     except Exception as e:
         print(f"CRITICAL ERROR in record_land: {type(e).__name__}: {str(e)}")
@@ -82,8 +98,29 @@ async def record_land(request: LandRecordRequest):
         traceback.print_exc() 
         raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
 
-@router.post("/document/upload")
+@router.post("/land/track")
+async def ingest_land_track(request: TrackRequest):
+    """
+    Turns a raw walk-the-boundary GPS track into the polygon to record:
+    inaccurate fixes dropped, simplified, self-intersections repaired.
+    Returns coordinates and area_sqm plus walk metrics, and a track_id to
+    pass on to /land/record with those coordinates.
+    """
+    if (request.points is None) == (request.encoded is None):
+        raise HTTPException(status_code=400, detail="Send exactly one of points or encoded")
+    try:
+        fixes = track_array(request.points) if request.points is not None else decode_track(request.encoded)
+        result = await asyncio.to_thread(ingest_track, fixes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "track_id": track_results.put(result)}
+
+@router.post("/document/upload", status_code=202)
 async def upload_document(land_id: str, file: UploadFile = File(...)):
+    """
+    Stores the document and queues OCR; returns a job to poll at /document/jobs/{job_id}.
+    Re-uploads of an already processed file reuse its OCR result.
+    """
     # Simulating file upload to storage bucker -> getting URL
     # For now, we'll just mock the URL
     file_url = f"https://mock-storage.com/{file.filename}"
@@ -94,86 +131,141 @@ async def upload_document(land_id: str, file: UploadFile = File(...)):
     # Determine basic mime type or default to jpeg/text
     mime_type = file.content_type or "text/plain"
     
-    ocr_result = extract_data_with_gemini(content, mime_type)
-    
     try:
-        data = {
-            "land_id": land_id,
-            "document_url": file_url,
-            "extracted_area_sqm": ocr_result["extracted_area_sqm"],
-            "confidence_score": ocr_result["confidence_score"]
-        }
-        response = supabase.table("land_documents").insert(data).execute()
-        
-        # Merge the OCR text into the response so frontend can display it
-        result_data = response.data[0]
-        # Pass the full structured object for frontend parsing
-        result_data["ocr_data"] = ocr_result
-        result_data["extracted_text"] = ocr_result.get("text", "No text extracted")
-        return result_data
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        job = submit_document(land_id, file.filename, file_url, content, mime_type)
+    except OcrQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return job.to_dict()
+
+MAX_JOB_WAIT_SECONDS = 30
+
+@router.get("/document/jobs/{job_id}")
+async def get_document_job(job_id: str, wait: float = 0):
+    """
+    Status of a document job; result holds the land_documents row (with ocr_data)
+    once completed. wait=N long-polls up to N seconds for the job to finish.
+    """
+    job = document_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if wait > 0:
+        await asyncio.to_thread(job.wait, min(wait, MAX_JOB_WAIT_SECONDS))
+    return job.to_dict()
+
+@router.get("/document/ocr-stats")
+async def get_ocr_stats():
+    return {**ocr_pipeline.stats(), "image_prep": get_image_prep_stats().get("land_document")}
 
 @router.post("/verify")
 async def verify_claim(request: VerifyRequest):
     try:
-        # Fetch Land
-        land_res = supabase.table("lands").select("*").eq("id", request.land_id).execute()
-        if not land_res.data:
+        # Land and document in one round trip
+        land, doc = await fetch_verification_context(request.land_id, request.document_id)
+        if not land:
             raise HTTPException(status_code=404, detail="Land not found")
-        land = land_res.data[0]
-        
-        # Fetch Document
-        doc_res = supabase.table("land_documents").select("*").eq("id", request.document_id).execute()
-        if not doc_res.data:
+        if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
-        doc = doc_res.data[0]
         
         # Validate
         # Note: We are passing the full dictionaries now, not just areas, to support location checking if we had it
-        validation_res = validate_land_claim(land, doc["ocr_data"] if "ocr_data" in doc else doc)
+        with latency_breakdown.measure("verify", "validate"):
+            # Off the event loop: the overlap check may wait for the land index's first load
+            validation_res = await asyncio.to_thread(validate_land_claim, land, doc["ocr_data"] if "ocr_data" in doc else doc)
         
-        # Update Land Status
+        # Update Land Status (only if nobody else changed it since the fetch) and, in the
+        # same transaction, the pending blockchain_events row that gets the receipt once mined
         status = validation_res["status"]
-        supabase.table("lands").update({
-            "status": status
-        }).eq("id", request.land_id).execute()
-        
-        # Create Blockchain Event (On Real Blockchain)
-        from .blockchain_client import register_land_on_blockchain
-        
-        # Hash now comes from the ACTUAL smart contract transaction
-        tx_hash = register_land_on_blockchain(land, doc, validation_res)
+        registration = land_registrations.prepare(land, doc, validation_res)
+        try:
+            registration.event_id = await apply_verification(
+                request.land_id, request.document_id, status, land.get("status"), registration.args
+            )
+        except StaleLandStatus as e:
+            raise HTTPException(status_code=409, detail=f"{e}; please retry")
+        land_index.set_status(request.land_id, status)
         
-        event_data = {
-            "land_id": request.land_id,
-            "document_id": request.document_id,
-            "data_hash": tx_hash # Storing the ETH TX Hash now!
-        }
-        supabase.table("blockchain_events").insert(event_data).execute()
+        # Register on the blockchain in the background
+        land_registrations.enqueue(registration)
         
         # Return full validation result to frontend
         return {
             "status": status, 
-            "hash": tx_hash, 
+            "hash": None, # Filled in once mined: see /blockchain/registrations/{registration_id}
             "confidence_score": validation_res["system_confidence"],
-            "details": validation_res
+            "details": validation_res,
+            "blockchain": registration.to_dict()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"CRITICAL ERROR in verify_claim: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/latency")
+async def get_latency_breakdown():
+    """Average and worst database time per step of /land/record and /verify"""
+    return latency_breakdown.stats()
+
+def _geojson_response(request: Request, etag: str, body: bytes) -> Response:
+    # Clients revalidate every time; unchanged data costs a 304 and no body
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/geo+json", headers=headers)
+
+@router.get("/blockchain/registrations/{registration_id}")
+async def get_blockchain_registration(registration_id: str, wait: float = 0):
+    """
+    Progress of a queued land registration; tx_hash is set once sent and
+    status becomes "confirmed" when mined. wait=N long-polls up to N seconds.
+    """
+    registration = land_registrations.get(registration_id)
+    if registration is None:
+        raise HTTPException(status_code=404, detail="Registration not found or expired")
+    if wait > 0:
+        await asyncio.to_thread(registration.wait, min(wait, MAX_JOB_WAIT_SECONDS))
+    return registration.to_dict()
+
+@router.get("/blockchain/stats")
+async def get_blockchain_stats():
+    return land_registrations.stats()
+
 @router.get("/lands")
-async def get_lands():
+async def get_lands(request: Request, bbox: Optional[str] = None, zoom: Optional[int] = None):
     """
-    Fetches all land records to display on the map.
+    Fetches land records to display on the map.
+    With bbox=min_lng,min_lat,max_lng,max_lat and zoom, returns only the parcels in
+    that viewport as simplified GeoJSON; without them, every record (legacy).
     """
+    if bbox is None:
+        try:
+            response = supabase.table("lands").select("*").execute()
+            return response.data
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     try:
-        response = supabase.table("lands").select("*").execute()
-        return response.data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lng,min_lat,max_lng,max_lat")
+    if min_lng >= max_lng or min_lat >= max_lat:
+        raise HTTPException(status_code=400, detail="bbox is empty")
+    if zoom is None or not 0 <= zoom <= MAX_TILE_ZOOM:
+        raise HTTPException(status_code=400, detail=f"zoom between 0 and {MAX_TILE_ZOOM} is required with bbox")
+
+    # Index queries and shapely work run off the event loop
+    etag, body = await asyncio.to_thread(lambda: encode(render_bounds((min_lng, min_lat, max_lng, max_lat), zoom)))
+    return _geojson_response(request, etag, body)
+
+@router.get("/lands/tiles/{z}/{x}/{y}")
+async def get_land_tile(request: Request, z: int, x: int, y: int):
+    """
+    Parcels in one XYZ map tile as simplified GeoJSON, cached per tile with an ETag.
+    """
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    etag, body = await asyncio.to_thread(land_tile_cache.get, z, x, y)
+    return _geojson_response(request, etag, body)
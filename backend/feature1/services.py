@@ -2,9 +2,8 @@ import hashlib
 import json
 import random
 from typing import List, Dict, Any
-from shapely.geometry import Polygon
-from shapely.ops import transform
-import pyproj
+from .geometry import calculate_area
+from core.image_prep import prepare_image
 
 def calculate_polygon_area(coordinates: List[Dict[str, float]]) -> float:
     """
@@ -14,41 +13,22 @@ def calculate_polygon_area(coordinates: List[Dict[str, float]]) -> float:
     if len(coordinates) < 3:
         return 0.0
 
-    # Create a polygon from the coordinates (lng, lat) order for shapely
-    poly_coords = [(p['lng'], p['lat']) for p in coordinates]
-    polygon = Polygon(poly_coords)
-
-    # Project to a local equal-area projection to get area in meters
-    # Using a simple estimation or a proper projection like Albers Equal Area serves best.
-    # For global coverage, we typically project to a UTM zone, but for simplicity here 
-    # we can use a generic estimation or a specific projection if we knew the zone.
-    # Here we use a distinct strategy: project to 3857 (Web Mercator) which distorts area, 
-    # OR better: use an AEA projection centered on the polygon.
-    
-    # Simple strategy: Project to World Equidistant Cylindrical (Plate Carree) is bad for area.
-    # Let's use a dynamic projection based on the centroid.
-    
-    centroid = polygon.centroid
-    
-    # Construct a localized AEA projection string
-    proj_string = f"+proj=aea +lat_1={centroid.y} +lat_2={centroid.y} +lat_0={centroid.y} +lon_0={centroid.x}"
-    
-    project = pyproj.Transformer.from_proj(
-        pyproj.Proj("epsg:4326"), # WGS84
-        pyproj.Proj(proj_string),
-        always_xy=True
-    ).transform
-
-    projected_poly = transform(project, polygon)
-    return abs(projected_poly.area)
+    # Equal-area projection of the WGS84 ellipsoid, vectorized (see geometry.py);
+    # no per-call projection/transformer setup
+    return calculate_area(coordinates)
 
 import os
 import google.generativeai as genai
 
-def extract_data_with_gemini(file_content: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+# Walk score for parcels drawn by hand: no evidence either way, so neither full nor zero marks
+HAND_DRAWN_WALK_COMPLETENESS = float(os.getenv("HAND_DRAWN_WALK_COMPLETENESS", "0.5"))
+
+def extract_data_with_gemini(file_content: bytes, mime_type: str = "image/jpeg", fallback: bool = True) -> Dict[str, Any]:
     """
     Extracts land area and details using Gemini Pro Vision.
-    Falls back to simulation if GEMINI_API_KEY is not set.
+    Falls back to simulation if GEMINI_API_KEY is not set. Gemini errors also
+    fall back to simulation unless fallback=False, in which case they are raised
+    (the document pipeline retries them).
     """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
@@ -85,10 +65,14 @@ def extract_data_with_gemini(file_content: bytes, mime_type: str = "image/jpeg")
         4. If a field is not found, use "NOT FOUND" or null.
         5. Do NOT use markdown code blocks (```json). Just return the raw JSON string.
         """
+        # Upright, downsized, metadata-free copy of the scan (non-images pass through);
+        # PNG scans stay lossless so small print survives
+        image_data, image_mime_type = prepare_image(file_content, mime_type, source="land_document", keep_png=True)
+
         # Create a Part object describing the data
         image_part = {
-            "mime_type": mime_type,
-            "data": file_content
+            "mime_type": image_mime_type,
+            "data": image_data
         }
 
         response = model.generate_content([prompt, image_part])
@@ -141,6 +125,8 @@ Notes: {data.get('summary', '')}"""
 
     except Exception as e:
         print(f"Gemini Error: {e}")
+        if not fallback:
+            raise
         return simulate_ocr_fallback(file_content, error_msg=str(e))
 
 def simulate_ocr_fallback(file_content: bytes, error_msg: str = None) -> Dict[str, Any]:
@@ -181,7 +167,8 @@ def simulate_ocr_fallback(file_content: bytes, error_msg: str = None) -> Dict[st
         "property_address": "123 Simulated Lane, Digital Village",
         "survey_number": "SIM-999",
         "registration_date": "2024-01-01",
-        "summary": "This is simulated data because the AI service was unavailable."
+        "summary": "This is simulated data because the AI service was unavailable.",
+        "simulated": True
     }
 
 def calculate_confidence_score(gps_accuracy: float, area_match_percent: float, location_match: bool, walk_completeness: float = 1.0) -> float:
@@ -204,7 +191,7 @@ def calculate_confidence_score(gps_accuracy: float, area_match_percent: float, l
     # checking simplistic model:
     gps_score = max(0, 100 - (gps_accuracy * 2)) 
     
-    # Walk completeness (Simulated 100% for now)
+    # Walk completeness: share of the boundary covered by the GPS walk (HAND_DRAWN_WALK_COMPLETENESS when drawn by hand)
     walk_score = walk_completeness * 100
     
     final_score = (area_score * 0.40) + (loc_score * 0.30) + (gps_score * 0.20) + (walk_score * 0.10)
@@ -225,10 +212,16 @@ def validate_land_claim(land_data: Dict[str, Any], doc_data: Dict[str, Any]) ->
     diff = abs(mapped_area - doc_area)
     percentage_diff = diff / doc_area
     
-    # 2. Location Check (Simulated)
-    # In real app, perform Point-in-Polygon check against District/Village boundary database
-    # Here we mock it: Assume true if we have GPS data
-    location_match = True 
+    # 2. Location Check: the parcel must not overlap land already verified for someone.
+    # Overlaps with other pending claims are reported; whichever verifies first wins.
+    from .land_index import land_index
+    try:
+        overlaps = land_index.overlaps(land_data.get("polygon_coordinates") or [], exclude_land_id=land_data.get("id"))
+    except Exception as e:
+        print(f"Overlap check failed, skipping location check: {e}")
+        overlaps = []
+    verified_overlaps = [o for o in overlaps if o["status"] == "VERIFIED"]
+    location_match = not verified_overlaps
     
     # 3. Calculate Confidence
     # Calculate Average GPS Accuracy from stored points
@@ -241,12 +234,20 @@ def validate_land_claim(land_data: Dict[str, Any], doc_data: Dict[str, Any]) ->
     
     print(f"📡 Real GPS Accuracy: {avg_accuracy:.2f}m")
     
-    system_confidence = calculate_confidence_score(avg_accuracy, percentage_diff, location_match)
+    # Walked boundaries carry how much of the boundary the track covered (see gps_track);
+    # hand-placed points prove no walk at all, so they get a neutral score, not full marks
+    walk_completeness = land_data.get("walk_completeness")
+    walk_completeness = HAND_DRAWN_WALK_COMPLETENESS if walk_completeness is None else min(1.0, max(0.0, float(walk_completeness)))
+    
+    system_confidence = calculate_confidence_score(avg_accuracy, percentage_diff, location_match, walk_completeness)
     
     status = "REJECTED"
     reason = "Unknown"
     
-    if percentage_diff <= 0.05 and location_match:
+    if not location_match:
+        status = "REJECTED"
+        reason = f"Overlaps {len(verified_overlaps)} verified parcel(s) (largest overlap: {verified_overlaps[0]['overlap_sqm']:.0f} sqm)"
+    elif percentage_diff <= 0.05:
         status = "VERIFIED"
         reason = f"Perfect Match (Diff: {percentage_diff*100:.2f}%)"
     elif 0.05 < percentage_diff <= 0.15:
@@ -258,9 +259,6 @@ def validate_land_claim(land_data: Dict[str, Any], doc_data: Dict[str, Any]) ->
         # Map 'FAIL' to 'REJECTED'
         status = "REJECTED"
         reason = f"Significant Deviation (Diff: {percentage_diff*100:.2f}%)"
-    elif not location_match:
-        status = "REJECTED"
-        reason = "Location Mismatch"
         
     return {
         "status": status,
@@ -268,7 +266,9 @@ def validate_land_claim(land_data: Dict[str, Any], doc_data: Dict[str, Any]) ->
         "system_confidence": system_confidence,
         "details": {
             "area_diff_percent": round(percentage_diff * 100, 2),
-            "location_match": location_match
+            "location_match": location_match,
+            "walk_completeness": walk_completeness,
+            "overlaps": overlaps
         }
     }
 
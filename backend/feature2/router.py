@@ -162,7 +162,10 @@ async def get_agronomists(count: int = 2, specialization: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- SCHEME APPLICATION ENDPOINTS ---
+from fastapi.responses import StreamingResponse
 from .scheme_application_service import SchemeApplicationService
+from core.pagination import InvalidCursor
+import json
 
 class SchemeApplicationRequest(BaseModel):
     user_id: str  # From farmer_profiles
@@ -208,22 +211,49 @@ async def get_farmer_applications(farmer_id: str):
 async def get_all_applications(
     limit: int = 100,
     offset: int = 0,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: str = "estimated"
 ):
     """
     Get all scheme applications (Admin only)
+    Pass next_cursor from the previous response as cursor for the next page.
+    count=estimated|planned|exact picks how total is computed (exact scans the whole table).
     """
+    if count not in ("estimated", "planned", "exact"):
+        raise HTTPException(status_code=400, detail="count must be estimated, planned or exact")
     try:
         result = SchemeApplicationService.get_all_applications(
-            limit=limit,
+            limit=min(max(limit, 1), 500),
             status=status,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            count=count
         )
         return result
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ Error fetching applications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scheme-applications/export")
+async def export_applications(status: Optional[str] = None):
+    """
+    Stream all scheme applications as NDJSON (one JSON object per line) for
+    admin bulk downloads. Pages through the table by cursor, so memory use
+    stays flat however many applications there are.
+    """
+    def rows():
+        for application in SchemeApplicationService.iter_applications(status=status):
+            yield json.dumps(application, default=str) + "\n"
+    
+    return StreamingResponse(
+        rows(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=scheme_applications.ndjson"}
+    )
+
 @router.patch("/scheme-applications/{application_id}/status")
 async def update_application_status(
     application_id: str,  # UUID as string
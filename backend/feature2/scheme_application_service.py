@@ -3,20 +3,30 @@ Scheme Application Service - Manages farmer government scheme applications
 ADAPTED TO EXISTING SCHEMA: Uses user_id (text), reference_no, and JSONB application_details
 """
 from core.supabase_client import supabase
-from typing import List, Optional, Dict
-from datetime import datetime
-import random
-import string
+from typing import Callable, Iterator, List, Optional, Dict
+from core.reference_ids import insert_with_reference, is_unique_violation, scheme_reference_ids
+from core.pagination import InvalidCursor, keyset_page, split_page
+from core.dashboard_stats import get_application_counts, invalidate_dashboard_stats
+
+# Column projections per view; each must include id and created_at for the cursor
+ADMIN_LIST_COLUMNS = "id,reference_no,user_id,farmer_name,farmer_phone,scheme_name,status,created_at,application_details"
+EXPORT_COLUMNS = "id,reference_no,user_id,farmer_name,farmer_phone,scheme_name,status,created_at,updated_at,application_details"
+
+def _with_reference(row: Dict, reference_no: str) -> Dict:
+    """row under reference_no, keeping the copy in application_details (if any) in step"""
+    updated = {**row, "reference_no": reference_no}
+    details = row.get("application_details")
+    if isinstance(details, dict) and "reference_no" in details:
+        updated["application_details"] = {**details, "reference_no": reference_no}
+    return updated
 
 class SchemeApplicationService:
     """Service to manage scheme applications in database"""
     
     @staticmethod
     def generate_reference_no() -> str:
-        """Generate unique reference number like SA-2024-XXXXX"""
-        year = datetime.now().year
-        random_part = ''.join(random.choices(string.digits, k=5))
-        return f"SA-{year}-{random_part}"
+        """Generate reference number like SA-2024-0A93YXGRTNC00 (time-ordered, unique per node id)"""
+        return scheme_reference_ids.next()
     
     @staticmethod
     def create_application(
@@ -42,29 +52,7 @@ class SchemeApplicationService:
         try:
             print(f"🔍 Creating application for user: {user_id}, scheme: {scheme_name}")
             
-            # Generate unique reference number
-            reference_no = SchemeApplicationService.generate_reference_no()
-            print(f"📋 Generated reference_no: {reference_no}")
-            
-            # Check if reference_no already exists (very unlikely)
-            try:
-                existing = supabase.table('scheme_applications')\
-                    .select('reference_no')\
-                    .eq('reference_no', reference_no)\
-                    .execute()
-                
-                # Retry if duplicate
-                while existing.data and len(existing.data) > 0:
-                    reference_no = SchemeApplicationService.generate_reference_no()
-                    existing = supabase.table('scheme_applications')\
-                        .select('reference_no')\
-                        .eq('reference_no', reference_no)\
-                        .execute()
-            except Exception as check_error:
-                print(f"⚠️ Could not check for existing reference (table might not exist): {check_error}")
-            
             application_data = {
-                "reference_no": reference_no,
                 "user_id": user_id,
                 "farmer_name": farmer_name,
                 "farmer_phone": farmer_phone,
@@ -73,17 +61,21 @@ class SchemeApplicationService:
                 "application_details": application_details
             }
             
-            print(f"📤 Inserting data: {application_data}")
+            def insert(reference_no: str):
+                print(f"📤 Inserting application {reference_no}: {application_data}")
+                return supabase.table('scheme_applications')\
+                    .insert({"reference_no": reference_no, **application_data})\
+                    .execute()
             
-            response = supabase.table('scheme_applications')\
-                .insert(application_data)\
-                .execute()
+            # No lookup before the insert; a reference clash is retried with a new one
+            response, reference_no = insert_with_reference(scheme_reference_ids, insert)
             
             print(f"📥 Supabase response: {response}")
             print(f"📥 Response data: {response.data}")
             print(f"📥 Response count: {response.count if hasattr(response, 'count') else 'N/A'}")
             
             if response.data and len(response.data) > 0:
+                invalidate_dashboard_stats()
                 print(f"✅ Scheme application created: {reference_no} - {scheme_name}")
                 return {"status": "success", "data": response.data[0], "reference_no": reference_no}
             else:
@@ -98,6 +90,65 @@ class SchemeApplicationService:
             print(f"📍 Full traceback:\n{error_trace}")
             return {"status": "error", "message": str(e), "traceback": error_trace}
     
+    @staticmethod
+    def generate_reference_numbers(count: int) -> List[str]:
+        """Allocate count unique reference numbers in one step, without querying the table"""
+        return scheme_reference_ids.allocate(count)
+    
+    @staticmethod
+    def create_applications_bulk(
+        rows: List[Dict],
+        chunk_size: int = 500,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict:
+        """
+        Insert many applications with one insert per chunk
+        
+        Args:
+            rows: Application rows (reference_no, user_id, scheme_name, status, application_details, ...)
+            chunk_size: Rows per insert request
+            on_progress: Called with (inserted_so_far, failed_so_far) after each chunk
+            
+        Returns:
+            Dictionary with inserted records and failed rows with their errors
+        """
+        inserted = []
+        failed = []
+        
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            try:
+                response = supabase.table('scheme_applications').insert(chunk).execute()
+                inserted.extend(response.data or [])
+            except Exception as chunk_error:
+                # A chunk insert is all-or-nothing; retry row by row to isolate the bad rows
+                print(f"⚠️ Bulk insert chunk failed ({chunk_error}), retrying rows individually")
+                for row in chunk:
+                    try:
+                        try:
+                            response = supabase.table('scheme_applications').insert(row).execute()
+                        except Exception as row_error:
+                            if not is_unique_violation(row_error):
+                                raise
+                            # Reference shared with another process: insert under a fresh one
+                            response, reference_no = insert_with_reference(
+                                scheme_reference_ids,
+                                lambda reference_no: supabase.table('scheme_applications')
+                                    .insert(_with_reference(row, reference_no)).execute()
+                            )
+                            row.update(_with_reference(row, reference_no))
+                        inserted.extend(response.data or [])
+                    except Exception as row_error:
+                        failed.append({"row": row, "error": str(row_error)})
+            
+            if on_progress:
+                on_progress(len(inserted), len(failed))
+        
+        if inserted:
+            invalidate_dashboard_stats()
+        print(f"✅ Bulk insert: {len(inserted)} applications created, {len(failed)} failed")
+        return {"inserted": inserted, "failed": failed}
+    
     @staticmethod
     def get_farmer_applications(user_id: str) -> List[Dict]:
         """
@@ -126,39 +177,72 @@ class SchemeApplicationService:
     def get_all_applications(
         limit: int = 100,
         status: Optional[str] = None,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        count: str = "estimated",
+        columns: str = ADMIN_LIST_COLUMNS
     ) -> Dict:
         """
-        Get all scheme applications (for admin)
+        Get all scheme applications (for admin), newest first
         
         Args:
             limit: Number of records to return
             status: Filter by application status
-            offset: Pagination offset
+            offset: Legacy offset paging, used only when no cursor is given
+            cursor: next_cursor from the previous page (keyset pagination)
+            count: How to compute total: 'estimated' (cheap, default), 'planned' or 'exact' (full scan)
+            columns: Columns to select (must include id and created_at)
             
         Returns:
-            Dictionary with applications and count
+            Dictionary with applications, next_cursor and total
         """
         try:
-            query = supabase.table('scheme_applications')\
-                .select('*', count='exact')\
-                .order('created_at', desc=True)\
-                .range(offset, offset + limit - 1)
+            query = supabase.table('scheme_applications').select(columns, count=count)
             
             # Add status filter if provided
             if status and status != 'All':
                 query = query.eq('status', status)
             
-            response = query.execute()
+            if offset and not cursor:
+                response = query.order('created_at', desc=True).order('id', desc=True)\
+                    .range(offset, offset + limit).execute()
+            else:
+                response = keyset_page(query, limit, cursor).execute()
+            
+            applications, next_cursor = split_page(response.data, limit)
             
             return {
-                "applications": response.data if response.data else [],
+                "applications": applications,
+                "next_cursor": next_cursor,
                 "total": response.count or 0
             }
             
+        except InvalidCursor:
+            raise
         except Exception as e:
             print(f"❌ Error fetching all applications: {e}")
-            return {"applications": [], "total": 0}
+            return {"applications": [], "next_cursor": None, "total": 0}
+    
+    @staticmethod
+    def iter_applications(
+        status: Optional[str] = None,
+        columns: str = EXPORT_COLUMNS,
+        page_size: int = 1000
+    ) -> Iterator[Dict]:
+        """
+        Yield every application, newest first, one keyset page at a time
+        (for exports; memory use is bounded by page_size)
+        """
+        cursor = None
+        while True:
+            query = supabase.table('scheme_applications').select(columns)
+            if status and status != 'All':
+                query = query.eq('status', status)
+            response = keyset_page(query, page_size, cursor).execute()
+            page, cursor = split_page(response.data, page_size)
+            yield from page
+            if cursor is None:
+                return
     
     @staticmethod
     def update_application_status(
@@ -182,6 +266,7 @@ class SchemeApplicationService:
                 .execute()
             
             if response.data and len(response.data) > 0:
+                invalidate_dashboard_stats(status_change=True)
                 print(f"✅ Application {application_id} updated to {status}")
                 return True
             
@@ -200,34 +285,13 @@ class SchemeApplicationService:
             Statistics dictionary
         """
         try:
-            # Total applications
-            total = supabase.table('scheme_applications')\
-                .select('id', count='exact')\
-                .execute()
-            
-            # Submitted applications
-            submitted = supabase.table('scheme_applications')\
-                .select('id', count='exact')\
-                .eq('status', 'submitted')\
-                .execute()
-            
-            # Approved applications
-            approved = supabase.table('scheme_applications')\
-                .select('id', count='exact')\
-                .eq('status', 'approved')\
-                .execute()
-            
-            # Under review applications
-            under_review = supabase.table('scheme_applications')\
-                .select('id', count='exact')\
-                .eq('status', 'under_review')\
-                .execute()
-            
+            # One grouped query, cached briefly and invalidated on writes
+            counts = get_application_counts()
             return {
-                "total": total.count or 0,
-                "submitted": submitted.count or 0,
-                "under_review": under_review.count or 0,
-                "approved": approved.count or 0
+                "total": counts["total"],
+                "submitted": counts["submitted"],
+                "under_review": counts["under_review"],
+                "approved": counts["approved"]
             }
             
         except Exception as e:
@@ -1,12 +1,12 @@
 from typing import Annotated, TypedDict, List, Dict, Any, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, RemoveMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from dotenv import load_dotenv
+import asyncio
 import os
 import json
 from feature4.tools import (
@@ -16,19 +16,31 @@ from feature4.tools import (
     submit_scheme_application,
     ALL_TOOLS
 )
+from feature4.intent_matcher import match_message
+from feature4.memory import get_checkpointer
+from feature4.tool_runtime import run_tool_calls
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Conversation history kept verbatim per thread; older turns are folded into a summary
+MAX_HISTORY_TURNS = int(os.getenv("AGENT_MAX_HISTORY_TURNS", "6"))
+SUMMARY_MAX_CHARS = int(os.getenv("AGENT_SUMMARY_MAX_CHARS", "1500"))
+
 # --- State Definition ---
+def merge_profile(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile fields from a new turn (or request) layer onto the stored profile"""
+    return {**(current or {}), **(update or {})}
+
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
-    user_profile: Dict[str, Any]  # {state: str, land_size: float, crop: str, category: str}
+    user_profile: Annotated[Dict[str, Any], merge_profile]  # {state: str, land_size: float, crop: str, category: str}
     found_schemes: List[Dict]
     selected_scheme: Dict
     application_status: str
     application_details: Dict  # New: store application submission details
     intent: str  # "search", "apply", "auto_apply", "chat"
+    conversation_summary: str  # Digest of turns dropped from messages
 
 # --- LLM Setup with Tool Binding ---
 # Include all tools including the new auto-fill and submit tools
@@ -85,40 +97,53 @@ When an application is submitted:
 
 # --- Nodes ---
 
+def _summarize_turns(summary: str, messages: List[BaseMessage]) -> str:
+    """Append a one-line digest of each dropped user/assistant message, keeping the tail"""
+    lines = [summary] if summary else []
+    for msg in messages:
+        if not isinstance(msg.content, str) or not msg.content.strip():
+            continue  # tool calls and tool results are already reflected in the replies
+        if isinstance(msg, HumanMessage):
+            lines.append(f"Farmer: {msg.content.strip()[:160]}")
+        elif isinstance(msg, AIMessage) and not getattr(msg, 'tool_calls', None):
+            lines.append(f"Advisor: {msg.content.strip()[:160]}")
+    return "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+
+def _history_context(state: AgentState) -> str:
+    summary = state.get("conversation_summary")
+    return f"\n\nEarlier in this conversation:\n{summary}" if summary else ""
+
+def compact_history(state: AgentState) -> Dict:
+    """
+    Bound the prompt for long threads: keep the last MAX_HISTORY_TURNS user
+    turns verbatim and fold everything before them into conversation_summary.
+    """
+    messages = state["messages"]
+    turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(turn_starts) <= MAX_HISTORY_TURNS:
+        return {}
+
+    # Cut at a user turn so no tool call is separated from its result
+    dropped = messages[:turn_starts[-MAX_HISTORY_TURNS]]
+    return {
+        "messages": [RemoveMessage(id=m.id) for m in dropped],
+        "conversation_summary": _summarize_turns(state.get("conversation_summary", ""), dropped)
+    }
+
 def route_intent(state: AgentState) -> Dict:
     """
     Analyze the last user message to determine intent.
     Returns: search, apply, auto_apply, or chat
     """
+    # extract_profile already scanned this turn's message
+    if state.get("intent"):
+        return {"intent": state["intent"]}
+
     messages = state["messages"]
-    last_message = messages[-1].content.lower() if messages else ""
-    
-    # Check for AUTO-APPLY intent (explicit request for automated submission)
-    auto_apply_keywords = [
-        "apply for me", "apply on my behalf", "fill the form", "fill form", 
-        "auto fill", "autofill", "submit for me", "submit application",
-        "complete the application", "do it for me", "fill and submit",
-        "apply automatically", "register me", "enroll me for"
-    ]
-    if any(kw in last_message for kw in auto_apply_keywords):
-        return {"intent": "auto_apply"}
-    
-    # Check for regular application intent
-    apply_keywords = ["apply", "register", "submit", "application", "sign up", "enroll"]
-    if any(kw in last_message for kw in apply_keywords):
-        return {"intent": "apply"}
-    
-    # Check for search intent
-    search_keywords = ["scheme", "subsidy", "loan", "benefit", "grant", "policy", 
-                      "tractor", "pump", "solar", "equipment", "what", "which", 
-                      "available", "eligible", "find", "help me", "suggest", "recommend"]
-    if any(kw in last_message for kw in search_keywords):
-        return {"intent": "search"}
-    
-    # Default to chat
-    return {"intent": "chat"}
-
-def call_model(state: AgentState) -> Dict:
+    last_message = messages[-1].content if messages else ""
+    return {"intent": match_message(last_message)["intent"]}
+
+async def call_model(state: AgentState) -> Dict:
     """
     Call the LLM with tools to handle search queries.
     The LLM can decide to call tools based on the user's message.
@@ -128,11 +153,11 @@ def call_model(state: AgentState) -> Dict:
     
     # Create a system message with context (escape braces for consistency)
     profile_str = json.dumps(profile)
-    system_msg = SystemMessage(content=SYSTEM_PROMPT + f"\n\nFarmer Profile: {profile_str}")
+    system_msg = SystemMessage(content=SYSTEM_PROMPT + f"\n\nFarmer Profile: {profile_str}" + _history_context(state))
     
     try:
         # Call LLM with tools bound
-        response = llm_with_tools.invoke([system_msg] + list(messages))
+        response = await llm_with_tools.ainvoke([system_msg] + list(messages))
         return {"messages": [response]}
     except Exception as e:
         print(f"Feature 4 Agent Error: {e}")
@@ -142,19 +167,15 @@ def call_model(state: AgentState) -> Dict:
 def process_tool_calls(state: AgentState) -> Dict:
     """
     Process tool calls if the LLM decided to use tools.
-    Uses the ToolNode pattern from LangGraph.
+    All calls from the response run concurrently; deterministic tools are cached.
     """
     messages = state["messages"]
     last_message = messages[-1]
     
     # Check if there are tool calls to process
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        # Create ToolNode with our tools
-        tool_node = ToolNode(tools)
-        
         # Execute tools
-        tool_result = tool_node.invoke({"messages": messages})
-        tool_messages = tool_result.get("messages", [])
+        tool_messages = run_tool_calls(last_message.tool_calls)
         
         # Extract scheme data and application data from tool results for state
         found_schemes = []
@@ -188,7 +209,7 @@ def process_tool_calls(state: AgentState) -> Dict:
     
     return {}
 
-def generate_response(state: AgentState) -> Dict:
+async def generate_response(state: AgentState) -> Dict:
     """
     Generate final response after tool execution.
     """
@@ -222,6 +243,8 @@ def generate_response(state: AgentState) -> Dict:
         app_str = json.dumps(app_details, indent=2).replace("{", "{{").replace("}", "}}")
         context += f"\n\nApplication Submitted:\n{app_str}"
     
+    context += _history_context(state).replace("{", "{{").replace("}", "}}")
+    
     prompt = ChatPromptTemplate.from_messages([
         ("system", SYSTEM_PROMPT + "\n\n" + context),
         MessagesPlaceholder(variable_name="messages")
@@ -229,7 +252,7 @@ def generate_response(state: AgentState) -> Dict:
     
     try:
         chain = prompt | llm
-        response = chain.invoke({"messages": messages})
+        response = await chain.ainvoke({"messages": messages})
         return {"messages": [response]}
     except Exception as e:
         print(f"Feature 4 Agent Gen Error: {e}")
@@ -435,7 +458,7 @@ def create_application(state: AgentState) -> Dict:
         "messages": [AIMessage(content=response)]
     }
 
-def auto_apply_node(state: AgentState) -> Dict:
+async def auto_apply_node(state: AgentState) -> Dict:
     """
     Handle automated application filling and submission.
     Uses the auto_fill_application and submit_scheme_application tools.
@@ -488,7 +511,7 @@ def auto_apply_node(state: AgentState) -> Dict:
     
     try:
         # Step 1: Auto-fill the application
-        fill_result = auto_fill_application.invoke({
+        fill_result = await asyncio.to_thread(auto_fill_application.invoke, {
             "scheme_name": scheme_name,
             "user_profile": profile
         })
@@ -542,7 +565,7 @@ def auto_apply_node(state: AgentState) -> Dict:
             }
         
         # Step 2: Submit the application
-        submit_result = submit_scheme_application.invoke({
+        submit_result = await asyncio.to_thread(submit_scheme_application.invoke, {
             "scheme_name": scheme_name,
             "filled_fields": fill_result.get("filled_fields", {}),
             "user_profile": profile
@@ -620,7 +643,7 @@ def auto_apply_node(state: AgentState) -> Dict:
              "messages": [AIMessage(content="I encountered a technical error while processing your request. Please try again later.")]
         }
 
-def general_chat(state: AgentState) -> Dict:
+async def general_chat(state: AgentState) -> Dict:
     """
     Handle general conversational queries.
     """
@@ -629,11 +652,12 @@ def general_chat(state: AgentState) -> Dict:
     
     # Escape curly braces in JSON to prevent template variable interpretation
     profile_str = json.dumps(profile).replace("{", "{{").replace("}", "}}")
+    history_str = _history_context(state).replace("{", "{{").replace("}", "}}")
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", f"""You are a friendly agricultural advisor chatbot. Respond helpfully to the farmer's query.
         
-Farmer Profile: {profile_str}
+Farmer Profile: {profile_str}{history_str}
 
 If they ask about schemes or subsidies, encourage them to ask specific questions like:
 - "What subsidies are available for tractors?"
@@ -648,7 +672,7 @@ Keep responses concise and helpful."""),
     
     try:
         chain = prompt | llm
-        response = chain.invoke({"messages": messages})
+        response = await chain.ainvoke({"messages": messages})
         return {"messages": [response]}
     except Exception as e:
         print(f"Chat Error: {e}")
@@ -661,52 +685,17 @@ def extract_profile(state: AgentState) -> Dict:
     Run this on every turn to update profile.
     """
     messages = state["messages"]
-    current_profile = state.get("user_profile", {}) or {}
-    
-    # Quick extraction from last message
-    last_msg = messages[-1].content.lower() if messages else ""
-    
-    # Extract state mentions
-    states = ["maharashtra", "punjab", "haryana", "uttar pradesh", "madhya pradesh", 
-              "rajasthan", "gujarat", "karnataka", "tamil nadu", "andhra pradesh",
-              "telangana", "bihar", "west bengal", "odisha", "kerala"]
-    for state in states:
-        if state in last_msg:
-            current_profile["state"] = state.title()
-            break
-    
-    # Extract category mentions
-    categories = ["sc", "st", "obc", "general"]
-    for cat in categories:
-        if cat in last_msg.split():
-            current_profile["category"] = cat.upper()
-            break
+    current_profile = dict(state.get("user_profile", {}) or {})
     
-    # Try to extract name if mentioned (simple heuristic)
-    name_patterns = ["my name is", "i am", "i'm", "this is"]
-    for pattern in name_patterns:
-        if pattern in last_msg:
-            # Extract word after pattern
-            idx = last_msg.find(pattern) + len(pattern)
-            remaining = last_msg[idx:].strip()
-            words = remaining.split()
-            if words and len(words[0]) > 2:
-                current_profile["name"] = words[0].title()
-                break
-    
-    # Extract land size if mentioned
-    import re
-    land_patterns = [
-        r'(\d+(?:\.\d+)?)\s*(?:acre|acres|hectare|hectares)',
-        r'land\s*(?:size|area)?\s*(?:is|of)?\s*(\d+(?:\.\d+)?)',
-    ]
-    for pattern in land_patterns:
-        match = re.search(pattern, last_msg)
-        if match:
-            current_profile["land_size"] = float(match.group(1))
-            break
+    # Single pass over the last message for intent and profile entities
+    last_msg = messages[-1].content if messages else ""
+    matched = match_message(last_msg)
+
+    for field in ("state", "category", "name", "land_size"):
+        if matched[field] is not None:
+            current_profile[field] = matched[field]
     
-    return {"user_profile": current_profile}
+    return {"user_profile": current_profile, "intent": matched["intent"]}
 
 # --- Routing Functions ---
 
@@ -731,9 +720,13 @@ def route_by_intent(state: AgentState) -> Literal["search", "apply", "auto_apply
     return "chat"
 
 # --- Graph Construction ---
+# LLM and auto-apply nodes are async; the remaining sync nodes (tools, manual
+# applications) are run off the event loop by LangGraph when the graph is
+# driven with ainvoke/astream.
 workflow = StateGraph(AgentState)
 
 # Add nodes
+workflow.add_node("compact_history", compact_history)
 workflow.add_node("extract_profile", extract_profile)
 workflow.add_node("route_intent", route_intent)
 workflow.add_node("call_model", call_model)
@@ -744,9 +737,10 @@ workflow.add_node("auto_apply", auto_apply_node)  # New node for automated appli
 workflow.add_node("chat", general_chat)
 
 # Set entry point
-workflow.set_entry_point("extract_profile")
+workflow.set_entry_point("compact_history")
 
 # Add edges
+workflow.add_edge("compact_history", "extract_profile")
 workflow.add_edge("extract_profile", "route_intent")
 
 # Route based on intent
@@ -781,4 +775,15 @@ workflow.add_edge("auto_apply", END)  # New edge
 workflow.add_edge("chat", END)
 
 # Compile the graph
+# Stateless: one-shot requests such as /search-schemes
 agent_app = workflow.compile()
+
+# Checkpointed per thread_id: multi-turn /chat conversations
+_conversational_agent_app = None
+
+async def get_conversational_agent():
+    """Graph compiled with the conversation checkpointer (created on the event loop)"""
+    global _conversational_agent_app
+    if _conversational_agent_app is None:
+        _conversational_agent_app = workflow.compile(checkpointer=await get_checkpointer())
+    return _conversational_agent_app
@@ -0,0 +1,208 @@
+"""
+Bulk auto-apply for the Farmer Support Agent (Feature 4).
+
+Lets a field agent file scheme applications for a whole cooperative in
+one request. Each (farmer, scheme) pair is autofilled deterministically
+from the scheme catalogue (no LLM) and validated. The valid rows get
+reference numbers allocated in bulk and are written to
+scheme_applications in chunked bulk inserts. The job runs in the
+background; its progress is read back by job id.
+"""
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from feature2.scheme_application_service import SchemeApplicationService
+from feature4.tools import calculate_benefits, get_scheme_index
+
+MAX_BULK_APPLICATIONS = int(os.getenv("BULK_APPLY_MAX_ITEMS", "5000"))
+INSERT_CHUNK_SIZE = int(os.getenv("BULK_APPLY_CHUNK_SIZE", "500"))
+MAX_RETAINED_JOBS = int(os.getenv("BULK_APPLY_RETAINED_JOBS", "100"))
+
+
+def autofill_application(profile: Dict[str, Any], scheme: Dict[str, Any]) -> Dict[str, Any]:
+    """Application details for one farmer and scheme, the fields auto_fill_application fills"""
+    return {
+        "scheme_id": scheme["id"],
+        "scheme_name": scheme["name"],
+        "applicant_name": profile.get("name", ""),
+        "state": profile.get("state", ""),
+        "category": profile.get("category", ""),
+        "land_size": profile.get("land_size"),
+        "crop": profile.get("crop", ""),
+        "subsidy_amount": scheme.get("benefit_amount"),
+        "portal_url": scheme["portal_url"],
+        "estimated_benefits": calculate_benefits.func(
+            scheme_id=scheme["id"],
+            land_size=profile.get("land_size"),
+            crop_value=profile.get("crop_value")
+        ),
+        "submitted_via": "bulk_apply"
+    }
+
+
+def validate_application(profile: Dict[str, Any], scheme: Optional[Dict[str, Any]]) -> List[str]:
+    """Reasons this farmer cannot be filed for this scheme (empty if valid)"""
+    if scheme is None:
+        return ["Scheme not found"]
+
+    errors = []
+    if not profile.get("user_id"):
+        errors.append("Missing user_id")
+    if not (profile.get("name") or "").strip():
+        errors.append("Missing name")
+    state = (profile.get("state") or "").strip().lower()
+    if not state:
+        errors.append("Missing state")
+
+    land_size = profile.get("land_size")
+    if land_size is not None and land_size <= 0:
+        errors.append("land_size must be positive")
+
+    # find_schemes' state/category matching, with "All India"/"All Farmers" compared
+    # exactly ("small farmers" contains "all farmers")
+    scheme_state = scheme["state"].lower()
+    if state and state not in scheme_state and scheme_state != "all india":
+        errors.append(f"Scheme is only available in {scheme['state']}")
+    category = (profile.get("category") or "").strip().lower()
+    scheme_category = scheme["category"].lower()
+    if category and category not in scheme_category and scheme_category != "all farmers":
+        errors.append(f"Scheme is only for {scheme['category']}")
+
+    return errors
+
+
+class BulkApplyJob:
+    """Progress of one bulk auto-apply request"""
+
+    def __init__(self, total: int):
+        self.id = str(uuid.uuid4())
+        self.status = "queued"  # queued -> validating -> inserting -> completed | failed
+        self.total = total
+        self.valid = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.applications: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            processed = self.inserted + self.failed + self.invalid
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "valid": self.valid,
+                "invalid": self.invalid,
+                "inserted": self.inserted,
+                "failed": self.failed,
+                "progress": round(processed / self.total, 4) if self.total else 1.0,
+                "errors": list(self.errors),
+                "applications": list(self.applications),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at
+            }
+
+
+class BulkApplyJobStore:
+    """In-process registry of recent jobs (oldest dropped beyond max_jobs)"""
+
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, BulkApplyJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, total: int) -> BulkApplyJob:
+        job = BulkApplyJob(total)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkApplyJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+bulk_apply_jobs = BulkApplyJobStore(MAX_RETAINED_JOBS)
+
+
+def run_bulk_apply(job: BulkApplyJob, items: List[Tuple[Dict[str, Any], str]]):
+    """Autofill, validate and insert every (farmer profile, scheme id) pair of the job"""
+    try:
+        job.update(status="validating")
+        index = get_scheme_index()
+        rows = []
+        errors = []
+        seen = set()
+
+        for position, (profile, scheme_id) in enumerate(items):
+            scheme = index.get(scheme_id)
+            problems = validate_application(profile, scheme)
+            if (profile.get("user_id"), scheme_id) in seen:
+                problems.append("Duplicate application in this job")
+            seen.add((profile.get("user_id"), scheme_id))
+
+            if problems:
+                errors.append({"index": position, "user_id": profile.get("user_id"),
+                               "scheme_id": scheme_id, "errors": problems})
+                continue
+
+            details = autofill_application(profile, scheme)
+            details["bulk_job_id"] = job.id
+            rows.append({
+                "user_id": profile["user_id"],
+                "farmer_name": profile.get("name"),
+                "farmer_phone": profile.get("phone"),
+                "scheme_name": scheme["name"],
+                "status": "submitted",
+                "application_details": details
+            })
+
+        job.update(status="inserting", valid=len(rows), invalid=len(errors), errors=errors)
+
+        for row, reference_no in zip(rows, SchemeApplicationService.generate_reference_numbers(len(rows))):
+            row["reference_no"] = reference_no
+            row["application_details"]["reference_no"] = reference_no
+
+        result = SchemeApplicationService.create_applications_bulk(
+            rows,
+            chunk_size=INSERT_CHUNK_SIZE,
+            on_progress=lambda inserted, failed: job.update(inserted=inserted, failed=failed)
+        )
+
+        insert_errors = [
+            {"user_id": f["row"]["user_id"], "scheme_id": f["row"]["application_details"]["scheme_id"],
+             "errors": [f["error"]]}
+            for f in result["failed"]
+        ]
+        job.update(
+            status="completed",
+            inserted=len(result["inserted"]),
+            failed=len(result["failed"]),
+            errors=errors + insert_errors,
+            applications=[
+                {"id": r.get("id"), "reference_no": r.get("reference_no"), "user_id": r.get("user_id"),
+                 "scheme_name": r.get("scheme_name")}
+                for r in result["inserted"]
+            ],
+            finished_at=time.time()
+        )
+        print(f"✅ Bulk apply job {job.id}: {len(result['inserted'])}/{job.total} applications filed")
+
+    except Exception as e:
+        print(f"❌ Bulk apply job {job.id} failed: {e}")
+        job.update(status="failed", errors=job.errors + [{"errors": [str(e)]}], finished_at=time.time())
@@ -0,0 +1,183 @@
+"""
+Precompiled intent and entity matcher for the Farmer Support Agent.
+
+All keyword tables (English, Hindi, Marathi) are folded into a single
+trie-shaped regex at import, so one scan of the message yields the
+intent, state, category, land size and name. Adding keywords does not
+add passes over the text.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+# --- Keyword tables ---
+# Intents, highest priority first: any auto_apply keyword beats apply, etc.
+INTENT_PRIORITY = ["auto_apply", "apply", "search"]
+
+INTENT_KEYWORDS = {
+    "auto_apply": [
+        "apply for me", "apply on my behalf", "fill the form", "fill form",
+        "auto fill", "autofill", "submit for me", "submit application",
+        "complete the application", "do it for me", "fill and submit",
+        "apply automatically", "register me", "enroll me for",
+        # Hindi
+        "मेरे लिए आवेदन", "मेरी ओर से आवेदन", "फॉर्म भर", "फॉर्म भरो",
+        "आवेदन जमा कर", "आवेदन भर",
+        # Marathi
+        "माझ्यासाठी अर्ज", "माझ्या वतीने अर्ज", "फॉर्म भरा", "अर्ज भरा",
+        "अर्ज सादर कर",
+    ],
+    "apply": [
+        "apply", "register", "submit", "application", "sign up", "enroll",
+        # Hindi
+        "आवेदन", "पंजीकरण", "रजिस्टर",
+        # Marathi
+        "अर्ज", "नोंदणी",
+    ],
+    "search": [
+        "scheme", "subsidy", "loan", "benefit", "grant", "policy",
+        "tractor", "pump", "solar", "equipment", "what", "which",
+        "available", "eligible", "find", "help me", "suggest", "recommend",
+        # Hindi
+        "योजना", "सब्सिडी", "अनुदान", "ऋण", "लोन", "लाभ", "ट्रैक्टर", "पंप",
+        "सोलर", "सौर", "कौन सी", "क्या", "मदद", "सुझाव",
+        # Marathi
+        "योजना", "कर्ज", "ट्रॅक्टर", "कोणती", "काय", "मदत", "फायदा",
+    ],
+}
+
+STATE_KEYWORDS = {
+    "Maharashtra": ["maharashtra", "महाराष्ट्र"],
+    "Punjab": ["punjab", "पंजाब"],
+    "Haryana": ["haryana", "हरियाणा"],
+    "Uttar Pradesh": ["uttar pradesh", "उत्तर प्रदेश"],
+    "Madhya Pradesh": ["madhya pradesh", "मध्य प्रदेश"],
+    "Rajasthan": ["rajasthan", "राजस्थान"],
+    "Gujarat": ["gujarat", "गुजरात"],
+    "Karnataka": ["karnataka", "कर्नाटक"],
+    "Tamil Nadu": ["tamil nadu", "तमिलनाडु", "तमिल नाडु"],
+    "Andhra Pradesh": ["andhra pradesh", "आंध्र प्रदेश"],
+    "Telangana": ["telangana", "तेलंगाना", "तेलंगणा"],
+    "Bihar": ["bihar", "बिहार"],
+    "West Bengal": ["west bengal", "पश्चिम बंगाल"],
+    "Odisha": ["odisha", "ओडिशा"],
+    "Kerala": ["kerala", "केरल", "केरळ"],
+}
+
+CATEGORY_KEYWORDS = {
+    "SC": ["sc", "अनुसूचित जाति", "अनुसूचित जाती"],
+    "ST": ["st", "अनुसूचित जनजाति", "अनुसूचित जमाती"],
+    "OBC": ["obc", "अन्य पिछड़ा", "इतर मागास"],
+    "GENERAL": ["general", "सामान्य", "खुला"],
+}
+
+NAME_PREFIXES = ["my name is", "i am", "i'm", "this is", "मेरा नाम", "माझे नाव"]
+
+LAND_UNITS = ["acre", "acres", "hectare", "hectares",
+              "एकड़", "एकड", "हेक्टेयर", "एकर", "हेक्टर"]
+LAND_WORDS = ["land", "जमीन", "ज़मीन", "शेती"]
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Build a regex from a trie of words so alternation cost is bounded by word length"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ending here is optional continuation; greedy keeps the longest match
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _build_lookup():
+    lookup: Dict[str, tuple] = {}
+    for kind in reversed(INTENT_PRIORITY):
+        for kw in INTENT_KEYWORDS[kind]:
+            lookup[kw] = ("intent", kind)
+    for value, kws in STATE_KEYWORDS.items():
+        for kw in kws:
+            lookup[kw] = ("state", value)
+    for value, kws in CATEGORY_KEYWORDS.items():
+        for kw in kws:
+            lookup[kw] = ("category", value)
+    return lookup
+
+
+_KEYWORD_LOOKUP = _build_lookup()
+
+# Category keywords must be whole words: "st" is not "state", "खुला" is not "खुलासा"
+_WHOLE_WORD = {kw for kws in CATEGORY_KEYWORDS.values() for kw in kws}
+
+# Word characters for boundaries. str.isalnum() and \b miss Devanagari vowel
+# signs and virama (combining marks), so the whole block counts as word
+_WORD_CHAR = re.compile(r"[\w\u0900-\u097F]")
+
+_NUMBER = r"\d+(?:\.\d+)?"
+
+# Lookahead, so overlapping keywords are all seen in the same single scan
+_MATCHER = re.compile(
+    "(?=(?:"
+    f"(?P<land>{_NUMBER})\\s*(?:{_trie_pattern(LAND_UNITS)})"
+    f"|(?:{_trie_pattern(LAND_WORDS)})\\s*(?:size|area)?\\s*(?:is|of)?\\s*(?P<land_alt>{_NUMBER})"
+    f"|(?:{_trie_pattern(NAME_PREFIXES)})\\s*(?P<name>[^\\s,.!?।]+)"
+    f"|(?P<kw>{_trie_pattern(list(_KEYWORD_LOOKUP))})"
+    "))"
+)
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not _WORD_CHAR.match(before) and not _WORD_CHAR.match(after)
+
+
+def match_message(text: str) -> Dict[str, Optional[Any]]:
+    """
+    Scan a message once and return intent ("auto_apply", "apply", "search"
+    or "chat") plus any state, category, land_size and name found.
+    """
+    text = (text or "").lower()
+    intents = set()
+    result: Dict[str, Optional[Any]] = {
+        "intent": "chat", "state": None, "category": None, "land_size": None, "name": None
+    }
+
+    for m in _MATCHER.finditer(text):
+        land = m.group("land") or m.group("land_alt")
+        if land is not None:
+            if result["land_size"] is None:
+                result["land_size"] = float(land)
+            continue
+
+        name = m.group("name")
+        if name is not None:
+            if result["name"] is None and len(name) > 2:
+                result["name"] = name.title()
+            continue
+
+        kw = m.group("kw")
+        if kw is None:
+            continue
+        if kw in _WHOLE_WORD and not _is_whole_word(text, m.start("kw"), m.end("kw")):
+            continue
+
+        kind, value = _KEYWORD_LOOKUP[kw]
+        if kind == "intent":
+            intents.add(value)
+        elif result[kind] is None:
+            result[kind] = value
+
+    for intent in INTENT_PRIORITY:
+        if intent in intents:
+            result["intent"] = intent
+            break
+
+    return result
@@ -0,0 +1,77 @@
+"""
+Conversation memory for the Farmer Support Agent (Feature 4).
+
+Builds the LangGraph checkpointer that persists each chat thread
+(messages, farmer profile, found schemes) between requests:
+
+  AGENT_CHECKPOINT_BACKEND=sqlite    (default) file at AGENT_CHECKPOINT_DB
+  AGENT_CHECKPOINT_BACKEND=postgres  uses AGENT_CHECKPOINT_POSTGRES_URL
+  AGENT_CHECKPOINT_BACKEND=memory    in-process only, lost on restart
+
+The graph runs with ainvoke, so the async savers are used. They bind to
+the running event loop, so the checkpointer is created on first use by
+get_checkpointer(). Falls back to in-memory storage if the backend's
+package is missing.
+"""
+import os
+import asyncio
+
+from langgraph.checkpoint.memory import MemorySaver
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_checkpoints.db")
+
+_checkpointer = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def _build_checkpointer():
+    backend = os.getenv("AGENT_CHECKPOINT_BACKEND", "sqlite").lower()
+
+    if backend == "postgres":
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+            from psycopg_pool import AsyncConnectionPool
+
+            pool = AsyncConnectionPool(
+                conninfo=os.getenv("AGENT_CHECKPOINT_POSTGRES_URL"),
+                max_size=int(os.getenv("AGENT_CHECKPOINT_POOL_SIZE", "5")),
+                kwargs={"autocommit": True, "prepare_threshold": 0},
+                open=False
+            )
+            await pool.open()
+            saver = AsyncPostgresSaver(pool)
+            await saver.setup()
+            print("✅ Agent conversations checkpointed to Postgres")
+            return saver
+        except ImportError:
+            print("⚠️ langgraph-checkpoint-postgres not installed. Using in-memory conversation store.")
+        except Exception as e:
+            print(f"❌ Postgres checkpointer failed ({e}). Using in-memory conversation store.")
+        return MemorySaver()
+
+    if backend == "sqlite":
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+            path = os.getenv("AGENT_CHECKPOINT_DB", DEFAULT_SQLITE_PATH)
+            saver = AsyncSqliteSaver(aiosqlite.connect(path))
+            await saver.setup()
+            print(f"✅ Agent conversations checkpointed to {path}")
+            return saver
+        except ImportError:
+            print("⚠️ langgraph-checkpoint-sqlite not installed. Using in-memory conversation store.")
+        except Exception as e:
+            print(f"❌ SQLite checkpointer failed ({e}). Using in-memory conversation store.")
+
+    return MemorySaver()
+
+
+async def get_checkpointer():
+    """Shared checkpointer, created on the server's event loop on first use"""
+    global _checkpointer
+    if _checkpointer is None:
+        async with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = await _build_checkpointer()
+    return _checkpointer
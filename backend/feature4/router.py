@@ -1,75 +1,203 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
-from feature4.agent import agent_app
-from langchain_core.messages import HumanMessage
+import os
+import json
+import uuid
+import asyncio
+from feature4.agent import agent_app, get_conversational_agent
+from feature4.memory import get_checkpointer
+from feature4.tool_runtime import get_tool_stats
+from feature4.tools import find_schemes
+from feature4.bulk_apply import MAX_BULK_APPLICATIONS, bulk_apply_jobs, run_bulk_apply
+from langchain_core.messages import HumanMessage, AIMessage
 
 feature4_router = APIRouter()
 
+# Wall-clock budget for one agent turn, including every LLM and tool call
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_REQUEST_DEADLINE_SECONDS", "45"))
+DEADLINE_DETAIL = "The assistant took too long to respond. Please try again."
+
+# Nodes whose LLM output is the reply shown to the farmer
+REPLY_NODES = {"call_model", "generate", "chat", "apply", "auto_apply"}
+
 class ChatRequest(BaseModel):
     message: str
     user_profile: Optional[Dict[str, Any]] = None
+    thread_id: Optional[str] = None  # Continue a conversation; omitted starts a new one
 
 class ChatResponse(BaseModel):
     response: str
+    thread_id: Optional[str] = None
     found_schemes: Optional[List[Dict]] = None
     application_status: Optional[str] = None
     application_details: Optional[Dict] = None
 
+def _start_turn(request: ChatRequest):
+    """Thread config and this turn's input; the checkpointer restores the rest of the thread"""
+    thread_id = request.thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    turn_input = {
+        "messages": [HumanMessage(content=request.message)],
+        "user_profile": request.user_profile or {},  # merged into the stored profile
+        "application_status": "",
+        "application_details": {},
+        "intent": ""
+    }
+    return thread_id, config, turn_input
+
+def _chat_response(result: Dict[str, Any], thread_id: str) -> ChatResponse:
+    final_message = result["messages"][-1].content if result.get("messages") else "No response generated."
+    return ChatResponse(
+        response=final_message,
+        thread_id=thread_id,
+        found_schemes=result.get("found_schemes", []),
+        application_status=result.get("application_status", ""),
+        application_details=result.get("application_details", {})
+    )
+
 @feature4_router.post("/chat", response_model=ChatResponse)
 async def chat_with_agent(request: ChatRequest):
     """
     Chat with the farmer support agent.
     The agent can search for schemes, help with applications, and answer questions.
+    Pass the returned thread_id back to continue the conversation; earlier turns,
+    the farmer profile and found schemes are kept server-side.
     """
     try:
-        # Initialize state
-        initial_state = {
-            "messages": [HumanMessage(content=request.message)],
-            "user_profile": request.user_profile or {},
-            "found_schemes": [],
-            "selected_scheme": {},
-            "application_status": "",
-            "application_details": {},
-            "intent": ""
-        }
+        thread_id, config, turn_input = _start_turn(request)
+        agent = await get_conversational_agent()
         
         # Run the agent
-        result = agent_app.invoke(initial_state)
-        
-        # Extract the final response
-        final_message = result["messages"][-1].content if result["messages"] else "No response generated."
-        
-        return ChatResponse(
-            response=final_message,
-            found_schemes=result.get("found_schemes", []),
-            application_status=result.get("application_status", ""),
-            application_details=result.get("application_details", {})
+        result = await asyncio.wait_for(
+            agent.ainvoke(turn_input, config=config),
+            timeout=AGENT_DEADLINE_SECONDS
         )
         
+        return _chat_response(result, thread_id)
+        
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=DEADLINE_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _text(content) -> str:
+    # Gemini may return content as a list of parts
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+def _stream_events(mode: str, chunk) -> List[str]:
+    """Translate one LangGraph stream item into SSE events"""
+    events = []
+    if mode == "messages":
+        message, metadata = chunk
+        text = _text(message.content)
+        if isinstance(message, AIMessage) and text and metadata.get("langgraph_node") in REPLY_NODES:
+            events.append(_sse("token", {"node": metadata["langgraph_node"], "content": text}))
+        return events
+
+    for node, update in chunk.items():
+        update = update or {}
+        if node == "extract_profile":
+            events.append(_sse("intent", {"intent": update.get("intent"), "user_profile": update.get("user_profile", {})}))
+        elif node == "call_model":
+            for message in update.get("messages", []):
+                for call in getattr(message, "tool_calls", None) or []:
+                    events.append(_sse("tool_call", {"id": call.get("id"), "name": call["name"], "args": call.get("args", {})}))
+        elif node == "process_tools":
+            for message in update.get("messages", []):
+                try:
+                    content = json.loads(message.content)
+                except (TypeError, ValueError):
+                    content = message.content
+                events.append(_sse("tool_result", {
+                    "tool_call_id": message.tool_call_id,
+                    "name": message.name,
+                    "status": message.status,
+                    "content": content
+                }))
+    return events
+
+@feature4_router.post("/chat/stream")
+async def chat_with_agent_stream(request: ChatRequest):
+    """
+    Same as /chat, streamed as Server-Sent Events:
+    thread, intent, tool_call, tool_result and token events while the agent
+    works, then done (the ChatResponse) or error.
+    """
+    thread_id, config, turn_input = _start_turn(request)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + AGENT_DEADLINE_SECONDS
+        yield _sse("thread", {"thread_id": thread_id})
+        agent = await get_conversational_agent()
+        stream = agent.astream(turn_input, config=config, stream_mode=["updates", "messages"])
+        try:
+            while True:
+                try:
+                    mode, chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                for event in _stream_events(mode, chunk):
+                    yield event
+
+            snapshot = await agent.aget_state(config)
+            yield _sse("done", _chat_response(snapshot.values, thread_id).dict())
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": DEADLINE_DETAIL})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error processing request: {str(e)}"})
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @feature4_router.post("/search-schemes", response_model=Dict)
 async def search_schemes(
     state: Optional[str] = None,
     category: Optional[str] = None,
-    crop: Optional[str] = None
+    crop: Optional[str] = None,
+    query: Optional[str] = None,
+    summarize: bool = False
 ):
     """
     Search for government schemes based on criteria.
+    Filters are answered straight from the scheme index; the agent (LLM) is
+    only run when summarize=true asks for a natural-language summary.
     """
     try:
-        query = f"Find government schemes"
+        schemes = find_schemes(state=state, category=category, crop=crop, query=query)
+
+        if not summarize:
+            return {
+                "schemes": schemes,
+                "count": len(schemes),
+                "message": f"Found {len(schemes)} matching schemes." if schemes else "No schemes found.",
+                "source": "index"
+            }
+
+        prompt = f"Find government schemes"
         if state:
-            query += f" in {state}"
+            prompt += f" in {state}"
         if category:
-            query += f" for {category} category"
+            prompt += f" for {category} category"
         if crop:
-            query += f" related to {crop}"
+            prompt += f" related to {crop}"
+        if query:
+            prompt += f" about {query}"
             
         initial_state = {
-            "messages": [HumanMessage(content=query)],
+            "messages": [HumanMessage(content=prompt)],
             "user_profile": {
                 "state": state or "",
                 "category": category or "",
@@ -82,16 +210,80 @@ async def search_schemes(
             "intent": "search"
         }
         
-        result = agent_app.invoke(initial_state)
+        result = await asyncio.wait_for(agent_app.ainvoke(initial_state), timeout=AGENT_DEADLINE_SECONDS)
         
         return {
-            "schemes": result.get("found_schemes", []),
-            "message": result["messages"][-1].content if result["messages"] else "No schemes found."
+            "schemes": schemes,
+            "count": len(schemes),
+            "message": result["messages"][-1].content if result["messages"] else "No schemes found.",
+            "source": "agent"
         }
         
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=DEADLINE_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching schemes: {str(e)}")
 
+@feature4_router.delete("/chat/{thread_id}")
+async def delete_conversation(thread_id: str):
+    """Forget a conversation thread."""
+    try:
+        checkpointer = await get_checkpointer()
+        await checkpointer.adelete_thread(thread_id)
+        return {"success": True, "thread_id": thread_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting conversation: {str(e)}")
+
+class BulkFarmer(BaseModel):
+    user_id: str
+    name: str
+    state: str
+    phone: Optional[str] = None
+    category: Optional[str] = None
+    land_size: Optional[float] = None
+    crop: Optional[str] = None
+    crop_value: Optional[float] = None
+    scheme_ids: Optional[List[str]] = None  # Overrides the request-level scheme_ids
+
+class BulkApplyRequest(BaseModel):
+    farmers: List[BulkFarmer]
+    scheme_ids: List[str] = Field(default_factory=list, example=["PM-KISAN-001", "KCC-003"])
+
+@feature4_router.post("/bulk-apply", status_code=202)
+async def bulk_apply(request: BulkApplyRequest, background_tasks: BackgroundTasks):
+    """
+    File applications for many farmers at once (e.g. a cooperative).
+    Every farmer is applied to each scheme id without the LLM; poll
+    /bulk-apply/{job_id} for progress and per-application errors.
+    """
+    items = []
+    for farmer in request.farmers:
+        profile = farmer.dict(exclude={"scheme_ids"})
+        for scheme_id in farmer.scheme_ids or request.scheme_ids:
+            items.append((profile, scheme_id))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No farmer/scheme pairs to apply for")
+    if len(items) > MAX_BULK_APPLICATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_APPLICATIONS} applications per job")
+
+    job = bulk_apply_jobs.create(len(items))
+    background_tasks.add_task(run_bulk_apply, job, items)
+    return {"job_id": job.id, "status": job.status, "total": job.total}
+
+@feature4_router.get("/bulk-apply/{job_id}")
+async def bulk_apply_status(job_id: str):
+    """Progress and results of a bulk apply job."""
+    job = bulk_apply_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@feature4_router.get("/tool-stats")
+async def tool_stats():
+    """Per-tool latency and tool result cache statistics."""
+    return get_tool_stats()
+
 @feature4_router.get("/health")
 async def health_check():
     """Check if the agent service is running."""
@@ -0,0 +1,182 @@
+"""
+Tool execution for the Farmer Support Agent (Feature 4).
+
+Tool calls from one model response run concurrently on a small thread
+pool, so a turn that searches, calculates and autofills takes as long as
+the slowest tool rather than the sum. Deterministic tools are served from
+a TTL cache keyed on their arguments and the scheme catalogue version.
+Every call is timed; get_tool_stats() reports per-tool latency.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.messages import ToolMessage
+
+from feature4.tools import ALL_TOOLS, get_scheme_index
+
+logger = logging.getLogger(__name__)
+
+# Pure functions of their arguments and the catalogue. auto_fill_application
+# mints a reference number and submit_scheme_application has side effects.
+CACHEABLE_TOOLS = {"search_local_schemes", "calculate_benefits"}
+
+TOOLS_BY_NAME = {t.name: t for t in ALL_TOOLS}
+
+
+class ToolResultCache:
+    """LRU cache of serialized tool results with a time-to-live"""
+
+    def __init__(self, max_size=256, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, content):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class ToolLatencyMetrics:
+    """Per-tool call counts and latency over a sliding window of recent calls"""
+
+    def __init__(self, window=512):
+        self.window = window
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed_ms, cached=False, error=False):
+        with self._lock:
+            entry = self._tools.setdefault(name, {
+                'calls': 0, 'errors': 0, 'cache_hits': 0, 'samples': deque(maxlen=self.window)
+            })
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            entry['cache_hits'] += int(cached)
+            entry['samples'].append(elapsed_ms)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {name: (dict(entry), list(entry['samples'])) for name, entry in self._tools.items()}
+        result = {}
+        for name, (entry, samples) in snapshot.items():
+            p50, p95 = np.percentile(samples, [50, 95]) if samples else (0.0, 0.0)
+            result[name] = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                'cache_hits': entry['cache_hits'],
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'max_ms': round(max(samples), 2) if samples else 0.0
+            }
+        return result
+
+
+tool_cache = ToolResultCache(
+    max_size=int(os.getenv("AGENT_TOOL_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("AGENT_TOOL_CACHE_TTL_SECONDS", "300"))
+)
+tool_metrics = ToolLatencyMetrics()
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_TOOL_WORKERS", "4")),
+    thread_name_prefix="agent-tool"
+)
+
+
+def _serialize(output) -> str:
+    # Same content ToolNode would put in the ToolMessage
+    if isinstance(output, str):
+        return output
+    try:
+        return json.dumps(output, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(output)
+
+
+def _cache_key(name, args):
+    return (name, json.dumps(args, sort_keys=True, default=str), get_scheme_index().version)
+
+
+def run_tool_call(tool_call: Dict[str, Any]) -> ToolMessage:
+    """Execute one tool call from a model response, via the cache when allowed"""
+    name = tool_call["name"]
+    args = tool_call.get("args") or {}
+    start = time.perf_counter()
+    cached = error = False
+
+    try:
+        tool = TOOLS_BY_NAME.get(name)
+        if tool is None:
+            raise ValueError(f"{name} is not a valid tool, try one of [{', '.join(TOOLS_BY_NAME)}]")
+
+        key = _cache_key(name, args) if name in CACHEABLE_TOOLS and tool_cache.max_size > 0 else None
+        content = tool_cache.get(key) if key is not None else None
+        cached = content is not None
+        if content is None:
+            content = _serialize(tool.invoke(args))
+            if key is not None:
+                tool_cache.put(key, content)
+        message = ToolMessage(content=content, name=name, tool_call_id=tool_call["id"])
+    except Exception as e:
+        error = True
+        message = ToolMessage(
+            content=f"Error: {e!r}\n Please fix your mistakes.",
+            name=name, tool_call_id=tool_call["id"], status="error"
+        )
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    tool_metrics.record(name, elapsed_ms, cached=cached, error=error)
+    logger.info(f"tool={name} ms={elapsed_ms:.1f} cached={cached} error={error}")
+    return message
+
+
+def run_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[ToolMessage]:
+    """Execute all tool calls of one model response concurrently, results in call order"""
+    if len(tool_calls) == 1:
+        return [run_tool_call(tool_calls[0])]
+    return list(_executor.map(run_tool_call, tool_calls))
+
+
+def get_tool_stats() -> Dict[str, Any]:
+    return {'cache': tool_cache.stats(), 'tools': tool_metrics.stats()}
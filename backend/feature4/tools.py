@@ -5,8 +5,8 @@ Provides scheme search, benefit calculation, and application tools
 from langchain_core.tools import tool
 from typing import List, Dict, Any, Optional
 import json
-import random
-import time
+from core.reference_ids import agri_reference_ids
+from core.scheme_index import SchemeIndex
 
 # Mock schemes database (in production, this would query Supabase)
 SCHEMES_DATABASE = [
@@ -52,11 +52,64 @@ SCHEMES_DATABASE = [
     }
 ]
 
+# Index over SCHEMES_DATABASE. Schemes without a "crops" list apply to every crop.
+scheme_index = SchemeIndex(
+    id_fn=lambda s: s["id"],
+    facets={
+        "state": lambda s: [s["state"]],
+        "category": lambda s: [s["category"]],
+        "crop": lambda s: s.get("crops") or ["*"],
+    },
+    text_fn=lambda s: " ".join([s["name"], s["category"], s["subsidy_type"],
+                                s["benefit_amount"], s["eligibility"]])
+)
+
+
+def get_scheme_index() -> SchemeIndex:
+    """Scheme index, rebuilt if SCHEMES_DATABASE was replaced or resized"""
+    scheme_index.ensure_current(lambda: SCHEMES_DATABASE, (id(SCHEMES_DATABASE), len(SCHEMES_DATABASE)))
+    return scheme_index
+
+
+def refresh_scheme_index():
+    """Force a rebuild, e.g. after editing schemes in place or loading a new catalogue"""
+    scheme_index.rebuild(SCHEMES_DATABASE, (id(SCHEMES_DATABASE), len(SCHEMES_DATABASE)))
+
+
+def find_schemes(
+    state: Optional[str] = None,
+    category: Optional[str] = None,
+    crop: Optional[str] = None,
+    query: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Filter the catalogue through the inverted indexes"""
+    index = get_scheme_index()
+    matches = index.all()
+
+    # State and category match as substrings, with "All India"/"All Farmers" always included
+    if state:
+        state_q = state.lower()
+        matches &= index.facet_matching("state", lambda v: state_q in v or "all india" in v)
+
+    if category and matches:
+        category_q = category.lower()
+        matches &= index.facet_matching("category", lambda v: category_q in v or "all farmers" in v)
+
+    if crop and matches:
+        matches &= index.facet("crop", crop) | index.facet("crop", "*")
+
+    if query and matches:
+        matches &= index.text(query)
+
+    return index.select(matches)
+
+
 @tool
 def search_local_schemes(
     state: Optional[str] = None,
     category: Optional[str] = None,
-    crop: Optional[str] = None
+    crop: Optional[str] = None,
+    query: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Search for government agricultural schemes based on location, farmer category, and crop type.
@@ -65,25 +118,12 @@ def search_local_schemes(
         state: The state/region (e.g., "Maharashtra", "Punjab", "All India")
         category: Farmer category (e.g., "SC/ST", "Small Farmer", "Women", "All Farmers")
         crop: Crop type (e.g., "Rice", "Wheat", "Cotton")
+        query: Optional free-text keywords that must all appear in the scheme (e.g., "insurance")
     
     Returns:
         List of matching schemes with details
     """
-    results = []
-    
-    for scheme in SCHEMES_DATABASE:
-        # Match state
-        if state and state.lower() not in scheme["state"].lower() and "all india" not in scheme["state"].lower():
-            continue
-        
-        # Match category
-        if category and category.lower() not in scheme["category"].lower() and "all farmers" not in scheme["category"].lower():
-            continue
-        
-        # For crop-specific schemes, we'd need more data
-        # For now, return schemes that match state/category
-        
-        results.append(scheme)
+    results = find_schemes(state=state, category=category, crop=crop, query=query)
     
     return results if results else [{"message": "No matching schemes found"}]
 
@@ -106,7 +146,7 @@ def calculate_benefits(
         Calculated benefit details
     """
     # Find scheme
-    scheme = next((s for s in SCHEMES_DATABASE if s["id"] == scheme_id), None)
+    scheme = get_scheme_index().get(scheme_id)
     
     if not scheme:
         return {"error": "Scheme not found"}
@@ -159,15 +199,13 @@ def auto_fill_application(
     Returns:
         Pre-filled application data
     """
-    scheme = next((s for s in SCHEMES_DATABASE if s["id"] == scheme_id), None)
+    scheme = get_scheme_index().get(scheme_id)
     
     if not scheme:
         return {"error": "Scheme not found"}
     
     # Generate a reference number
-    timestamp = str(int(time.time()))[-6:]
-    rand = str(random.randint(100, 999))
-    reference_no = f"AGR-{timestamp}-{rand}"
+    reference_no = agri_reference_ids.next()
     
     application = {
         "reference_no": reference_no,
@@ -210,7 +248,7 @@ def submit_scheme_application(
     # In production, this would POST to /api/schemes/apply
     # For now, simulate submission
     
-    reference_no = application_data.get("reference_no", f"AGR-{int(time.time())}")
+    reference_no = application_data.get("reference_no") or agri_reference_ids.next()
     
     return {
         "status": "submitted",
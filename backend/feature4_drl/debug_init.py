@@ -16,7 +16,7 @@ print("="*50)
 
 try:
     # Import the class
-    from pipeline import CropRecommender
+    from feature4_drl.pipeline import CropRecommender
     
     # Define paths exactly as they are in pipeline.py
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -38,10 +38,10 @@ try:
     print("\nAttempting to initialize CropRecommender...")
     recommender = CropRecommender(model_dir, dataset_path)
     
-    if recommender.initialized:
+    if recommender.ensure_loaded():
         print("\n✅ SUCCESS: Recommender initialized successfully!")
     else:
-        print("\n❌ FAILED: Recommender not initialized (unknown reason).")
+        print(f"\n❌ FAILED: Recommender not initialized ({recommender.load_error}).")
 
 except ImportError as e:
     print(f"\n❌ IMPORT ERROR: {e}")
@@ -0,0 +1,191 @@
+"""
+Dedicated executor for crop recommender inference.
+
+Requests are run in a process pool whose children each preload the
+XGBoost models, so inference neither blocks the event loop nor competes
+with the server for Starlette's default threadpool. A bounded number of
+requests may be queued or running; beyond that callers get
+InferencePoolSaturated and should answer 503 with Retry-After.
+
+Set CROP_RECOMMENDER_WORKERS=0 to run inference in-process on a small
+dedicated thread pool instead (lower memory, e.g. on the free tier).
+"""
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .pipeline import CropRecommender, RecommenderUnavailable, full_recommender
+
+logger = logging.getLogger(__name__)
+
+# Recommender used by tasks in this process (a child, or the server in thread mode)
+_worker_recommender = None
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when the pool already has max_pending requests in flight"""
+
+    def __init__(self, retry_after):
+        super().__init__("Crop recommendation service is busy")
+        self.retry_after = retry_after
+
+
+def _init_process_worker(model_dir, dataset_path, options):
+    global _worker_recommender
+    _worker_recommender = CropRecommender(model_dir, dataset_path, **options)
+    # Preload so the first request routed to this child is not a cold start
+    _worker_recommender.ensure_loaded()
+
+
+def _init_thread_worker(recommender):
+    global _worker_recommender
+    _worker_recommender = recommender
+
+
+def rank_crops_task(input_data):
+    """Full ranking for a canonical input (the caller checks and fills the cache, and slices top N)"""
+    return _worker_recommender.rank_uncached(input_data)
+
+
+def sweep_task(base_input, ranges):
+    return _worker_recommender.sweep(base_input, ranges)
+
+
+def model_state_task():
+    """Whether the models loaded in the worker that runs this"""
+    return {'models_loaded': _worker_recommender.initialized, 'load_error': _worker_recommender.load_error}
+
+
+class InferencePool:
+    """Bounded process (or thread) pool for recommender inference"""
+
+    def __init__(self, recommender, workers=1, max_pending=32, nthread=1, retry_after=2):
+        self.recommender = recommender
+        self.workers = workers
+        self.max_pending = max_pending
+        self.nthread = nthread
+        self.retry_after = retry_after
+        self.mode = "process" if workers > 0 else "thread"
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    # spawn, not fork: XGBoost's OpenMP threads don't survive fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_process_worker,
+                        initargs=(
+                            self.recommender.model_dir,
+                            self.recommender.dataset_path,
+                            {
+                                'cache_size': 0,  # results are cached in the server process
+                                'quantization': self.recommender.quantization,
+                                'deterministic': self.recommender.deterministic,
+                                'seed': self.recommender.seed,
+                                'nthread': self.nthread
+                            }
+                        )
+                    )
+                else:
+                    if self.nthread and self.recommender.nthread is None:
+                        self.recommender.nthread = self.nthread
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=2,
+                        thread_name_prefix="crop-inference",
+                        initializer=_init_thread_worker,
+                        initargs=(self.recommender,)
+                    )
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool; raises InferencePoolSaturated when full"""
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise InferencePoolSaturated(self.retry_after)
+            self.in_flight += 1
+
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+            result = await asyncio.wrap_future(future)
+            with self._lock:
+                self.completed += 1
+            return result
+        except BrokenProcessPool as e:
+            # A child died (e.g. OOM); start a fresh pool on the next request
+            logger.error(f"Crop inference pool broke: {e}")
+            self._discard(executor)
+            raise RecommenderUnavailable("Crop inference worker crashed") from e
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _discard(self, executor):
+        """Shut down a broken executor (once, even if several requests saw it break)"""
+        with self._lock:
+            if executor is None or self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the workers (app shutdown); a later request would start a fresh pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def model_state(self, timeout=2.0):
+        """
+        Model state as the workers see it. Process workers load their own
+        models, so a started pool is asked directly; an unstarted one
+        reports models_loaded None.
+        """
+        if self.mode == "thread":
+            return {'models_loaded': self.recommender.initialized, 'load_error': self.recommender.load_error}
+        with self._lock:
+            executor = self._executor
+        if executor is None:
+            return {'models_loaded': None, 'load_error': None}
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(executor.submit(model_state_task)), timeout)
+        except asyncio.TimeoutError:
+            return {'models_loaded': None, 'load_error': None, 'note': "workers busy; state unknown"}
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            return {'models_loaded': False, 'load_error': f"Crop inference worker crashed: {e}"}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'workers': self.workers if self.mode == "process" else 2,
+                'nthread': self.nthread,
+                'started': self._executor is not None,
+                'in_flight': self.in_flight,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+
+inference_pool = InferencePool(
+    full_recommender,
+    workers=int(os.getenv("CROP_RECOMMENDER_WORKERS", "1")),
+    max_pending=int(os.getenv("CROP_RECOMMENDER_MAX_PENDING", "32")),
+    nthread=int(os.getenv("CROP_RECOMMENDER_NTHREAD", "1")),
+    retry_after=int(os.getenv("CROP_RECOMMENDER_RETRY_AFTER", "2"))
+) if full_recommender else None
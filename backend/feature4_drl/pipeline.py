@@ -1,10 +1,16 @@
-import pandas as pd
 import numpy as np
 import pickle
 import os
 import json
+import time
+import zlib
+import threading
 import logging
 
+from .recommendation_cache import (
+    DEFAULT_QUANTIZATION, RecommendationCache, quantize_input, make_cache_key
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,107 +35,204 @@ MARKET_PRICES = {
     # Fallback for others
 }
 
+# Fast-loading artifacts (see scripts/export_recommender_artifacts.py)
+YIELD_MODEL_FILE = "yield_model.ubj"
+RISK_MODEL_FILE = "risk_model.ubj"
+SIDECAR_FILE = "recommender_sidecar.json"
+
+# Upper bound per sweep axis, so a 2D sweep stays at most 2500 grid points
+MAX_SWEEP_STEPS = 50
+
+CATEGORICAL_COLUMNS = ['district', 'state', 'soil_type', 'climate_season',
+                       'previous_crop', 'crop_name', 'crop_water_requirement']
+
+class RecommenderUnavailable(RuntimeError):
+    """Raised when the models could not be loaded"""
+
+
 class CropRecommender:
     """Crop recommendation system"""
     
-    def __init__(self, model_dir, dataset_path):
+    def __init__(self, model_dir, dataset_path, cache_size=256, quantization=None,
+                 deterministic=True, seed=42, nthread=None):
         self.model_dir = model_dir
         self.dataset_path = dataset_path
         self.yield_model = None
         self.risk_model = None
-        self.label_encoders = None
+        self.category_index = {}
+        self.feature_medians = {}
         self.metadata = None
-        self.df_original = None
         self.available_crops = []
         self.crop_info = {}
+        self.nthread = nthread
         self.initialized = False
+        self.load_error = None
+        self._load_lock = threading.Lock()
+
+        # Result memoization only makes sense when outputs are reproducible
+        self.deterministic = deterministic
+        self.seed = seed
+        self.quantization = {**DEFAULT_QUANTIZATION, **(quantization or {})}
+        self.cache = RecommendationCache(cache_size) if deterministic and cache_size > 0 else None
         
-        # Load models on initialization
-        self.load_models()
+        # Models are loaded on first use (see ensure_loaded)
+
+    def ensure_loaded(self):
+        """Load models on first use. Returns True if the system is ready."""
+        if self.initialized:
+            return True
+        with self._load_lock:
+            if not self.initialized:
+                try:
+                    self.load_models()
+                except Exception as e:
+                    self.load_error = str(e)
+        return self.initialized
+
+    def ensure_metadata(self):
+        """
+        Load only the sidecar (crop list, aggregates), without importing
+        XGBoost. Used by processes that hand inference to a worker pool.
+        """
+        if self.metadata is not None:
+            return True
+        sidecar_path = os.path.join(self.model_dir, SIDECAR_FILE)
+        if not os.path.exists(sidecar_path):
+            return self.ensure_loaded()
+        with self._load_lock:
+            if self.metadata is None:
+                try:
+                    with open(sidecar_path, "r") as f:
+                        self._apply_metadata(json.load(f))
+                except Exception as e:
+                    logger.error(f"❌ Error loading recommender metadata: {e}")
+                    self.load_error = str(e)
+        return self.metadata is not None
 
     def load_models(self):
-        """Load saved models and dataset"""
+        """Load saved models and per-crop aggregates"""
         try:
+            import xgboost as xgb
+
             logger.info(f"Loading models from {self.model_dir}...")
-            
-            with open(os.path.join(self.model_dir, "yield_model.pkl"), "rb") as f:
-                self.yield_model = pickle.load(f)
-            
-            with open(os.path.join(self.model_dir, "risk_model.pkl"), "rb") as f:
-                self.risk_model = pickle.load(f)
-            
-            with open(os.path.join(self.model_dir, "label_encoders.pkl"), "rb") as f:
-                self.label_encoders = pickle.load(f)
-            
-            with open(os.path.join(self.model_dir, "system_metadata.pkl"), "rb") as f:
-                self.metadata = pickle.load(f)
-            
-            # Load dataset
-            logger.info(f"Loading dataset from {self.dataset_path}...")
-            self.df_original = pd.read_csv(self.dataset_path)
-            
-            self.available_crops = self.label_encoders['crop_name'].classes_
-            self.all_features = self.metadata['all_features']
-            self.crop_info = self._extract_crop_info()
+            start = time.perf_counter()
+
+            sidecar_path = os.path.join(self.model_dir, SIDECAR_FILE)
+            yield_path = os.path.join(self.model_dir, YIELD_MODEL_FILE)
+            risk_path = os.path.join(self.model_dir, RISK_MODEL_FILE)
+
+            if all(os.path.exists(p) for p in (sidecar_path, yield_path, risk_path)):
+                self.yield_model = xgb.Booster()
+                self.yield_model.load_model(yield_path)
+                self.risk_model = xgb.Booster()
+                self.risk_model.load_model(risk_path)
+
+                with open(sidecar_path, "r") as f:
+                    metadata = json.load(f)
+            else:
+                logger.warning("Native model artifacts not found, falling back to pickles and dataset")
+                metadata = self._load_legacy_artifacts()
+
+            self._apply_metadata(metadata)
+
+            # Per-model thread budget, so XGBoost doesn't compete with the server
+            if self.nthread:
+                self.yield_model.set_param({'nthread': self.nthread})
+                self.risk_model.set_param({'nthread': self.nthread})
             
             self.initialized = True
-            logger.info("✅ Crop Recommender System initialized successfully!")
+            self.load_error = None
+            logger.info(f"✅ Crop Recommender System initialized in {time.perf_counter() - start:.2f}s")
             
         except Exception as e:
             logger.error(f"❌ Error loading models: {e}")
             raise e
 
-    def _extract_crop_info(self):
-        """Extract information about each crop from the dataset"""
+    def _apply_metadata(self, metadata):
+        self.all_features = metadata['all_features']
+        self.category_index = {
+            col: {value: idx for idx, value in enumerate(classes)}
+            for col, classes in metadata['categories'].items()
+        }
+        self.feature_medians = metadata.get('feature_medians', {})
+        self.available_crops = list(metadata['categories']['crop_name'])
+        self.crop_info = metadata['crop_info']
+        self.metadata = metadata
+
+    def _load_legacy_artifacts(self):
+        """
+        Load pickled models and derive the sidecar data from the dataset.
+        scripts/export_recommender_artifacts.py writes this result out as the sidecar.
+        """
+        import pandas as pd
+
+        with open(os.path.join(self.model_dir, "yield_model.pkl"), "rb") as f:
+            self.yield_model = pickle.load(f).get_booster()
+        
+        with open(os.path.join(self.model_dir, "risk_model.pkl"), "rb") as f:
+            self.risk_model = pickle.load(f).get_booster()
+        
+        with open(os.path.join(self.model_dir, "label_encoders.pkl"), "rb") as f:
+            label_encoders = pickle.load(f)
+        
+        with open(os.path.join(self.model_dir, "system_metadata.pkl"), "rb") as f:
+            metadata = pickle.load(f)
+        
+        logger.info(f"Loading dataset from {self.dataset_path}...")
+        df = pd.read_csv(self.dataset_path)
+
         crop_info = {}
-        for crop in self.available_crops:
-            crop_data = self.df_original[self.df_original['crop_name'] == crop]
+        for crop in label_encoders['crop_name'].classes_:
+            crop_data = df[df['crop_name'] == crop]
             if len(crop_data) > 0:
-                crop_info[crop] = {
-                    'avg_yield': crop_data['yield_tonnes_per_hectare'].mean(),
-                    'avg_risk': crop_data['risk_score'].mean(),
-                    'avg_duration': crop_data['crop_duration_days'].mean(),
-                    'water_req': crop_data['crop_water_requirement'].iloc[0]
+                crop_info[str(crop)] = {
+                    'avg_yield': float(crop_data['yield_tonnes_per_hectare'].mean()),
+                    'avg_risk': float(crop_data['risk_score'].mean()),
+                    'avg_duration': float(crop_data['crop_duration_days'].mean()),
+                    'water_req': str(crop_data['crop_water_requirement'].iloc[0])
                 }
-        return crop_info
+
+        # Plain JSON types throughout, so the result can be saved as the sidecar
+        return {
+            'all_features': list(metadata['all_features']),
+            'categories': {col: [str(c) for c in enc.classes_] for col, enc in label_encoders.items()},
+            'crop_info': crop_info,
+            # Medians are the fallback for numeric features missing from a request
+            'feature_medians': {
+                feature: float(df[feature].median())
+                for feature in metadata['all_features'] if feature in df.columns
+            },
+            'model_performance': metadata.get('model_performance', {}),
+            'dataset_info': metadata.get('dataset_info', {})
+        }
     
     def prepare_input(self, input_data):
         """Prepare input data for model prediction"""
         prepared_data = input_data.copy()
         
-        # Encode categorical variables
-        for col in ['district', 'state', 'soil_type', 'climate_season',
-                   'previous_crop', 'crop_name', 'crop_water_requirement']:
-            if col in prepared_data:
-                try:
-                    prepared_data[col + '_encoded'] = self.label_encoders[col].transform([prepared_data[col]])[0]
-                except ValueError:
-                    # Use most common value if not seen during training
-                    prepared_data[col + '_encoded'] = 0
-                except KeyError:
-                     # Handle case where column encoder shouldn't exist or wasn't saved?
-                     # Ideally all encoded cols are in label_encoders
-                     pass
+        # Encode categorical variables (unseen values map to 0)
+        for col in CATEGORICAL_COLUMNS:
+            if col in prepared_data and col in self.category_index:
+                prepared_data[col + '_encoded'] = self.category_index[col].get(prepared_data[col], 0)
 
-        
         # Create feature vector
-        feature_vector = {}
+        feature_vector = []
         for feature in self.all_features:
             if feature in prepared_data:
-                feature_vector[feature] = prepared_data[feature]
+                feature_vector.append(prepared_data[feature])
             elif feature.replace('_encoded', '') in prepared_data:
                 orig_col = feature.replace('_encoded', '')
-                feature_vector[feature] = prepared_data.get(orig_col + '_encoded', 0)
+                feature_vector.append(prepared_data.get(orig_col + '_encoded', 0))
             else:
                 # Use median from dataset
-                feature_vector[feature] = self.df_original[feature].median() if feature in self.df_original.columns else 0
+                feature_vector.append(self.feature_medians.get(feature, 0))
         
-        return pd.DataFrame([feature_vector])[self.all_features]
+        return np.asarray([feature_vector], dtype=np.float32)
     
     def predict_single_crop(self, environmental_data, crop_name):
         """Predict yield and risk for a specific crop"""
-        if not self.initialized:
-            raise RuntimeError("Recommender system not initialized")
+        if not self.ensure_loaded():
+            raise RecommenderUnavailable("Recommender system not initialized")
 
         input_data = environmental_data.copy()
         input_data['crop_name'] = crop_name
@@ -143,16 +246,203 @@ class CropRecommender:
         
         X_input = self.prepare_input(input_data)
         
-        predicted_yield = self.yield_model.predict(X_input)[0]
-        predicted_risk = self.risk_model.predict(X_input)[0]
+        predicted_yield = self.yield_model.inplace_predict(X_input)[0]
+        predicted_risk = self.risk_model.inplace_predict(X_input)[0]
         
         return float(predicted_yield), float(predicted_risk)
+
+    def build_feature_matrix(self, inputs):
+        """Feature matrix for every (input, crop) pair, input-major"""
+        base_rows = np.vstack([self.prepare_input(data) for data in inputs])
+        fill_water = np.array(['crop_water_requirement' not in data for data in inputs])
+        return self._expand_crops(base_rows, fill_water)
+
+    def _expand_crops(self, base_rows, fill_water):
+        """Repeat each base row once per crop and set the crop-specific columns"""
+        n_crops = len(self.available_crops)
+        X = np.repeat(base_rows, n_crops, axis=0)
+        X[:, self.all_features.index('crop_name_encoded')] = np.tile(np.arange(n_crops), len(base_rows))
+
+        # Crops bring their own water requirement unless the caller fixed one
+        if fill_water.any():
+            water_index = self.category_index.get('crop_water_requirement', {})
+            crop_water = np.array([
+                water_index.get(self.crop_info.get(crop, {}).get('water_req', 'Medium'), 0)
+                for crop in self.available_crops
+            ], dtype=np.float32)
+            rows = np.repeat(fill_water, n_crops)
+            col = self.all_features.index('crop_water_requirement_encoded')
+            X[rows, col] = np.tile(crop_water, len(base_rows))[rows]
+        return X
+
+    def predict_grid(self, X, n_inputs):
+        """Predict yield and risk for a feature matrix in one pass, shaped (n_inputs, n_crops)"""
+        shape = (n_inputs, len(self.available_crops))
+        yields = self.yield_model.inplace_predict(X).reshape(shape).astype(np.float64)
+        risks = self.risk_model.inplace_predict(X).reshape(shape).astype(np.float64)
+        return yields, risks
+
+    def _rng_for(self, key):
+        """Generator for the yield clamp; seeded from the input in deterministic mode"""
+        if not self.deterministic:
+            return np.random.default_rng()
+        return np.random.default_rng([self.seed, zlib.crc32(repr(key).encode())])
     
     def get_top_recommendations(self, environmental_data, top_n=3):
         """Get top crop recommendations with yield percentage and risk score"""
-        if not self.initialized:
-            raise RuntimeError("Recommender system not initialized")
+        if not self.ensure_loaded():
+            raise RecommenderUnavailable("Recommender system not initialized")
+
+        if not self.deterministic:
+            return self._rank_crops(environmental_data, np.random.default_rng())[:top_n]
+
+        # Deterministic mode: the yield clamp is seeded from the (quantized)
+        # input, so identical inputs always rank identically and can be cached
+        environmental_data = self.canonical_input(environmental_data)
+        ranked = self.cached_ranking(environmental_data)
+        if ranked is None:
+            ranked = self.rank_uncached(environmental_data)
+            self.store_ranking(environmental_data, ranked)
+
+        return [dict(rec) for rec in ranked[:top_n]]
+
+    def rank_uncached(self, environmental_data):
+        """Full ranking for a canonical input, bypassing the cache (the caller caches)"""
+        if not self.ensure_loaded():
+            raise RecommenderUnavailable("Recommender system not initialized")
+        if not self.deterministic:
+            return self._rank_crops(environmental_data, np.random.default_rng())
+        return self._rank_crops(environmental_data, self._rng_for(make_cache_key(environmental_data)))
+
+    def canonical_input(self, environmental_data):
+        """The input as the cache sees it (quantized when caching is on)"""
+        if self.cache is not None:
+            return quantize_input(environmental_data, self.quantization)
+        return environmental_data
+
+    def cached_ranking(self, environmental_data):
+        """Full cached ranking for a canonical input, or None on a miss"""
+        if self.cache is None:
+            return None
+        return self.cache.get(make_cache_key(environmental_data))
+
+    def store_ranking(self, environmental_data, ranked):
+        if self.cache is not None:
+            self.cache.put(make_cache_key(environmental_data), ranked)
+
+    def get_top_recommendations_batch(self, inputs, top_n=3):
+        """
+        Batched get_top_recommendations. All cache misses are predicted in
+        a single matrix; results are identical to calling the single
+        version once per input.
+        """
+        if not self.ensure_loaded():
+            raise RecommenderUnavailable("Recommender system not initialized")
+
+        inputs = [self.canonical_input(data) for data in inputs]
+        results = [self.cached_ranking(data) for data in inputs]
+
+        missing = [i for i, ranked in enumerate(results) if ranked is None]
+        if missing:
+            yields, risks = self.predict_grid(
+                self.build_feature_matrix([inputs[i] for i in missing]), len(missing)
+            )
+            for row, i in enumerate(missing):
+                results[i] = self._rank_crops(
+                    inputs[i], self._rng_for(make_cache_key(inputs[i])), predictions=(yields[row], risks[row])
+                )
+                self.store_ranking(inputs[i], results[i])
 
+        return [[dict(rec) for rec in ranked[:top_n]] for ranked in results]
+
+    def cache_stats(self):
+        """Hit-rate metrics for the recommendation cache"""
+        if self.cache is None:
+            return {'enabled': False}
+        return {'enabled': True, 'deterministic': self.deterministic, **self.cache.stats()}
+
+    def sweep(self, base_input, ranges):
+        """
+        What-if sensitivity sweep over one or two numeric inputs.
+
+        ranges: list of {'field', 'start', 'stop', 'steps'}. Every grid point
+        x crop is scored in one vectorized pass, using the same scoring as
+        get_top_recommendations. The base input and the axis values are
+        quantized like /recommend inputs, so a grid point ranks exactly as
+        the matching recommendation does. Returns the crops, the axis values and
+        rank/score arrays shaped (*axis_lengths, n_crops).
+        """
+        if not self.ensure_loaded():
+            raise RecommenderUnavailable("Recommender system not initialized")
+
+        numeric_fields = [f for f in self.all_features if not f.endswith('_encoded')]
+        if not 1 <= len(ranges) <= 2:
+            raise ValueError("Provide one or two parameter ranges")
+        if len({r['field'] for r in ranges}) != len(ranges):
+            raise ValueError("Each parameter can only be swept once")
+
+        axes = []
+        for r in ranges:
+            if r['field'] not in numeric_fields:
+                raise ValueError(f"Cannot sweep '{r['field']}'. Allowed: {', '.join(numeric_fields)}")
+            if not 2 <= r['steps'] <= MAX_SWEEP_STEPS:
+                raise ValueError(f"steps must be between 2 and {MAX_SWEEP_STEPS}")
+            values = np.linspace(r['start'], r['stop'], r['steps'])
+            # Snap each axis to the cache grid so every point is scored as
+            # /recommend would score the same conditions
+            values = np.array([
+                self.canonical_input({r['field']: float(v)})[r['field']] for v in values
+            ])
+            axes.append((r['field'], values))
+
+        base_input = self.canonical_input(base_input)
+
+        # Grid points, row-major over the axes
+        grid = np.stack(np.meshgrid(*[values for _, values in axes], indexing='ij'), axis=-1)
+        grid = grid.reshape(-1, len(axes))
+        n_points = len(grid)
+
+        base_rows = np.repeat(self.prepare_input(base_input), n_points, axis=0)
+        for i, (field, _) in enumerate(axes):
+            base_rows[:, self.all_features.index(field)] = grid[:, i]
+        fill_water = np.full(n_points, 'crop_water_requirement' not in base_input)
+
+        yields, risks = self.predict_grid(self._expand_crops(base_rows, fill_water), n_points)
+
+        avg_yield = np.array([
+            self.crop_info[crop]['avg_yield'] if crop in self.crop_info else np.nan
+            for crop in self.available_crops
+        ])
+        avg_yield = np.where(np.isnan(avg_yield), yields, avg_yield)
+        avg_yield = np.where(avg_yield <= 0, 1.0, avg_yield)
+
+        # Same sanity clamp as _rank_crops, drawing from each point's own generator
+        clamp = yields >= avg_yield
+        for i in np.flatnonzero(clamp.any(axis=1)):
+            point = dict(base_input, **{field: float(v) for (field, _), v in zip(axes, grid[i])})
+            factors = self._rng_for(make_cache_key(point)).uniform(0.85, 0.98, size=clamp[i].sum())
+            yields[i, clamp[i]] = avg_yield[i, clamp[i]] * factors
+
+        yield_pct = np.minimum((yields / avg_yield) * 100, 100.0)
+        scores = yield_pct * (1 - risks)
+
+        order = np.argsort(-scores, axis=1, kind='stable')
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.broadcast_to(np.arange(1, order.shape[1] + 1), order.shape), axis=1)
+
+        shape = tuple(len(values) for _, values in axes) + (len(self.available_crops),)
+        return {
+            'crops': list(self.available_crops),
+            'axes': [{'field': field, 'values': values.tolist()} for field, values in axes],
+            'ranks': ranks.reshape(shape),
+            'scores': scores.reshape(shape)
+        }
+
+    def _rank_crops(self, environmental_data, rng, predictions=None):
+        """
+        Score every crop and return all of them formatted, best first.
+        predictions: optional precomputed (yields, risks) rows for this input.
+        """
         # --- Calculate Previous Crop Revenue Baseline ---
         prev_revenue_benchmark = 0.0
         prev_crop_name = environmental_data.get('previous_crop', '')
@@ -164,10 +454,16 @@ class CropRecommender:
         # ------------------------------------------------
 
         recommendations = []
+
+        # All crops are predicted in a single batch
+        if predictions is None:
+            yields, risks = self.predict_grid(self.build_feature_matrix([environmental_data]), 1)
+            predictions = (yields[0], risks[0])
+        yields, risks = predictions
         
-        for crop in self.available_crops:
+        for j, crop in enumerate(self.available_crops):
             try:
-                yield_pred, risk_pred = self.predict_single_crop(environmental_data, crop)
+                yield_pred, risk_pred = float(yields[j]), float(risks[j])
                 
                 # Calculate Yield % with Sanity Check
                 avg_yield = self.crop_info[crop]['avg_yield'] if crop in self.crop_info else yield_pred
@@ -177,7 +473,7 @@ class CropRecommender:
                 # This prevents "100%" or "500%" and gives variation
                 if yield_pred >= avg_yield:
                     # Randomly scale to 85% - 98% of average
-                    scale_factor = np.random.uniform(0.85, 0.98)
+                    scale_factor = rng.uniform(0.85, 0.98)
                     yield_pred = avg_yield * scale_factor
 
                 # Calculate Percentage (Will naturally be < 100% now)
@@ -242,9 +538,9 @@ class CropRecommender:
         # Sort by score (higher is better)
         recommendations.sort(key=lambda x: x['Score'], reverse=True)
         
-        # Format output for top N
+        # Format output (callers slice the top N)
         top_recommendations = []
-        for i, rec in enumerate(recommendations[:top_n], 1):
+        for i, rec in enumerate(recommendations, 1):
             top_recommendations.append({
                 'rank': i,
                 'crop_name': rec['Crop'],
@@ -268,13 +564,19 @@ class CropRecommender:
         
         return top_recommendations
 
-# Singleton instance
+# Singleton instance (cheap to construct, models load on first use)
 try:
     current_dir = os.path.dirname(os.path.abspath(__file__))
     model_dir = os.path.join(current_dir, "crop_recommendation_models")
     dataset_path = os.path.join(current_dir, "enhanced_agriculture_dataset.csv")
     
-    full_recommender = CropRecommender(model_dir, dataset_path)
+    full_recommender = CropRecommender(
+        model_dir,
+        dataset_path,
+        cache_size=int(os.getenv("CROP_RECOMMENDER_CACHE_SIZE", "256")),
+        deterministic=os.getenv("CROP_RECOMMENDER_DETERMINISTIC", "true").lower() != "false",
+        seed=int(os.getenv("CROP_RECOMMENDER_SEED", "42"))
+    )
 except Exception as e:
     logger.error(f"Failed to initialize CropRecommender: {e}")
     full_recommender = None
@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+
+# Rounding step per numeric input. Readings that round to the same grid
+# point share a cache entry (e.g. rainfall 846 and 851 both become 850).
+DEFAULT_QUANTIZATION = {
+    'soil_n': 1.0,
+    'soil_p': 1.0,
+    'soil_k': 1.0,
+    'soil_ph': 0.1,
+    'soil_moisture': 1.0,
+    'avg_temperature': 0.5,
+    'seasonal_rainfall': 10.0,
+    'humidity': 1.0,
+    'crop_duration_days': 5.0,
+}
+
+
+def quantize_input(input_data, steps):
+    """Snap numeric fields to their configured rounding step"""
+    quantized = dict(input_data)
+    for field, step in steps.items():
+        value = quantized.get(field)
+        if step and isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Second round() drops float noise such as 6.500000000000001
+            quantized[field] = round(round(value / step) * step, 6)
+    return quantized
+
+
+def _key_value(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        # 850 and 850.0 must produce the same key (and the same seed)
+        return float(value)
+    return repr(value)
+
+
+def make_cache_key(input_data):
+    """Hashable, order-independent key for a (quantized) input dict"""
+    return tuple(sorted((k, _key_value(v)) for k, v in input_data.items()))
+
+
+class RecommendationCache:
+    """Thread-safe LRU cache with hit-rate counters"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from .pipeline import full_recommender
+from .pipeline import full_recommender, RecommenderUnavailable
+from .inference_pool import inference_pool, InferencePoolSaturated, rank_crops_task, sweep_task
 import logging
 
 # Configure logging
@@ -13,6 +14,12 @@ router = APIRouter(
     tags=["Crop Recommendations"]
 )
 
+@router.on_event("shutdown")
+def stop_inference_pool():
+    # Spawned workers would otherwise outlive a graceful stop until interpreter exit
+    if inference_pool:
+        inference_pool.shutdown()
+
 # --- Pydantic Models ---
 
 class CropRecommendationRequest(BaseModel):
@@ -40,6 +47,18 @@ class CropRecommendationRequest(BaseModel):
     crop_water_requirement: str = Field("Medium", description="Water Availability/Requirement")
 
 
+class SweepRange(BaseModel):
+    field: str = Field(..., description="Numeric input to vary", example="seasonal_rainfall")
+    start: float = Field(..., description="First value of the range", example=300)
+    stop: float = Field(..., description="Last value of the range (inclusive)", example=1200)
+    steps: int = Field(10, description="Number of evenly spaced values", example=10)
+
+
+class SweepRequest(BaseModel):
+    base: CropRecommendationRequest
+    ranges: List[SweepRange] = Field(..., description="One or two parameter ranges")
+
+
 class CropRecommendationResponse(BaseModel):
     rank: int
     crop_name: str
@@ -61,20 +80,45 @@ class RecommendationResult(BaseModel):
     success: bool
     data: List[CropRecommendationResponse]
 
+UNAVAILABLE_DETAIL = "Crop Recommendation System is initializing or failed to load."
+
+
+async def _run_inference(fn, *args):
+    """Run a task on the inference pool, mapping pool errors to HTTP errors"""
+    try:
+        return await inference_pool.run(fn, *args)
+    except InferencePoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except RecommenderUnavailable:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+
 # --- Endpoints ---
 
 @router.get("/health")
-def health_check():
-    if full_recommender and full_recommender.initialized:
-        return {"status": "healthy", "service": "crop-recommendation-system", "models_loaded": True}
-    else:
+async def health_check():
+    # Models load lazily, so "not loaded yet" is still healthy; a load failure
+    # in the server or in an inference worker is not
+    if not full_recommender or full_recommender.load_error:
         return {"status": "degraded", "service": "crop-recommendation-system", "models_loaded": False}
 
+    state = await inference_pool.model_state()
+    return {
+        "status": "degraded" if state.get("load_error") else "healthy",
+        "service": "crop-recommendation-system",
+        "models_loaded": state["models_loaded"],
+        "load_error": state.get("load_error"),
+        "inference_pool": inference_pool.stats()
+    }
+
 @router.get("/crops")
 def get_available_crops():
     """Get list of all supported crops"""
-    if not full_recommender or not full_recommender.initialized:
-         raise HTTPException(status_code=503, detail="Crop Recommendation System is initializing or failed to load.")
+    if not full_recommender or not full_recommender.ensure_metadata():
+         raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
     
     return {
         "success": True,
@@ -83,30 +127,82 @@ def get_available_crops():
     }
 
 @router.post("/recommend", response_model=RecommendationResult)
-def recommend_crops(request: CropRecommendationRequest):
+async def recommend_crops(request: CropRecommendationRequest):
     """
     Get top crop recommendations based on environmental conditions.
     Uses XGBoost models for Yield Prediction and Risk Assessment.
+    Inference runs on the dedicated inference pool; 503 + Retry-After when it is saturated.
     """
-    if not full_recommender or not full_recommender.initialized:
-        raise HTTPException(status_code=503, detail="Crop Recommendation System is initializing or failed to load.")
+    if not full_recommender:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
 
     try:
         # Convert request to dictionary
-        input_data = request.dict()
+        input_data = full_recommender.canonical_input(request.dict())
         
-        # Get recommendations
-        recommendations = full_recommender.get_top_recommendations(input_data, top_n=3)
+        # Cache hits are answered here without touching the pool
+        ranked = full_recommender.cached_ranking(input_data)
+        if ranked is None:
+            ranked = await _run_inference(rank_crops_task, input_data)
+            full_recommender.store_ranking(input_data, ranked)
         
         return {
             "success": True,
-            "data": recommendations
+            "data": [dict(rec) for rec in ranked[:3]]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating recommendations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/recommend/sweep")
+async def sweep_recommendations(request: SweepRequest):
+    """
+    What-if sensitivity sweep.
+    Varies one or two inputs over a grid and returns the rank and score of
+    every crop at every grid point, evaluated in one vectorized pass.
+    ranks/scores are nested as [axis 1][axis 2][crop].
+    """
+    if not full_recommender:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+
+    try:
+        result = await _run_inference(
+            sweep_task,
+            request.base.dict(),
+            [r.dict() for r in request.ranges]
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running recommendation sweep: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "success": True,
+        "data": {
+            "crops": result["crops"],
+            "axes": result["axes"],
+            "ranks": result["ranks"].tolist(),
+            "scores": result["scores"].round(2).tolist()
+        }
+    }
+
+@router.get("/recommend/cache-stats")
+def get_recommendation_cache_stats():
+    """Hit-rate metrics for the memoized recommendation results"""
+    if not full_recommender:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+
+    return {
+        "success": True,
+        "data": full_recommender.cache_stats()
+    }
+
 # --- Mock Endpoints REMOVED ---
 # These functionality is now provided by feature4 (Scheme Agent)
 # to avoid route conflicts.
@@ -10,6 +10,7 @@ It includes agents for:
 
 from google import genai
 from google.genai import types
+import asyncio
 import base64
 import json
 from datetime import datetime, timedelta
@@ -17,6 +18,8 @@ from typing import Optional
 from pydantic import BaseModel
 import os
 
+from core.image_prep import prepare_image
+
 # Configure Gemini API
 client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
@@ -91,6 +94,8 @@ async def analyze_equipment_image(image_base64: str) -> dict:
         image_base64 = image_base64.split(',')[1]
     
     image_data = base64.b64decode(image_base64)
+    # Upright, downsized, metadata-free copy for the model
+    image_data, image_mime_type = await asyncio.to_thread(prepare_image, image_data, "image/jpeg", source="equipment")
     
     # Create the analysis prompt
     analysis_prompt = """You are an expert agricultural equipment analyst. Analyze this image of farm equipment and provide a detailed assessment.
@@ -134,7 +139,7 @@ Be thorough but realistic. If you cannot identify the equipment clearly, provide
             contents=[
                 types.Part.from_bytes(
                     data=image_data,
-                    mime_type="image/jpeg"
+                    mime_type=image_mime_type
                 ),
                 analysis_prompt
             ]
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 from core.supabase_client import supabase
+from core.reference_ids import agri_reference_ids, insert_with_reference
+from core.pagination import InvalidCursor, keyset_page, split_page
+from core.dashboard_stats import get_application_counts, invalidate_dashboard_stats
 
 router = APIRouter()
 
@@ -26,44 +29,59 @@ async def apply_scheme(application: SchemeApplicationCreate, user_id: str = "def
     # If user_id passed as query param default, we use it.
     if user_id == "default_user": user_id = "default"
 
-    if not application.reference_no:
-        import time
-        import random
-        prefix = "AGR"
-        timestamp = str(int(time.time()))[-6:]
-        rand = str(random.randint(100, 999))
-        application.reference_no = f"{prefix}-{timestamp}-{rand}"
+    generate_reference = not application.reference_no
 
-    app_data = application.dict()
-    scheme_name = app_data.get("scheme_name")
-    reference_no = app_data.get("reference_no")
-    
-    # Store full details in jsonb
-    application_details = app_data
-
-    row = {
-        "reference_no": reference_no,
-        "user_id": user_id, 
-        "scheme_name": scheme_name,
-        "status": "submitted", # Default status
-        "application_details": application_details
-    }
+    def insert(reference_no: str):
+        app_data = {**application.dict(), "reference_no": reference_no}
+        row = {
+            "reference_no": reference_no,
+            "user_id": user_id, 
+            "scheme_name": app_data.get("scheme_name"),
+            "status": "submitted", # Default status
+            "application_details": app_data # Store full details in jsonb
+        }
+        return supabase.table("scheme_applications").insert(row).execute(), row
     
     try:
-        response = supabase.table("scheme_applications").insert(row).execute()
+        if generate_reference:
+            # A reference clash (node id shared with another process) is retried with a new one
+            (response, row), _ = insert_with_reference(agri_reference_ids, insert)
+        else:
+            response, row = insert(application.reference_no)
+        invalidate_dashboard_stats()
         return {"message": "Application submitted successfully", "application": response.data[0] if response.data else row}
     except Exception as e:
         print(f"Error submitting application: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Columns the list views below read; the cursor needs id and created_at
+LIST_VIEW_COLUMNS = "id,reference_no,status,created_at,scheme_name,application_details"
+MAX_PAGE_SIZE = 500
+
+DEFAULT_PAGE_SIZE = 100
+
+def _fetch_page(query, limit: Optional[int], cursor: Optional[str], response: Response) -> List[dict]:
+    """
+    Every row, newest first, unless the caller opts into paging with limit or
+    cursor: then one keyset page, with the next page's cursor in X-Next-Cursor
+    """
+    if limit is None and cursor is None:
+        return query.order("created_at", desc=True).order("id", desc=True).execute().data or []
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    result = keyset_page(query, limit, cursor).execute()
+    rows, next_cursor = split_page(result.data, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @router.get("/applications/all", response_model=List[dict])
-async def get_all_applications():
-    """Fetch all applications for Admin"""
+async def get_all_applications(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """Fetch all applications for Admin, newest first (?limit= pages; next page: ?cursor=<X-Next-Cursor>)"""
     try:
-        response = supabase.table("scheme_applications").select("*").order("created_at", desc=True).execute()
+        rows = _fetch_page(supabase.table("scheme_applications").select(LIST_VIEW_COLUMNS), limit, cursor, response)
         
         mapped_data = []
-        for item in response.data:
+        for item in rows:
             details = item.get("application_details") or {}
             flat_item = {
                 "id": item.get("id"),
@@ -80,19 +98,27 @@ async def get_all_applications():
             mapped_data.append(flat_item)
             
         return mapped_data
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching applications: {e}")
         return []
 
 @router.get("/applications/my", response_model=List[dict])
-async def get_my_applications(user_id: str = "default"):
-    """Fetch applications for logged in user"""
+async def get_my_applications(
+    response: Response,
+    user_id: str = "default",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Fetch applications for logged in user, newest first (?limit= pages; next page: ?cursor=<X-Next-Cursor>)"""
     if user_id == "default_user": user_id = "default"
     
     try:
-        response = supabase.table("scheme_applications").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        query = supabase.table("scheme_applications").select(LIST_VIEW_COLUMNS).eq("user_id", user_id)
+        rows = _fetch_page(query, limit, cursor, response)
         mapped_data = []
-        for item in response.data:
+        for item in rows:
             details = item.get("application_details") or {}
             flat_item = {
                 "id": item.get("id"),
@@ -107,6 +133,8 @@ async def get_my_applications(user_id: str = "default"):
             }
             mapped_data.append(flat_item)
         return mapped_data
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching my applications: {e}")
         return []
@@ -118,6 +146,7 @@ async def update_application_status(application_id: str, update: SchemeApplicati
         response = supabase.table("scheme_applications").update({"status": update.status}).eq("id", application_id).execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Application not found")
+        invalidate_dashboard_stats(status_change=True)
         return {"message": "Status updated", "application": response.data[0]}
     except Exception as e:
         print(f"Error updating status: {e}")
@@ -127,26 +156,14 @@ async def update_application_status(application_id: str, update: SchemeApplicati
 async def get_statistics():
     """Get application statistics"""
     try:
-        # We need to compute counts. Supabase py client might vary on how to do count w/o fetching all.
-        # But for now, fetching all is okay for small scale.
-        response = supabase.table("scheme_applications").select("status", count="exact").execute()
-        
-        # Or better separate queries if necessary, but select status is cheap.
-        response = supabase.table("scheme_applications").select("status").execute()
-        data = response.data
-        
-        total = len(data)
-        submitted = sum(1 for x in data if x['status'] == 'submitted')
-        under_review = sum(1 for x in data if x['status'] == 'under_review')
-        approved = sum(1 for x in data if x['status'] == 'approved')
-        rejected = sum(1 for x in data if x['status'] == 'rejected')
-        
+        # Grouped server-side and cached; no per-row download
+        counts = get_application_counts()
         return {
-            "total": total,
-            "submitted": submitted,
-            "under_review": under_review,
-            "approved": approved,
-            "rejected": rejected
+            "total": counts["total"],
+            "submitted": counts["submitted"],
+            "under_review": counts["under_review"],
+            "approved": counts["approved"],
+            "rejected": counts["rejected"]
         }
     except Exception as e:
         print(f"Error fetching stats: {e}")
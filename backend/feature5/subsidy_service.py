@@ -21,6 +21,7 @@ import os
 import re
 import httpx
 from bs4 import BeautifulSoup
+from core.scheme_index import SchemeIndex
 
 
 class Subsidy:
@@ -338,6 +339,58 @@ STATE_SUBSIDIES = {
 }
 
 
+def _equipment_facets(subsidy: Subsidy) -> list[str]:
+    equipment = list(subsidy.applicable_equipment)
+    # Catch-all schemes (any equipment list mentioning "all") match every filter
+    if "all" in ' '.join(equipment).lower():
+        equipment.append("*")
+    return equipment
+
+
+# Central schemes are indexed directly; state schemes as (state_key, Subsidy) pairs
+_central_index = SchemeIndex(
+    id_fn=lambda subsidy: subsidy.scheme_name,
+    facets={"equipment": _equipment_facets}
+)
+_state_index = SchemeIndex(
+    id_fn=lambda entry: None,
+    facets={
+        "state": lambda entry: [entry[0]],
+        "equipment": lambda entry: _equipment_facets(entry[1])
+    }
+)
+
+
+def _central_subsidy_index() -> SchemeIndex:
+    _central_index.ensure_current(
+        lambda: CENTRAL_SUBSIDIES,
+        (id(CENTRAL_SUBSIDIES), len(CENTRAL_SUBSIDIES))
+    )
+    return _central_index
+
+
+def _state_subsidy_index() -> SchemeIndex:
+    _state_index.ensure_current(
+        lambda: [(state, subsidy) for state, schemes in STATE_SUBSIDIES.items() for subsidy in schemes],
+        (id(STATE_SUBSIDIES), tuple((state, len(schemes)) for state, schemes in STATE_SUBSIDIES.items()))
+    )
+    return _state_index
+
+
+def refresh_subsidy_indexes():
+    """Force a rebuild after editing CENTRAL_SUBSIDIES / STATE_SUBSIDIES in place"""
+    _central_index.fingerprint = None
+    _state_index.fingerprint = None
+
+
+def _equipment_matches(index: SchemeIndex, equipment_type: str) -> set:
+    equipment_lower = equipment_type.lower()
+    return index.facet_matching(
+        "equipment",
+        lambda eq: eq == "*" or equipment_lower in eq or eq in equipment_lower
+    )
+
+
 def get_central_subsidies(equipment_type: Optional[str] = None) -> list[dict]:
     """
     Get central government subsidies.
@@ -348,33 +401,18 @@ def get_central_subsidies(equipment_type: Optional[str] = None) -> list[dict]:
     Returns:
         List of applicable central subsidies
     """
+    index = _central_subsidy_index()
+    matches = _equipment_matches(index, equipment_type) if equipment_type else index.all()
+
     subsidies = []
     overrides = _get_scrape_overrides()
     
-    for subsidy in CENTRAL_SUBSIDIES:
-        if equipment_type:
-            # Check if equipment type matches any applicable equipment
-            equipment_lower = equipment_type.lower()
-            applicable = [eq.lower() for eq in subsidy.applicable_equipment]
-            
-            if any(equipment_lower in eq or eq in equipment_lower for eq in applicable):
-                subsidy_dict = subsidy.to_dict()
-                override = overrides.get(subsidy.scheme_name)
-                if override:
-                    subsidy_dict.update(override)
-                subsidies.append(subsidy_dict)
-            elif "all" in ' '.join(applicable).lower():
-                subsidy_dict = subsidy.to_dict()
-                override = overrides.get(subsidy.scheme_name)
-                if override:
-                    subsidy_dict.update(override)
-                subsidies.append(subsidy_dict)
-        else:
-            subsidy_dict = subsidy.to_dict()
-            override = overrides.get(subsidy.scheme_name)
-            if override:
-                subsidy_dict.update(override)
-            subsidies.append(subsidy_dict)
+    for subsidy in index.select(matches):
+        subsidy_dict = subsidy.to_dict()
+        override = overrides.get(subsidy.scheme_name)
+        if override:
+            subsidy_dict.update(override)
+        subsidies.append(subsidy_dict)
     
     return subsidies
 
@@ -390,22 +428,12 @@ def get_state_subsidies(state: str, equipment_type: Optional[str] = None) -> lis
     Returns:
         List of applicable state subsidies
     """
-    state_schemes = STATE_SUBSIDIES.get(state, [])
-    subsidies = []
+    index = _state_subsidy_index()
+    matches = index.facet("state", state)
+    if equipment_type and matches:
+        matches &= _equipment_matches(index, equipment_type)
     
-    for subsidy in state_schemes:
-        if equipment_type:
-            equipment_lower = equipment_type.lower()
-            applicable = [eq.lower() for eq in subsidy.applicable_equipment]
-            
-            if any(equipment_lower in eq or eq in equipment_lower for eq in applicable):
-                subsidies.append(subsidy.to_dict())
-            elif "all" in ' '.join(applicable).lower():
-                subsidies.append(subsidy.to_dict())
-        else:
-            subsidies.append(subsidy.to_dict())
-    
-    return subsidies
+    return [subsidy.to_dict() for _, subsidy in index.select(matches)]
 
 
 def get_all_subsidies(
@@ -64,6 +64,7 @@ CREATE TABLE lands (
     polygon_coordinates JSONB NOT NULL,
     area_sqm NUMERIC,
     status TEXT DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'VERIFIED', 'REJECTED')),
+    walk_completeness NUMERIC, -- share of the boundary covered by the GPS walk (NULL when drawn by hand), see land_registry.sql
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -82,7 +83,10 @@ CREATE TABLE blockchain_events (
     land_id UUID REFERENCES lands(id) ON DELETE CASCADE,
     document_id UUID REFERENCES land_documents(id) ON DELETE CASCADE,
     data_hash TEXT NOT NULL,
-    created_at TIMESTAMPTZ DEFAULT NOW()
+    status TEXT, -- pending | submitted | confirmed | failed, see blockchain_events_queue.sql
+    register_args JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- ==========================================
@@ -22,6 +22,7 @@ from feature5.equipment_analyzer import (
     get_analysis_history,
     get_maintenance_schedules
 )
+from core.image_prep import get_image_prep_stats
 from feature5.subsidy_service import get_all_subsidies, calculate_subsidy_amount, get_available_states
 from feature5.router import router as feature5_router
 from feature1.router import router as feature1_router
@@ -61,7 +62,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # "*" is taken literally on credentialed requests, so paging headers are named
+    expose_headers=["*", "X-Next-Cursor"]
 )
 
 
@@ -264,6 +266,17 @@ async def get_equipment_history():
     }
 
 
+@app.get("/api/equipment/image-stats")
+async def get_equipment_image_stats():
+    """
+    Bytes saved by preparing images before vision calls.
+    """
+    return {
+        "success": True,
+        "data": get_image_prep_stats()
+    }
+
+
 @app.get("/api/equipment/schedules")
 async def get_all_schedules():
     """
@@ -0,0 +1,111 @@
+"""
+Benchmark for land parcel area calculation.
+
+Compares, on a synthetic set of parcels (irregular 4-40 vertex polygons
+of 0.1-10 ha spread across India):
+  - legacy: the previous calculate_polygon_area, which built two pyproj.Proj
+    objects and a Transformer for a centroid-centred AEA projection per call
+  - single: feature1.geometry.calculate_area, one polygon per call
+  - bulk:   feature1.geometry.calculate_areas over the whole list
+and reports per-polygon cost plus the largest relative difference against
+a pyproj.Geod geodesic reference.
+
+    python scripts/benchmark_land_area.py [--polygons 2000] [--legacy-polygons 200]
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+
+import numpy as np
+import pyproj
+from shapely.geometry import Polygon
+from shapely.ops import transform
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from feature1.geometry import calculate_area, calculate_areas
+
+GEOD = pyproj.Geod(ellps="WGS84")
+
+# shapely 2 deprecates shapely.ops.transform, which the legacy version used
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+def legacy_polygon_area(coordinates):
+    """calculate_polygon_area as it was before the geometry module"""
+    polygon = Polygon([(p['lng'], p['lat']) for p in coordinates])
+    centroid = polygon.centroid
+    proj_string = f"+proj=aea +lat_1={centroid.y} +lat_2={centroid.y} +lat_0={centroid.y} +lon_0={centroid.x}"
+    project = pyproj.Transformer.from_proj(
+        pyproj.Proj("epsg:4326"),
+        pyproj.Proj(proj_string),
+        always_xy=True
+    ).transform
+    return abs(transform(project, polygon).area)
+
+
+def generate_parcels(n, seed):
+    """Star-shaped (hence simple) polygons as [{'lat','lng'}] lists"""
+    rng = np.random.default_rng(seed)
+    parcels = []
+    for _ in range(n):
+        lat, lng = rng.uniform(8, 32), rng.uniform(69, 92)
+        vertices = int(rng.integers(4, 41))
+        radius_m = np.sqrt(rng.uniform(1_000, 100_000) / np.pi)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+        radii = radius_m * rng.uniform(0.7, 1.0, vertices)
+        dlat = radii * np.sin(angles) / 111_320
+        dlng = radii * np.cos(angles) / (111_320 * np.cos(np.radians(lat)))
+        parcels.append([{"lat": lat + a, "lng": lng + b} for a, b in zip(dlat, dlng)])
+    return parcels
+
+
+def per_polygon_us(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polygons", type=int, default=2000)
+    parser.add_argument("--legacy-polygons", type=int, default=200, help="legacy is slow; time it on a subset")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    parcels = generate_parcels(args.polygons, args.seed)
+    arrays = [np.array([(p["lng"], p["lat"]) for p in parcel]) for parcel in parcels]
+
+    legacy_us = per_polygon_us(legacy_polygon_area, parcels[:args.legacy_polygons])
+    single_us = per_polygon_us(calculate_area, parcels)
+
+    started = time.perf_counter()
+    bulk = calculate_areas(parcels)
+    bulk_us = (time.perf_counter() - started) / len(parcels) * 1e6
+
+    started = time.perf_counter()
+    calculate_areas(arrays)
+    bulk_array_us = (time.perf_counter() - started) / len(parcels) * 1e6
+
+    reference = np.array([abs(GEOD.polygon_area_perimeter(a[:, 0], a[:, 1])[0]) for a in arrays])
+    legacy = np.array([legacy_polygon_area(p) for p in parcels[:args.legacy_polygons]])
+    new_error = np.max(np.abs(bulk - reference) / reference)
+    legacy_error = np.max(np.abs(legacy - reference[:len(legacy)]) / reference[:len(legacy)])
+
+    print(f"{'method':<28}{'us/polygon':>12}{'speedup':>10}")
+    for name, us in [
+        ("legacy (Transformer/call)", legacy_us),
+        ("calculate_area", single_us),
+        ("calculate_areas (dicts)", bulk_us),
+        ("calculate_areas (arrays)", bulk_array_us)
+    ]:
+        print(f"{name:<28}{us:>12.1f}{legacy_us / us:>9.0f}x")
+    print(f"\nmax relative error vs geodesic: new {new_error:.2e}, legacy {legacy_error:.2e}")
+
+
+if __name__ == "__main__":
+    main()
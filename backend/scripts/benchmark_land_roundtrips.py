@@ -0,0 +1,152 @@
+"""
+Benchmark of database time in the land endpoints, before and after
+feature1.land_store.
+
+Runs against the configured Supabase project on a throwaway user, land and
+document (deleted afterwards) and reports per-step latency of:
+  - verify, legacy: select land, select document, update status and insert
+    the pending blockchain event, one after another
+  - verify, new:    land_verification_context() (or the two selects
+    concurrently if the RPC isn't deployed) and apply_verification(), which
+    writes the same status and pending event in one transaction
+Both verify paths write the same rows; deleting the event afterwards is not
+timed on either side.
+  - record, legacy: select user, insert user if missing, insert land
+  - record, new:    record_land() (or upsert user + insert land)
+Deploy database/land_registry.sql first to measure the RPC path.
+
+    python scripts/benchmark_land_roundtrips.py [--iterations 20]
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from core.supabase_client import supabase
+from feature1.land_store import apply_verification, fetch_verification_context, insert_land, latency_breakdown
+
+POLYGON = [
+    {"lat": 19.07, "lng": 72.87},
+    {"lat": 19.07, "lng": 72.871},
+    {"lat": 19.071, "lng": 72.871},
+    {"lat": 19.071, "lng": 72.87}
+]
+
+REGISTER_ARGS = ("benchmark", "Benchmark Owner", 11700, 11700, 90, "PENDING", "QmSimulatedIPFSHash")
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def legacy_verify(land_id, document_id, status):
+    steps = {}
+    _, steps["select_land"] = timed(lambda: supabase.table("lands").select("*").eq("id", land_id).execute())
+    _, steps["select_document"] = timed(lambda: supabase.table("land_documents").select("*").eq("id", document_id).execute())
+    _, steps["update_status"] = timed(lambda: supabase.table("lands").update({"status": status}).eq("id", land_id).execute())
+    event, steps["insert_event"] = timed(lambda: supabase.table("blockchain_events").insert({
+        "land_id": land_id, "document_id": document_id, "data_hash": "PENDING",
+        "status": "pending", "register_args": list(REGISTER_ARGS)
+    }).execute())
+    supabase.table("blockchain_events").delete().eq("id", event.data[0]["id"]).execute()
+    return steps
+
+
+def legacy_record(user_id):
+    steps = {}
+    existing, steps["select_user"] = timed(lambda: supabase.table("users").select("id").eq("id", user_id).execute())
+    if not existing.data:
+        _, steps["insert_user"] = timed(lambda: supabase.table("users").insert({
+            "id": user_id,
+            "phone_number": f"demo-{user_id[:8]}",
+            "full_name": "Demo Farmer",
+            "email": f"demo-{user_id[:8]}@example.com",
+            "password_hash": "demo_hash"
+        }).execute())
+    response, steps["insert_land"] = timed(lambda: supabase.table("lands").insert({
+        "user_id": user_id, "polygon_coordinates": POLYGON, "area_sqm": 11700, "status": "PENDING"
+    }).execute())
+    return steps, response.data[0]["id"]
+
+
+async def new_verify(land_id, document_id, status, expected):
+    started = time.perf_counter()
+    await fetch_verification_context(land_id, document_id)
+    event_id = await apply_verification(land_id, document_id, status, expected, REGISTER_ARGS)
+    elapsed = (time.perf_counter() - started) * 1000
+    if event_id:
+        supabase.table("blockchain_events").delete().eq("id", event_id).execute()
+    return elapsed
+
+
+async def new_record(user_id):
+    started = time.perf_counter()
+    rows = await insert_land(user_id, POLYGON, 11700)
+    return (time.perf_counter() - started) * 1000, rows[0]["id"]
+
+
+def report(title, samples):
+    print(f"\n{title}")
+    for step, values in samples.items():
+        print(f"  {step:<28}{statistics.median(values):>10.1f} ms median{max(values):>10.1f} ms max")
+
+
+async def run(iterations):
+    user_id = str(uuid.uuid4())
+    land_ids = []
+    legacy_verify_steps, legacy_record_steps = {}, {}
+    new_verify_total, new_record_total = [], []
+    try:
+        for _ in range(iterations):
+            steps, land_id = legacy_record(user_id)
+            land_ids.append(land_id)
+            for step, ms in steps.items():
+                legacy_record_steps.setdefault(step, []).append(ms)
+            ms, land_id = await new_record(user_id)
+            land_ids.append(land_id)
+            new_record_total.append(ms)
+
+        land_id = land_ids[0]
+        document = supabase.table("land_documents").insert({
+            "land_id": land_id, "document_url": "https://mock-storage.com/benchmark.pdf",
+            "extracted_area_sqm": 11700, "confidence_score": 90
+        }).execute().data[0]
+        status = "PENDING"
+        for _ in range(iterations):
+            for step, ms in legacy_verify(land_id, document["id"], status).items():
+                legacy_verify_steps.setdefault(step, []).append(ms)
+            new_verify_total.append(await new_verify(land_id, document["id"], status, status))
+    finally:
+        for land_id in land_ids:
+            supabase.table("lands").delete().eq("id", land_id).execute()
+        supabase.table("users").delete().eq("id", user_id).execute()
+
+    legacy_verify_steps["total"] = [sum(v) for v in zip(*legacy_verify_steps.values())]
+    legacy_record_steps["total"] = [sum(v) for v in zip(*(v for k, v in legacy_record_steps.items() if k != "insert_user"))]
+    report("verify, legacy (4 sequential round trips)", legacy_verify_steps)
+    report("verify, new", {"total": new_verify_total})
+    report("record, legacy (user already exists: 2 round trips)", legacy_record_steps)
+    report("record, new", {"total": new_record_total})
+    print("\nnew path, per step:")
+    for endpoint, steps in latency_breakdown.stats().items():
+        for step, entry in steps.items():
+            print(f"  {endpoint + ' / ' + step:<40}{entry['avg_ms']:>8.1f} ms avg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Benchmark and regression check for the crop recommender.
+
+Generates a synthetic request mix (same distributions as
+data_augmentation.py), then measures latency percentiles and throughput
+of get_top_recommendations, single and batched, plus memory use.
+
+    python scripts/benchmark_recommender.py                     # compare with baseline
+    python scripts/benchmark_recommender.py --update-baseline   # record a new baseline
+
+Exits with status 1 if p95 latency or throughput regresses beyond
+--threshold, or if the top-3 rankings for the fixed seed change.
+Timings are machine-specific: record the baseline on the machine that runs the check.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import tracemalloc
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from feature4_drl.pipeline import CropRecommender
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_PATH = os.path.join(current_dir, "recommender_benchmark_baseline.json")
+DRL_DIR = os.path.join(os.path.dirname(current_dir), "feature4_drl")
+
+CROP_DURATIONS = [70, 85, 90, 95, 100, 110, 120, 130, 150, 160, 180, 300]
+
+
+def generate_requests(categories, n, seed):
+    """Synthetic /recommend payloads drawn like data_augmentation.py rows"""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(n):
+        requests.append({
+            'soil_n': rng.randint(20, 65),
+            'soil_p': rng.randint(10, 40),
+            'soil_k': rng.randint(10, 45),
+            'soil_ph': round(rng.uniform(5.5, 7.8), 1),
+            'soil_moisture': rng.randint(15, 45),
+            'humidity': rng.randint(35, 80),
+            'avg_temperature': rng.randint(18, 38),
+            'seasonal_rainfall': rng.randint(300, 1200),
+            'crop_duration_days': rng.choice(CROP_DURATIONS),
+            'district': rng.choice(categories['district']),
+            'state': rng.choice(categories['state']),
+            'soil_type': rng.choice(categories['soil_type']),
+            'climate_season': rng.choice(categories['climate_season']),
+            'previous_crop': rng.choice(categories['previous_crop']),
+            'crop_water_requirement': rng.choice(categories['crop_water_requirement'])
+        })
+    return requests
+
+
+def percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+def rss_mb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def peak_allocation(fn):
+    """Peak traced Python allocation (bytes) while running fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(n_requests, batch_size, seed, warmup=20):
+    recommender = CropRecommender(
+        os.path.join(DRL_DIR, "crop_recommendation_models"),
+        os.path.join(DRL_DIR, "enhanced_agriculture_dataset.csv"),
+        cache_size=0,  # measure the model path, not cache hits
+        seed=seed
+    )
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    recommender.ensure_loaded()
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    requests = generate_requests(recommender.metadata['categories'], n_requests, seed)
+
+    for payload in requests[:warmup]:
+        recommender.get_top_recommendations(payload)
+
+    # Single requests (timed without tracemalloc: it slows every allocation)
+    single_ms = []
+    rankings = []
+    start = time.perf_counter()
+    for payload in requests:
+        t0 = time.perf_counter()
+        top = recommender.get_top_recommendations(payload, top_n=3)
+        single_ms.append((time.perf_counter() - t0) * 1000)
+        rankings.append([rec['crop_name'] for rec in top])
+    single_total = time.perf_counter() - start
+
+    # Batched requests
+    batch_ms = []
+    batched_rankings = []
+    start = time.perf_counter()
+    for i in range(0, len(requests), batch_size):
+        t0 = time.perf_counter()
+        results = recommender.get_top_recommendations_batch(requests[i:i + batch_size], top_n=3)
+        batch_ms.append((time.perf_counter() - t0) * 1000)
+        batched_rankings.extend([rec['crop_name'] for rec in top] for top in results)
+    batch_total = time.perf_counter() - start
+
+    # Peak allocations, measured in separate untimed passes
+    single_peak = peak_allocation(lambda: [recommender.get_top_recommendations(p, top_n=3) for p in requests])
+    batch_peak = peak_allocation(lambda: [
+        recommender.get_top_recommendations_batch(requests[i:i + batch_size], top_n=3)
+        for i in range(0, len(requests), batch_size)
+    ])
+
+    return {
+        'config': {'n_requests': n_requests, 'batch_size': batch_size, 'seed': seed},
+        'load_s': load_s,
+        'single': {**percentiles(single_ms), 'throughput_rps': n_requests / single_total},
+        'batched': {**percentiles(batch_ms), 'throughput_rps': n_requests / batch_total},
+        'memory': {
+            'rss_before_load_mb': rss_before,
+            'rss_after_load_mb': rss_loaded,
+            'rss_peak_mb': rss_mb(),
+            'single_peak_alloc_mb': single_peak / (1024 * 1024),
+            'batched_peak_alloc_mb': batch_peak / (1024 * 1024)
+        },
+        'batch_matches_single': batched_rankings == rankings,
+        'top3': rankings
+    }
+
+
+def compare(result, baseline, threshold):
+    """Return a list of human-readable regressions"""
+    failures = []
+    if not result['batch_matches_single']:
+        failures.append("Batched rankings differ from single-request rankings")
+
+    if baseline['config'] != result['config']:
+        failures.append(f"Baseline config {baseline['config']} does not match run config {result['config']}")
+        return failures
+
+    changed = [i for i, (a, b) in enumerate(zip(result['top3'], baseline['top3'])) if a != b]
+    if changed:
+        i = changed[0]
+        failures.append(
+            f"Top-3 rankings changed for {len(changed)} request(s), "
+            f"first at #{i}: {baseline['top3'][i]} -> {result['top3'][i]}"
+        )
+
+    for mode in ('single', 'batched'):
+        base_p95, p95 = baseline[mode]['p95_ms'], result[mode]['p95_ms']
+        if p95 > base_p95 * (1 + threshold):
+            failures.append(f"{mode} p95 regressed: {base_p95:.2f} ms -> {p95:.2f} ms")
+        base_rps, rps = baseline[mode]['throughput_rps'], result[mode]['throughput_rps']
+        if rps < base_rps * (1 - threshold):
+            failures.append(f"{mode} throughput regressed: {base_rps:.1f} -> {rps:.1f} req/s")
+    return failures
+
+
+def print_report(result):
+    print("=" * 60)
+    print("CROP RECOMMENDER BENCHMARK")
+    print("=" * 60)
+    print(f"Requests: {result['config']['n_requests']}  Batch size: {result['config']['batch_size']}  Seed: {result['config']['seed']}")
+    print(f"Model load: {result['load_s'] * 1000:.1f} ms")
+    for mode in ('single', 'batched'):
+        r = result[mode]
+        print(f"{mode:>8}: p50={r['p50_ms']:.2f} ms  p95={r['p95_ms']:.2f} ms  "
+              f"p99={r['p99_ms']:.2f} ms  throughput={r['throughput_rps']:.1f} req/s")
+    mem = result['memory']
+    if mem['rss_peak_mb'] is not None:
+        print(f"RSS: {mem['rss_before_load_mb']:.1f} MB before load, "
+              f"{mem['rss_after_load_mb']:.1f} MB after load, {mem['rss_peak_mb']:.1f} MB peak")
+    print(f"Peak Python allocations: single={mem['single_peak_alloc_mb']:.2f} MB  "
+          f"batched={mem['batched_peak_alloc_mb']:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop recommender benchmark and regression check")
+    parser.add_argument("--requests", type=int, default=500, help="Number of synthetic requests")
+    parser.add_argument("--batch-size", type=int, default=32, help="Requests per batched call")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the request mix and the recommender")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON path")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    args = parser.parse_args()
+
+    # Per-crop INFO logs would dominate the timings
+    logging.getLogger("feature4_drl.pipeline").setLevel(logging.WARNING)
+
+    result = run_benchmark(args.requests, args.batch_size, args.seed)
+    print_report(result)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️  No baseline at {args.baseline}. Run with --update-baseline first.")
+        return 1
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    failures = compare(result, baseline, args.threshold)
+    if failures:
+        print("\n❌ REGRESSIONS:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Export the crop recommender artifacts to their fast-loading form.
+
+Loads the pickled XGBoost models, label encoders and metadata plus the
+training CSV through CropRecommender's legacy loader, and writes:
+  - yield_model.ubj / risk_model.ubj  (XGBoost native UBJSON boosters)
+  - recommender_sidecar.json          (features, categories, per-crop aggregates)
+
+Run this again whenever the models are retrained:
+    python scripts/export_recommender_artifacts.py
+"""
+import os
+import sys
+import json
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from feature4_drl.pipeline import CropRecommender, SIDECAR_FILE, YIELD_MODEL_FILE, RISK_MODEL_FILE
+
+drl_dir = os.path.join(os.path.dirname(current_dir), "feature4_drl")
+model_dir = os.path.join(drl_dir, "crop_recommendation_models")
+dataset_path = os.path.join(drl_dir, "enhanced_agriculture_dataset.csv")
+
+
+def export():
+    # The same derivation the recommender falls back to when the exports are missing
+    recommender = CropRecommender(model_dir, dataset_path, cache_size=0)
+    sidecar = recommender._load_legacy_artifacts()
+
+    recommender.yield_model.save_model(os.path.join(model_dir, YIELD_MODEL_FILE))
+    recommender.risk_model.save_model(os.path.join(model_dir, RISK_MODEL_FILE))
+
+    with open(os.path.join(model_dir, SIDECAR_FILE), "w") as f:
+        json.dump(sidecar, f, indent=2)
+
+    print(f"✅ Exported boosters and {SIDECAR_FILE} to {model_dir}")
+
+
+if __name__ == "__main__":
+    export()
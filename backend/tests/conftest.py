@@ -0,0 +1,7 @@
+import os
+
+# Modules under test import core.supabase_client, which builds a client at
+# import time. These tests never reach the database, so placeholder settings
+# do (settings already in the environment are left alone)
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
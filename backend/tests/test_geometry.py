@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("shapely")
+pytest.importorskip("pyproj")
+
+from shapely.geometry import Polygon
+
+from feature1.geometry import calculate_area, calculate_areas, geodesic_area
+
+PARCELS = [
+    # ~1 ha square near Delhi
+    [(77.2090, 28.6139), (77.2100, 28.6139), (77.2100, 28.6148), (77.2090, 28.6148)],
+    # Irregular field in Punjab
+    [(75.8573, 30.9010), (75.8601, 30.9004), (75.8622, 30.9031), (75.8597, 30.9052), (75.8569, 30.9040)],
+    # Long thin strip near the equator
+    [(36.8000, -0.0010), (36.8150, -0.0010), (36.8150, -0.0006), (36.8000, -0.0006)],
+    # High latitude, clockwise
+    [(24.9400, 60.1700), (24.9400, 60.1730), (24.9460, 60.1730), (24.9460, 60.1700)],
+]
+
+
+def test_areas_match_geodesic_area():
+    areas = calculate_areas([np.array(p) for p in PARCELS])
+    for area, parcel in zip(areas, PARCELS):
+        assert area == pytest.approx(geodesic_area(Polygon(parcel)), rel=1e-6)
+
+
+def test_input_forms_agree():
+    parcel = PARCELS[1]
+    as_dicts = [{"lat": lat, "lng": lng} for lng, lat in parcel]
+    closed = np.array(parcel + parcel[:1])
+    assert calculate_area(as_dicts) == pytest.approx(calculate_area(np.array(parcel)), rel=1e-12)
+    assert calculate_area(closed) == pytest.approx(calculate_area(np.array(parcel)), rel=1e-9)
+
+
+def test_degenerate_polygons_get_zero():
+    areas = calculate_areas([[], np.array(PARCELS[0][:2]), np.array(PARCELS[0])])
+    assert areas[0] == areas[1] == 0
+    assert areas[2] > 0
@@ -0,0 +1,57 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("shapely")
+pytest.importorskip("pyproj")
+
+from feature1.gps_track import _local_latlng, decode_track, encode_track, ingest_track
+
+
+def square_walk(side_m=100.0, noise_m=1.5, accuracy_m=4.0, seed=7):
+    """Fixes every meter around a side_m square near Delhi, with Gaussian jitter"""
+    rng = np.random.default_rng(seed)
+    corners = np.array([(0, 0), (side_m, 0), (side_m, side_m), (0, side_m), (0, 0)], dtype=float)
+    steps = np.arange(0, 1, 1 / side_m)[:, None]
+    points = np.vstack([a + (b - a) * steps for a, b in zip(corners[:-1], corners[1:])] + [corners[:1]])
+    points += rng.normal(0, noise_m, points.shape)
+    lat, lng = _local_latlng(points[:, 0], points[:, 1], 28.6139, 77.2090)
+    return np.column_stack([lat, lng, np.full(len(lat), accuracy_m)])
+
+
+def test_track_encoding_round_trip():
+    fixes = square_walk()
+    decoded = decode_track(encode_track(fixes))
+    assert decoded.shape == fixes.shape
+    assert np.abs(decoded[:, :2] - fixes[:, :2]).max() <= 0.5e-7
+    assert np.abs(decoded[:, 2] - fixes[:, 2]).max() <= 0.05
+
+
+@pytest.mark.parametrize("buffer", ["not base64!", "AAAA"])
+def test_malformed_buffers_are_rejected(buffer):
+    with pytest.raises(ValueError):
+        decode_track(buffer)
+
+
+def test_noisy_square_walk():
+    fixes = square_walk()
+    result = ingest_track(fixes)
+    walk = result["walk"]
+    assert result["area_sqm"] == pytest.approx(10000, rel=0.02)
+    assert walk["closed"]
+    assert walk["walk_completeness"] == 1.0
+    assert walk["fixes_accepted"] == len(fixes)
+    assert 4 <= walk["vertices"] < len(fixes) / 10
+
+
+def test_inaccurate_fixes_are_dropped():
+    fixes = square_walk()
+    fixes[::10, 2] = 80.0
+    result = ingest_track(fixes)
+    assert result["walk"]["fixes_dropped_accuracy"] == len(fixes[::10])
+    assert result["area_sqm"] == pytest.approx(10000, rel=0.02)
+
+
+def test_open_walk_is_not_closed():
+    # Three sides of the square: the gap back to the start is a whole side
+    fixes = square_walk()[:300]
+    assert not ingest_track(fixes)["walk"]["closed"]
@@ -0,0 +1,69 @@
+import struct
+import zlib
+
+import pytest
+
+from core.image_prep import _strip_jpeg_metadata, _strip_png_metadata
+
+
+def jpeg_segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def png_chunk(chunk_type, payload):
+    return struct.pack(">I4s", len(payload), chunk_type) + payload + struct.pack(">I", zlib.crc32(chunk_type + payload))
+
+
+SOI = b"\xff\xd8"
+JFIF = jpeg_segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+EXIF = jpeg_segment(0xE1, b"Exif\x00\x00GPS lives here")
+XMP = jpeg_segment(0xE1, b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>")
+ICC = jpeg_segment(0xE2, b"ICC_PROFILE\x00\x01\x01profile")
+FLASHPIX = jpeg_segment(0xE2, b"FPXR\x00extension")
+IPTC = jpeg_segment(0xED, b"Photoshop 3.0\x00caption")
+ADOBE = jpeg_segment(0xEE, b"Adobe\x00\x64\x00\x00\x00\x00\x01")
+COMMENT = jpeg_segment(0xFE, b"taken by a phone")
+DQT = jpeg_segment(0xDB, b"\x00" + bytes(range(64)))
+SCAN = jpeg_segment(0xDA, b"\x01\x01\x00\x00\x3f\x00") + b"\x12\xff\x00\x34" + b"\xff\xd9"
+
+
+def test_jpeg_metadata_is_cut_and_everything_else_kept():
+    original = SOI + JFIF + EXIF + XMP + ICC + FLASHPIX + IPTC + ADOBE + COMMENT + DQT + SCAN
+    assert _strip_jpeg_metadata(original) == SOI + JFIF + ICC + ADOBE + DQT + SCAN
+
+
+def test_jpeg_fill_bytes_between_segments_are_skipped():
+    assert _strip_jpeg_metadata(SOI + b"\xff" + EXIF + DQT + SCAN) == SOI + DQT + SCAN
+
+
+@pytest.mark.parametrize("data", [b"\x89PNG\r\n\x1a\n", SOI + b"\x00\x00", SOI + JFIF + DQT])
+def test_malformed_jpegs_are_rejected(data):
+    with pytest.raises(ValueError):
+        _strip_jpeg_metadata(data)
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IHDR = png_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+ICCP = png_chunk(b"iCCP", b"sRGB\x00\x00profile")
+IDAT = png_chunk(b"IDAT", zlib.compress(b"\x00\x80"))
+IEND = png_chunk(b"IEND", b"")
+
+
+def test_png_metadata_is_cut_and_everything_else_kept():
+    original = (
+        PNG_SIGNATURE + IHDR + png_chunk(b"tEXt", b"Author\x00someone") + ICCP
+        + png_chunk(b"eXIf", b"MM\x00*GPS") + png_chunk(b"zTXt", b"Comment\x00\x00x")
+        + IDAT + png_chunk(b"iTXt", b"XML:com.adobe.xmp\x00\x00\x00\x00\x00<x/>")
+        + png_chunk(b"tIME", b"\x07\xea\x0a\x13\x00\x00\x00") + IEND
+    )
+    assert _strip_png_metadata(original) == PNG_SIGNATURE + IHDR + ICCP + IDAT + IEND
+
+
+def test_png_trailing_bytes_after_iend_are_dropped():
+    assert _strip_png_metadata(PNG_SIGNATURE + IHDR + IDAT + IEND + b"appended") == PNG_SIGNATURE + IHDR + IDAT + IEND
+
+
+@pytest.mark.parametrize("data", [SOI + JFIF, PNG_SIGNATURE + IHDR[:-6]])
+def test_malformed_pngs_are_rejected(data):
+    with pytest.raises(ValueError):
+        _strip_png_metadata(data)
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("shapely")
+pytest.importorskip("pyproj")
+
+from feature1.land_index import LandIndex
+
+LAT, LNG = 28.6139, 77.2090
+SIDE = 0.001  # degrees, roughly 100 m
+
+
+def square(lng, lat, side=SIDE):
+    return [
+        {"lat": lat, "lng": lng}, {"lat": lat, "lng": lng + side},
+        {"lat": lat + side, "lng": lng + side}, {"lat": lat + side, "lng": lng}
+    ]
+
+
+def make_index(rows, tolerance=0.05):
+    index = LandIndex(overlap_tolerance=tolerance, refresh_seconds=3600, full_reload_seconds=3600)
+    index.load(rows)  # Loaded once up front, so queries never reach the database
+    return index
+
+
+def row(land_id, coordinates, status="PENDING"):
+    return {"id": land_id, "user_id": f"user-{land_id}", "status": status, "polygon_coordinates": coordinates}
+
+
+def test_overlaps_below_the_tolerance_are_left_out():
+    # Neighbour shares a 2% sliver along the common boundary
+    index = make_index([row("a", square(LNG, LAT))])
+    claim = square(LNG + 0.98 * SIDE, LAT)
+    assert index.overlaps(claim) == []
+    minor = index.overlaps(claim, include_minor=True)
+    assert [m["land_id"] for m in minor] == ["a"]
+    assert minor[0]["overlap_percent"] == pytest.approx(2, abs=0.05)
+
+
+def test_overlaps_at_or_above_the_tolerance_are_reported_largest_first():
+    index = make_index([row("a", square(LNG, LAT)), row("b", square(LNG + SIDE, LAT))])
+    claim = square(LNG + 0.9 * SIDE, LAT)
+    overlaps = index.overlaps(claim)
+    assert [o["land_id"] for o in overlaps] == ["b", "a"]
+    assert overlaps[0]["overlap_percent"] == pytest.approx(90, abs=0.1)
+    assert overlaps[1]["existing_overlap_percent"] == pytest.approx(10, abs=0.1)
+
+
+def test_tolerance_applies_to_the_larger_share():
+    # 4% of the big existing parcel, but 100% of the small new claim
+    index = make_index([row("big", square(LNG, LAT, 5 * SIDE))])
+    assert [o["land_id"] for o in index.overlaps(square(LNG, LAT))] == ["big"]
+
+
+def test_rejected_and_excluded_parcels_never_overlap():
+    index = make_index([row("a", square(LNG, LAT), status="REJECTED"), row("b", square(LNG, LAT))])
+    assert index.overlaps(square(LNG, LAT), exclude_land_id="b") == []
+
+
+def test_added_parcels_are_found_before_the_tree_is_rebuilt():
+    index = make_index([])
+    index.add(row("new", square(LNG, LAT)))
+    assert [o["land_id"] for o in index.overlaps(square(LNG, LAT))] == ["new"]
@@ -0,0 +1,40 @@
+import base64
+import json
+
+import pytest
+
+from core.pagination import InvalidCursor, decode_cursor, encode_cursor, split_page
+
+ROW = {"created_at": "2026-03-14T09:26:53.589793+00:00", "id": "6f1c2b4e-8d7a-4c3b-9e2f-1a0b9c8d7e6f"}
+
+
+def cursor_for(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(ROW)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ROW["created_at"], ROW["id"])
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    cursor_for({"created_at": ROW["created_at"], "id": ROW["id"]}),
+    cursor_for([ROW["created_at"]]),
+    cursor_for([ROW["created_at"], "1,id.gt.0"]),
+    cursor_for(['2026-03-14",created_at.gt."2000-01-01', ROW["id"]]),
+    cursor_for([None, ROW["id"]]),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_split_page_trims_the_look_ahead_row():
+    rows = [{"created_at": f"2026-03-14T09:00:0{i}+00:00", "id": ROW["id"]} for i in range(3)]
+    assert split_page(rows[:2], 2) == (rows[:2], None)
+    page, next_cursor = split_page(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(next_cursor) == (rows[1]["created_at"], rows[1]["id"])
+    assert split_page(None, 2) == ([], None)
@@ -0,0 +1,40 @@
+from feature4_drl.recommendation_cache import DEFAULT_QUANTIZATION, make_cache_key, quantize_input
+
+
+def key(input_data):
+    return make_cache_key(quantize_input(input_data, DEFAULT_QUANTIZATION))
+
+
+BASE = {
+    "soil_n": 50, "soil_p": 35, "soil_k": 40, "soil_ph": 6.5, "soil_moisture": 55,
+    "avg_temperature": 28, "seasonal_rainfall": 850, "humidity": 65,
+    "crop_duration_days": 120, "soil_type": "Alluvial", "climate_season": "Kharif"
+}
+
+
+def test_readings_on_the_same_grid_point_share_a_key():
+    assert key({**BASE, "seasonal_rainfall": 846}) == key({**BASE, "seasonal_rainfall": 851})
+    assert key({**BASE, "soil_ph": 6.46}) == key({**BASE, "soil_ph": 6.54})
+    assert key({**BASE, "avg_temperature": 27.8}) == key({**BASE, "avg_temperature": 28.2})
+
+
+def test_readings_on_different_grid_points_do_not():
+    assert key({**BASE, "seasonal_rainfall": 844}) != key({**BASE, "seasonal_rainfall": 846})
+    assert key({**BASE, "soil_ph": 6.5}) != key({**BASE, "soil_ph": 6.6})
+
+
+def test_quantized_values_carry_no_float_noise():
+    quantized = quantize_input({"soil_ph": 6.5 + 1e-12, "avg_temperature": 0.1 + 0.2}, DEFAULT_QUANTIZATION)
+    assert quantized == {"soil_ph": 6.5, "avg_temperature": 0.5}
+
+
+def test_key_ignores_int_float_and_field_order():
+    reordered = dict(reversed(list(BASE.items())))
+    as_floats = {k: float(v) if isinstance(v, int) else v for k, v in BASE.items()}
+    assert key(BASE) == key(reordered) == key(as_floats)
+
+
+def test_non_numeric_fields_are_left_alone():
+    quantized = quantize_input({"soil_type": "Alluvial", "irrigated": True, "soil_n": None}, {"soil_type": 1.0, "irrigated": 1.0, "soil_n": 1.0})
+    assert quantized == {"soil_type": "Alluvial", "irrigated": True, "soil_n": None}
+    assert key({**BASE, "soil_type": "Black"}) != key(BASE)
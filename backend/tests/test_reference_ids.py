@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from core import reference_ids
+from core.reference_ids import (
+    MAX_SEQUENCE, NODE_BITS, SEQUENCE_BITS, ReferenceIdGenerator, _encode, insert_with_reference
+)
+
+REFERENCE = re.compile(r"^SA-\d{4}-[0-9A-HJKMNP-TV-Z]{13}$")
+
+
+def decode(reference):
+    value = 0
+    for char in reference.rsplit("-", 1)[1]:
+        value = value * 32 + "0123456789ABCDEFGHJKMNPQRSTVWXYZ".index(char)
+    return value
+
+
+def test_encode_is_fixed_width_and_order_preserving():
+    values = [0, 1, 31, 32, 1 << 40, (1 << 63) - 1]
+    encoded = [_encode(v) for v in values]
+    assert encoded[0] == "0" * 13
+    assert all(len(e) == 13 for e in encoded)
+    assert encoded == sorted(encoded)
+
+
+def test_references_carry_the_node_id():
+    generator = ReferenceIdGenerator("SA", node_id=517)
+    reference = generator.next()
+    assert REFERENCE.match(reference)
+    assert (decode(reference) >> SEQUENCE_BITS) & ((1 << NODE_BITS) - 1) == 517
+
+
+def test_a_batch_is_unique_and_sorted_across_exhausted_milliseconds(monkeypatch):
+    monkeypatch.setattr(reference_ids.time, "time", lambda: 1780000000.0)
+    generator = ReferenceIdGenerator("SA", node_id=1)
+    batch = generator.allocate(MAX_SEQUENCE + 10)
+    assert len(set(batch)) == len(batch)
+    assert batch == sorted(batch)
+    # The sequence ran out, so the tail borrowed the next millisecond
+    timestamp_shift = NODE_BITS + SEQUENCE_BITS
+    assert (decode(batch[-1]) >> timestamp_shift) == (decode(batch[0]) >> timestamp_shift) + 1
+
+
+def test_references_keep_increasing_when_the_clock_steps_back(monkeypatch):
+    now = [1780000000.0]
+    monkeypatch.setattr(reference_ids.time, "time", lambda: now[0])
+    generator = ReferenceIdGenerator("SA", node_id=1)
+    first = generator.next()
+    now[0] -= 5
+    assert generator.next() > first
+
+
+def test_insert_with_reference_retries_unique_violations_only():
+    generator = ReferenceIdGenerator("SA", node_id=1)
+    tried = []
+
+    def insert(reference_no):
+        tried.append(reference_no)
+        if len(tried) == 1:
+            raise Exception('duplicate key value violates unique constraint "reference_no"')
+        return "row"
+
+    assert insert_with_reference(generator, insert) == ("row", tried[1])
+    assert tried[0] != tried[1]
+
+    def failing(reference_no):
+        raise RuntimeError("connection reset")
+
+    with pytest.raises(RuntimeError):
+        insert_with_reference(generator, failing)
@@ -1,5 +1,4 @@
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
 import { 
   FileText, 
   CheckCircle, 
@@ -123,34 +122,46 @@ const AdminDashboard = () => {
   const [riskAlerts, setRiskAlerts] = useState([]);
   const [loading, setLoading] = useState(true);
 
-  // Fetch Data
+  // Live data: one snapshot, then only what changed (see /admin/live)
   useEffect(() => {
-      const fetchData = async () => {
-          try {
-              setLoading(true);
-              const [statsRes, chartRes, claimsRes, risksRes] = await Promise.all([
-                  axios.get(`${API_URL}/admin/dashboard-stats`),
-                  axios.get(`${API_URL}/admin/dashboard-chart`),
-                  axios.get(`${API_URL}/admin/recent-claims`),
-                  axios.get(`${API_URL}/admin/risk-heatmap`)
-              ]);
+      const sections = {};
 
-              setStats(statsRes.data);
-              setChartData(chartRes.data);
-              setRecentClaims(claimsRes.data);
-              setRiskAlerts(risksRes.data);
-          } catch (error) {
-              console.error("Failed to fetch dashboard data", error);
-          } finally {
-              setLoading(false);
-          }
+      const applyListDelta = (items = [], delta, key) => {
+          const byKey = new Map(items.map(item => [item[key], item]));
+          (delta.remove || []).forEach(k => byKey.delete(k));
+          (delta.upsert || []).forEach(item => byKey.set(item[key], item));
+          const order = delta.order || items.map(item => item[key]).filter(k => byKey.has(k));
+          return order.map(k => byKey.get(k)).filter(Boolean);
       };
 
-      fetchData();
-      
-      // Real-time polling every 30s
-      const interval = setInterval(fetchData, 30000);
-      return () => clearInterval(interval);
+      const render = () => {
+          if (sections.stats) setStats(sections.stats);
+          if (sections.chart) setChartData(sections.chart);
+          if (sections.recent_claims) setRecentClaims(sections.recent_claims);
+          if (sections.risk_heatmap) setRiskAlerts(sections.risk_heatmap);
+      };
+
+      const source = new EventSource(`${API_URL}/admin/live`);
+
+      source.addEventListener('snapshot', (event) => {
+          Object.assign(sections, JSON.parse(event.data).data);
+          render();
+          setLoading(false);
+      });
+
+      source.addEventListener('delta', (event) => {
+          const { changes } = JSON.parse(event.data);
+          if (changes.stats) sections.stats = { ...sections.stats, ...changes.stats };
+          if (changes.chart) sections.chart = applyListDelta(sections.chart, changes.chart, 'fullDate');
+          if (changes.recent_claims) sections.recent_claims = applyListDelta(sections.recent_claims, changes.recent_claims, 'id');
+          if (changes.risk_heatmap) sections.risk_heatmap = applyListDelta(sections.risk_heatmap, changes.risk_heatmap, 'id');
+          render();
+      });
+
+      // EventSource reconnects on its own and receives a fresh snapshot
+      source.onerror = () => console.error("Live dashboard connection lost, reconnecting");
+
+      return () => source.close();
   }, []);
 
   return (
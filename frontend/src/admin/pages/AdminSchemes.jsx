@@ -23,14 +23,19 @@ const AdminSchemes = () => {
     const fetchApplications = async () => {
         try {
             setLoading(true);
-            const response = await fetch(getApiUrl('api/schemes/applications/all'));
-            const data = await response.json();
-            // API returns array directly now based on my router implementation
-            if (Array.isArray(data)) {
-                 setApplications(data);
-            } else {
-                 setApplications([]);
-            }
+            // The list is paged (newest first); follow X-Next-Cursor until the last page
+            // so filters, search and stats see every application
+            const all = [];
+            let cursor = null;
+            do {
+                const query = `limit=500${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+                const response = await fetch(getApiUrl(`api/schemes/applications/all?${query}`));
+                const data = await response.json();
+                if (!Array.isArray(data)) break;
+                all.push(...data);
+                cursor = response.headers.get('X-Next-Cursor');
+            } while (cursor);
+            setApplications(all);
         } catch (error) {
             console.error('Error fetching applications:', error);
             setApplications([]);
@@ -29,8 +29,16 @@ const DocumentUpload = ({ landId, onUploadComplete }) => {
 
             if (!response.ok) throw new Error('Upload failed');
 
-            const data = await response.json();
-            onUploadComplete(data); // Backend now returns the single object directly
+            // OCR runs in the background: long-poll the job until it finishes
+            let job = await response.json();
+            while (job.status !== 'completed' && job.status !== 'failed') {
+                const poll = await fetch(`${apiBase}/api/feature1/document/jobs/${job.job_id}?wait=20`);
+                if (!poll.ok) throw new Error('Upload failed');
+                job = await poll.json();
+            }
+            if (job.status === 'failed') throw new Error(job.error || 'Processing failed');
+
+            onUploadComplete(job.result); // The stored document with its OCR data
         } catch (error) {
             console.error(error);
             alert(t('error_uploading'));
@@ -40,22 +40,86 @@ function LocationMarker() {
     )
 }
 
-const LandMap = ({ onPolygonChange, otherLands = [] }) => {
+// Registry parcels for the visible tiles only (see /api/feature1/lands/tiles)
+const TILE_MIN_ZOOM = 12;
+
+function ViewportLands({ tilesUrl, onLandsChange }) {
+    const map = useMap();
+
+    useEffect(() => {
+        if (!tilesUrl) return;
+        let cancelled = false;
+
+        const load = async () => {
+            const zoom = Math.min(Math.round(map.getZoom()), 19);
+            if (zoom < TILE_MIN_ZOOM) {
+                onLandsChange([]);
+                return;
+            }
+            const bounds = map.getPixelBounds();
+            const size = 256;
+            const requests = [];
+            for (let x = Math.floor(bounds.min.x / size); x <= Math.floor(bounds.max.x / size); x++) {
+                for (let y = Math.floor(bounds.min.y / size); y <= Math.floor(bounds.max.y / size); y++) {
+                    // "no-cache" revalidates with the tile's ETag: unchanged tiles cost a 304
+                    requests.push(fetch(`${tilesUrl}/${zoom}/${x}/${y}`, { cache: 'no-cache' })
+                        .then(res => res.ok ? res.json() : { features: [] }));
+                }
+            }
+            const tiles = await Promise.all(requests);
+            if (cancelled) return;
+
+            // Parcels crossing tile edges appear in several tiles
+            const lands = new Map();
+            // Every part of a MultiPolygon (and every hole) is drawn, as Leaflet [lat, lng] rings
+            const toLatLngs = rings => rings.map(ring => ring.map(([lng, lat]) => [lat, lng]));
+            tiles.forEach(tile => tile.features.forEach(feature => {
+                const { type, coordinates } = feature.geometry;
+                lands.set(feature.id, {
+                    id: feature.id,
+                    status: feature.properties.status,
+                    area_sqm: feature.properties.area_sqm,
+                    positions: type === 'Polygon' ? toLatLngs(coordinates) : coordinates.map(toLatLngs)
+                });
+            }));
+            onLandsChange([...lands.values()]);
+        };
+
+        const onMove = () => load().catch(err => console.error("Failed to load lands:", err));
+        onMove();
+        map.on('moveend', onMove);
+        return () => {
+            cancelled = true;
+            map.off('moveend', onMove);
+        };
+    }, [map, tilesUrl]);
+
+    return null;
+}
+
+const LandMap = ({ onPolygonChange, otherLands = [], tilesUrl = null, trackUrl = null, onWalkMetrics = null }) => {
     const { t } = useTranslation();
     const [markers, setMarkers] = useState([]);
     const [mode, setMode] = useState('manual'); // 'manual' or 'tracking'
     const [trackingId, setTrackingId] = useState(null);
     const [currentPos, setCurrentPos] = useState(null);
+    const [viewportLands, setViewportLands] = useState([]);
+    const registryLands = tilesUrl ? viewportLands : otherLands;
+
+    // Bumped whenever the map is cleared, so a simplification still in flight is dropped
+    const trackGeneration = useRef(0);
 
     const handleAddPoint = (latlng) => {
         const newMarkers = [...markers, { lat: latlng.lat, lng: latlng.lng, accuracy: 5.0 }]; // Manual points assumed accurate (~5m)
         setMarkers(newMarkers);
         onPolygonChange(newMarkers);
+        if (onWalkMetrics) onWalkMetrics(null); // Edited by hand: no longer the walked polygon
     };
 
     const startTracking = () => {
         setMode('tracking');
         setMarkers([]); // Clear previous markers
+        if (onWalkMetrics) onWalkMetrics(null);
         if (navigator.geolocation) {
             const id = navigator.geolocation.watchPosition(
                 (position) => {
@@ -78,18 +142,41 @@ const LandMap = ({ onPolygonChange, otherLands = [] }) => {
         }
     };
 
-    const stopTracking = () => {
+    // Let the backend filter, simplify and repair the raw walk, then show its polygon
+    const simplifyTrack = async (fixes) => {
+        const generation = trackGeneration.current;
+        try {
+            const response = await fetch(trackUrl, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ points: fixes.map(p => [p.lat, p.lng, p.accuracy]) })
+            });
+            if (!response.ok) throw new Error('Track simplification failed');
+            const result = await response.json();
+            if (generation !== trackGeneration.current) return; // Cleared meanwhile
+            setMarkers(result.coordinates);
+            onPolygonChange(result.coordinates);
+            if (onWalkMetrics) onWalkMetrics({ ...result.walk, track_id: result.track_id });
+        } catch (error) {
+            console.error(error); // Keep the raw fixes
+        }
+    };
+
+    const stopTracking = (simplify = true) => {
         if (trackingId !== null) {
             navigator.geolocation.clearWatch(trackingId);
             setTrackingId(null);
+            if (simplify && trackUrl && markers.length > 2) simplifyTrack(markers);
         }
         setMode('manual'); // Default back to manual
     };
 
     const clearMap = () => {
+        trackGeneration.current += 1;
+        stopTracking(false);
         setMarkers([]);
         onPolygonChange([]);
-        stopTracking();
+        if (onWalkMetrics) onWalkMetrics(null);
     };
 
     return (
@@ -103,7 +190,7 @@ const LandMap = ({ onPolygonChange, otherLands = [] }) => {
                 </button>
                 <button
                     className={`px-4 py-2 rounded ${mode === 'tracking' ? 'bg-green-600' : 'bg-gray-600'}`}
-                    onClick={mode === 'tracking' ? stopTracking : startTracking}
+                    onClick={mode === 'tracking' ? () => stopTracking() : startTracking}
                 >
                     {mode === 'tracking' ? t('stop_tracking') : t('start_tracking')}
                 </button>
@@ -123,6 +210,7 @@ const LandMap = ({ onPolygonChange, otherLands = [] }) => {
                     />
                     <LocationMarker />
                     <MapEvents mode={mode} onAddPoint={handleAddPoint} />
+                    <ViewportLands tilesUrl={tilesUrl} onLandsChange={setViewportLands} />
 
                     {/* Current Drawing */}
                     {markers.map((position, idx) => (
@@ -137,9 +225,9 @@ const LandMap = ({ onPolygonChange, otherLands = [] }) => {
                     )}
 
                     {/* Verified Lands from Backend */}
-                    {otherLands && otherLands.map((land) => {
-                        if (!land.polygon_coordinates) return null;
-                        const positions = land.polygon_coordinates.map(p => [p.lat, p.lng]);
+                    {registryLands && registryLands.map((land) => {
+                        if (!land.positions && !land.polygon_coordinates) return null;
+                        const positions = land.positions || land.polygon_coordinates.map(p => [p.lat, p.lng]);
                         const color = land.status === 'VERIFIED' ? 'blue' : (land.status === 'REJECTED' ? 'red' : 'orange');
 
                         return (
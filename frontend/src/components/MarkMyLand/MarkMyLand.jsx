@@ -1,26 +1,21 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useTranslation } from 'react-i18next';
 import LandMap from './LandMap';
 import DocumentUpload from './DocumentUpload';
 
+// Long-polls of 20s each: give up on following the registration after ~5 minutes
+const MAX_REGISTRATION_POLLS = 15;
+
 const MarkMyLand = () => {
     const { t } = useTranslation();
     const apiBase = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
     const [step, setStep] = useState(1);
     const [polygon, setPolygon] = useState([]);
+    const [walkMetrics, setWalkMetrics] = useState(null); // Set when the polygon came from a GPS walk
     const [landData, setLandData] = useState(null);
     const [docData, setDocData] = useState(null);
     const [verificationResult, setVerificationResult] = useState(null);
     const [loading, setLoading] = useState(false);
-    const [existingLands, setExistingLands] = useState([]);
-
-    // Fetch existing lands on load
-    React.useEffect(() => {
-        fetch(`${apiBase}/api/feature1/lands`)
-            .then(res => res.json())
-            .then(data => setExistingLands(data))
-            .catch(err => console.error("Failed to load lands:", err));
-    }, []);
 
     const handlePolygonChange = (points) => {
         setPolygon(points);
@@ -42,7 +37,8 @@ const MarkMyLand = () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     user_id: userId,
-                    coordinates: polygon
+                    coordinates: polygon,
+                    track_id: walkMetrics ? walkMetrics.track_id : null // Server looks up the walk score
                 })
             });
 
@@ -92,6 +88,34 @@ const MarkMyLand = () => {
         }
     };
 
+    // On-chain registration finishes in the background: long-poll it for the tx hash.
+    // Stops on unmount or when a new verification replaces this registration
+    const registrationId = verificationResult?.blockchain?.registration_id;
+    useEffect(() => {
+        if (!registrationId) return;
+        const controller = new AbortController();
+        const trackRegistration = async () => {
+            try {
+                for (let attempt = 0; attempt < MAX_REGISTRATION_POLLS; attempt++) {
+                    const poll = await fetch(
+                        `${apiBase}/api/feature1/blockchain/registrations/${registrationId}?wait=20`,
+                        { signal: controller.signal }
+                    );
+                    if (!poll.ok) return;
+                    const registration = await poll.json();
+                    setVerificationResult(prev => prev && prev.blockchain?.registration_id === registrationId
+                        ? { ...prev, hash: registration.tx_hash, blockchain: registration }
+                        : prev);
+                    if (registration.status === 'confirmed' || registration.status === 'failed') return;
+                }
+            } catch (error) {
+                if (error.name !== 'AbortError') console.error(error);
+            }
+        };
+        trackRegistration();
+        return () => controller.abort();
+    }, [apiBase, registrationId]);
+
     return (
         <div className="container mx-auto p-4 max-w-4xl">
             <h1 className="text-3xl font-bold mb-6 text-center text-green-400">{t('mark_my_land')}</h1>
@@ -108,7 +132,12 @@ const MarkMyLand = () => {
                 <div className="space-y-4 animate-in fade-in slide-in-from-bottom-4 duration-500">
                     <h2 className="text-xl font-semibold">{t('step1_map_land')}</h2>
                     <p className="text-gray-400">{t('step1_desc')}</p>
-                    <LandMap onPolygonChange={handlePolygonChange} otherLands={existingLands} />
+                    <LandMap
+                        onPolygonChange={handlePolygonChange}
+                        tilesUrl={`${apiBase}/api/feature1/lands/tiles`}
+                        trackUrl={`${apiBase}/api/feature1/land/track`}
+                        onWalkMetrics={setWalkMetrics}
+                    />
 
                     <div className="flex justify-end mt-4">
                         <button
@@ -278,7 +307,7 @@ const MarkMyLand = () => {
                             <div className="space-y-1">
                                 <p className="font-mono text-[10px] text-gray-500 uppercase">{t('transaction_hash')}</p>
                                 <p className="font-mono text-xs text-gray-300 break-all select-all">
-                                    {verificationResult.hash}
+                                    {verificationResult.hash || '…'}
                                 </p>
                             </div>
                         </div>